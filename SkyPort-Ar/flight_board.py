@@ -0,0 +1,366 @@
+# flight_board.py
+# خدمة لوحة الرحلات: بدل أن يحمّل المتصفح data/flights.json كاملًا ثم يبحث ويفرز ويقسّم الصفحات
+# بنفسه، يحمّل الخادم الملف مرة واحدة ويعيد الصفحة المطلوبة فقط.
+# - فهارس في الذاكرة: رقم الرحلة (فريد)، والحالة وشركة الطيران والوجهة والبوابة (قيمة -> مواضع).
+# - ترتيب محسوب مسبقًا لكل مفتاح فرز، ونص بحث جاهز (بأحرف صغيرة) لكل رحلة.
+# - كل استجابة لها ETag (نسخة البيانات + الاستعلام): الطلب المكرر مع If-None-Match يأخذ 304
+#   بلا جسم ولا حساب؛ والجسم يُضغط gzip عند دعم العميل، مع ذاكرة LRU للصفحات المرمّزة.
+# - الملف يُعاد تحميله تلقائيًا إن تغيّر على القرص (فحص stat كل RELOAD_INTERVAL ثانية على الأكثر).
+# - بقية المسارات ملفات الموقع الثابتة (flights.html ...) فتعمل الصفحة من نفس الأصل.
+# لا يعتمد على مكتبات خارجية.
+#
+# التشغيل: python flight_board.py --port 8000 [--data data/flights.json]
+#
+# المسارات:
+#   GET /flights          ?q=&status=&airline=&destination=&gate=&sort=&page=&page_size=
+#                         -> {"items", "page", "pages", "page_size", "total"}
+#   GET /flights/<code>   -> رحلة واحدة
+#   GET /<ملف>            ملفات الموقع الثابتة (/ -> index.html)
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SITE_DIR = os.path.dirname(os.path.realpath(__file__))
+DATA_FILE = os.path.join(SITE_DIR, "data", "flights.json")
+
+PAGE_SIZE = 8                   # نفس حجم الصفحة في js/flights.js
+MAX_PAGE_SIZE = 100
+SORT_KEYS = ("departure_time", "destination", "code")
+INDEXED_FIELDS = ("status", "airline", "destination", "gate")
+RELOAD_INTERVAL = 1.0           # أقل فاصل بين فحصين لتغيّر ملف البيانات (ثوانٍ)
+CACHE_RESPONSES = 256           # عدد الاستجابات المرمّزة المحفوظة (LRU)
+GZIP_MIN_BYTES = 512            # الأجسام الأصغر تُرسل بلا ضغط
+MAX_HEADERS = 100
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """خطأ يُعاد للعميل كـ JSON مع رمز حالة HTTP."""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Encoded:
+    """استجابة جاهزة للإرسال: الجسم مرة واحدة بصيغة JSON، ونسخته المضغوطة عند أول طلب لها."""
+    __slots__ = ("etag", "body", "ctype", "_gzipped")
+
+    def __init__(self, etag: str, body: bytes, ctype: str = "application/json; charset=utf-8"):
+        self.etag = etag
+        self.body = body
+        self.ctype = ctype
+        self._gzipped = None
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+class FlightBoard:
+    """
+    الرحلات في الذاكرة مع فهارسها. كل إعادة تحميل تبني الفهارس من جديد وتغيّر version
+    (بصمة محتوى الملف)، فتتغيّر كل وسوم ETag وتُفرَّغ ذاكرة الاستجابات.
+    """
+    def __init__(self, path: str = DATA_FILE, cache_size: int = CACHE_RESPONSES):
+        self.path = path
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[tuple, Encoded]" = OrderedDict()
+        self._stamp = None
+        self._checked = 0.0
+        self.version = ""
+        self.flights: List[dict] = []
+        self.reload()
+
+    # -------------------------
+    # التحميل والفهارس
+    # -------------------------
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def reload(self) -> bool:
+        """إعادة التحميل إن تغيّر الملف منذ آخر قراءة؛ نعيد True إن تغيّر."""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        flights = json.loads(raw.decode("utf-8"))
+        if not isinstance(flights, list):
+            raise ValueError("ملف الرحلات يجب أن يكون قائمة JSON")
+        self._build([f for f in flights if isinstance(f, dict)])
+        self.version = hashlib.sha1(raw).hexdigest()[:12]
+        self._stamp = stamp
+        self._cache.clear()
+        return True
+
+    def maybe_reload(self):
+        """فحص تغيّر الملف بحد أقصى مرة كل RELOAD_INTERVAL (الاستطلاع المتكرر لا يكلف stat كل مرة)."""
+        now = time.monotonic()
+        if now - self._checked < RELOAD_INTERVAL:
+            return
+        self._checked = now
+        try:
+            self.reload()
+        except (OSError, ValueError) as e:
+            # ملف يُكتب الآن أو تالف: نستمر بالنسخة المحمّلة
+            print(f"تعذّر إعادة تحميل الرحلات: {e}")
+
+    def _build(self, flights: List[dict]):
+        self.flights = flights
+        self.by_code: Dict[str, int] = {}
+        self.indexes: Dict[str, Dict[str, List[int]]] = {name: {} for name in INDEXED_FIELDS}
+        self.search_text: List[str] = []
+        for i, f in enumerate(flights):
+            self.by_code.setdefault(str(f.get("code") or "").lower(), i)
+            for name in INDEXED_FIELDS:
+                self.indexes[name].setdefault(str(f.get(name) or "").lower(), []).append(i)
+            # نفس نص البحث في js/flights.js: الرقم + الوجهة + الشركة
+            self.search_text.append(f"{f.get('code')} {f.get('destination')} {f.get('airline')}".lower())
+        # ترتيب كامل لكل مفتاح فرز (ثابت: التعادل بترتيب الملف) ورتبة كل رحلة فيه
+        self.orders: Dict[str, List[int]] = {}
+        self.ranks: Dict[str, List[int]] = {}
+        for key in SORT_KEYS:
+            order = sorted(range(len(flights)), key=lambda i: str(flights[i].get(key) or ""))
+            rank = [0] * len(flights)
+            for r, i in enumerate(order):
+                rank[i] = r
+            self.orders[key], self.ranks[key] = order, rank
+
+    # -------------------------
+    # الاستعلام
+    # -------------------------
+    def select(self, q: str = "", sort: str = "", filters: Optional[Dict[str, str]] = None) -> Sequence[int]:
+        """
+        مواضع الرحلات المطابقة بالترتيب المطلوب:
+        تقاطع الفهارس (نبدأ بأصغر قائمة) ثم الفرز برتبة محسوبة مسبقًا ثم البحث النصي.
+        """
+        lists = [self.indexes[name].get(value, []) for name, value in (filters or {}).items()]
+        if lists:
+            lists.sort(key=len)
+            rest = [set(other) for other in lists[1:]]
+            candidates = [i for i in lists[0] if all(i in s for s in rest)]
+            if sort in self.orders:
+                candidates.sort(key=self.ranks[sort].__getitem__)
+        elif sort in self.orders:
+            candidates = self.orders[sort]
+        else:
+            candidates = range(len(self.flights))
+        if q:
+            text = self.search_text
+            return [i for i in candidates if q in text[i]]
+        return candidates
+
+    def page(self, query: Dict[str, str]) -> Encoded:
+        """صفحة واحدة من نتائج الاستعلام (من الذاكرة المؤقتة إن طُلبت بنفس المعاملات)."""
+        key = self.normalize(query)
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            return hit
+        q, sort, page, page_size, filters = key
+        positions = self.select(q, sort, dict(filters))
+        total = len(positions)
+        pages = max(1, -(-total // page_size))
+        page = min(page, pages)
+        start = (page - 1) * page_size
+        payload = {"items": [self.flights[i] for i in positions[start:start + page_size]],
+                   "page": page, "pages": pages, "page_size": page_size, "total": total}
+        return self._remember(key, payload)
+
+    def flight(self, code: str) -> Encoded:
+        key = ("code", code.lower())
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            return hit
+        i = self.by_code.get(code.lower())
+        if i is None:
+            raise ApiError(404, "الرحلة غير موجودة")
+        return self._remember(key, self.flights[i])
+
+    def _remember(self, key: tuple, payload) -> Encoded:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        enc = Encoded(f'"{self.version}-{digest}"', body)
+        self._cache[key] = enc
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return enc
+
+    @staticmethod
+    def normalize(query: Dict[str, str]) -> tuple:
+        """معاملات الاستعلام بصيغة موحدة (مفتاح الذاكرة المؤقتة وأساس ETag)."""
+        try:
+            page = max(1, int(query.get("page") or 1))
+            page_size = min(MAX_PAGE_SIZE, max(1, int(query.get("page_size") or PAGE_SIZE)))
+        except ValueError:
+            raise ApiError(400, "page و page_size يجب أن تكون أعدادًا صحيحة")
+        sort = query.get("sort") or ""
+        if sort and sort not in SORT_KEYS:
+            raise ApiError(400, f"sort غير معروف: {sort} (المتاح: {', '.join(SORT_KEYS)})")
+        filters = tuple(sorted((name, query[name].strip().lower()) for name in INDEXED_FIELDS
+                               if (query.get(name) or "").strip()))
+        return ((query.get("q") or "").strip().lower(), sort, page, page_size, filters)
+
+
+# -------------------------
+# الملفات الثابتة
+# -------------------------
+def static_file(path: str) -> Encoded:
+    """ملف من مجلد الموقع مع ETag من بصمته (لا نسمح بالخروج من المجلد)."""
+    rel = unquote(path).lstrip("/") or "index.html"
+    full = os.path.realpath(os.path.join(SITE_DIR, rel))
+    if not full.startswith(SITE_DIR + os.sep) or not os.path.isfile(full):
+        raise ApiError(404, "غير موجود")
+    st = os.stat(full)
+    with open(full, "rb") as f:
+        body = f.read()
+    ctype = mimetypes.guess_type(full)[0] or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in ("application/javascript", "application/json"):
+        ctype += "; charset=utf-8"
+    return Encoded(f'"{st.st_mtime_ns:x}-{st.st_size:x}"', body, ctype)
+
+
+# -------------------------
+# HTTP
+# -------------------------
+async def read_request(reader: asyncio.StreamReader):
+    """قراءة طلب واحد: (method, target, version, headers) أو None عند إغلاق الاتصال."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").strip().split(" ", 2)
+    except ValueError:
+        raise ApiError(400, "سطر طلب غير صالح")
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    # طلبات GET فقط؛ نقرأ أي جسم مرسل ونتجاهله حتى لا يفسد الطلب التالي على نفس الاتصال
+    length = int(headers.get("content-length", 0) or 0)
+    if length:
+        await reader.readexactly(length)
+    return method.upper(), target, version, headers
+
+
+def not_modified(enc: Encoded, headers: Dict[str, str]) -> bool:
+    """If-None-Match يطابق ETag الاستجابة (بأي من نسختيها: العادية أو المضغوطة)."""
+    given = headers.get("if-none-match")
+    if not given:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in given.split(",")}
+    return "*" in tags or enc.etag in tags or enc.etag[:-1] + '-gz"' in tags
+
+
+def encode_response(status: int, enc: Encoded, headers: Dict[str, str],
+                    keep_alive: bool, head_only: bool = False) -> bytes:
+    """
+    رأس الاستجابة وجسمها. النسخة المضغوطة لها ETag مختلف (-gz) كما يطلب HTTP لتمثيل مختلف،
+    و Cache-Control: no-cache يجعل المتصفح يعيد التحقق في كل استطلاع (فيحصل على 304 غالبًا).
+    """
+    use_gzip = (len(enc.body) >= GZIP_MIN_BYTES
+                and "gzip" in headers.get("accept-encoding", "").lower())
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}"]
+    if enc.etag:
+        etag = enc.etag[:-1] + '-gz"' if use_gzip else enc.etag
+        lines += [f"ETag: {etag}", "Cache-Control: no-cache", "Vary: Accept-Encoding"]
+    data = b""
+    if status != 304:
+        data = enc.gzipped() if use_gzip else enc.body
+        lines.append(f"Content-Type: {enc.ctype}")
+        if use_gzip:
+            lines.append("Content-Encoding: gzip")
+    lines.append(f"Content-Length: {len(data)}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    return head if head_only else head + data
+
+
+def error_body(status: int, message: str) -> Encoded:
+    body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+    return Encoded("", body)   # بلا ETag: الأخطاء لا تُخزَّن ولا يُعاد التحقق منها
+
+
+def route(board: FlightBoard, method: str, path: str, query: Dict[str, str]) -> Encoded:
+    if method not in ("GET", "HEAD"):
+        raise ApiError(405, "المسموح GET فقط")
+    if path == "/flights":
+        board.maybe_reload()
+        return board.page(query)
+    if path.startswith("/flights/"):
+        board.maybe_reload()
+        return board.flight(unquote(path[len("/flights/"):]))
+    return static_file(path)
+
+
+async def handle_connection(board: FlightBoard, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter):
+    """خدمة اتصال واحد (يدعم keep-alive لعدة طلبات متتالية)."""
+    try:
+        while True:
+            keep_alive = False
+            method, headers = "GET", {}
+            try:
+                req = await read_request(reader)
+                if req is None:
+                    break
+                method, target, version, headers = req
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                enc = route(board, method, url.path, query)
+                status = 304 if not_modified(enc, headers) else 200
+            except ApiError as e:
+                status, enc = e.status, error_body(e.status, e.message)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as e:  # لا نسقط الخادم بسبب طلب واحد
+                status, enc = 500, error_body(500, f"{type(e).__name__}: {e}")
+            writer.write(encode_response(status, enc, headers, keep_alive, head_only=(method == "HEAD")))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(board: FlightBoard, host: str = "127.0.0.1", port: int = 8000):
+    """تشغيل الخادم حتى الإيقاف."""
+    server = await asyncio.start_server(lambda r, w: handle_connection(board, r, w), host, port)
+    print(f"لوحة الرحلات تعمل على http://{host}:{port}/flights.html ({len(board.flights)} رحلة)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SkyPort flight board HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data", default=DATA_FILE, help="ملف الرحلات (قائمة JSON)")
+    args = parser.parse_args()
+    board = FlightBoard(args.data)
+    try:
+        asyncio.run(serve(board, args.host, args.port))
+    except KeyboardInterrupt:
+        print("تم إيقاف الخادم.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,69 @@
 $(document).ready(function () {
   const $tbody = $('#flights-table tbody');
   const $pagination = $('#pagination');
-  let flights = [];
+  let flights = [];      // رحلات الصفحة الحالية فقط
   let currentPage = 1;
+  let totalPages = 1;
   const pageSize = 8;
+  const pollMs = 30000;  // إعادة الاستطلاع: الخادم يرد 304 إن لم يتغير شيء
+  let allFlights = null; // احتياطي: الملف كاملًا عند العمل بلا flight_board.py (خادم ملفات ثابتة)
+
+  // معاملات الاستعلام الحالية (البحث والحالة والفرز والصفحة)
+  function currentQuery() {
+    return {
+      q: ($('#flight-search').val() || '').toLowerCase().trim(),
+      status: $('#filter-status').val() || '',
+      sort: $('#sort-by').val() || '',
+      page: currentPage,
+      page_size: pageSize
+    };
+  }
 
-  // تحميل البيانات من JSON
+  // تحميل الصفحة المطلوبة فقط من الخادم (GET /flights)
   function loadFlights() {
-    return $.getJSON('/data/flights.json') // تأكد أن المسار صحيح
+    const query = currentQuery();
+    if (allFlights) return $.Deferred().resolve(showPage(localQuery(query))).promise();
+    return $.getJSON('/flights', query)
+      .done(showPage)
+      .fail(function (xhr) {
+        if (xhr.status === 404) return loadAllFlights();
+        toastr.error('فشل تحميل بيانات الرحلات');
+      });
+  }
+
+  // بلا خدمة flight_board.py: تحميل الملف كاملًا مرة واحدة والاستعلام في المتصفح
+  function loadAllFlights() {
+    return $.getJSON('/data/flights.json')
       .done(function (data) {
-        flights = data;
-        renderTable();
+        allFlights = data;
+        showPage(localQuery(currentQuery()));
       })
       .fail(function () {
         toastr.error('فشل تحميل بيانات الرحلات');
       });
   }
 
+  // نفس منطق الخادم: فلتر الحالة ثم البحث ثم الفرز ثم الصفحة
+  function localQuery(query) {
+    let list = allFlights.slice();
+    if (query.status) list = list.filter(x => (x.status || '').toLowerCase() === query.status.toLowerCase());
+    if (query.q) {
+      list = list.filter(x => (x.code + ' ' + x.destination + ' ' + x.airline).toLowerCase().indexOf(query.q) !== -1);
+    }
+    if (query.sort) list.sort((a, b) => (a[query.sort] || '').localeCompare(b[query.sort] || ''));
+    const pages = Math.max(1, Math.ceil(list.length / query.page_size));
+    const page = Math.min(query.page, pages);
+    const start = (page - 1) * query.page_size;
+    return { items: list.slice(start, start + query.page_size), page: page, pages: pages, total: list.length };
+  }
+
+  function showPage(data) {
+    flights = data.items;
+    currentPage = data.page;
+    totalPages = data.pages;
+    renderTable();
+  }
+
   // دالة لتحديد لون حالة الرحلة
   function statusClass(s) {
     if (!s) s = '';
@@ -30,8 +77,7 @@ $(document).ready(function () {
   // عرض الجدول
   function renderTable() {
     $tbody.empty();
-    const start = (currentPage - 1) * pageSize;
-    const pageItems = flights.slice(start, start + pageSize);
+    const pageItems = flights;
 
     if (pageItems.length === 0) {
       $tbody.append('<tr><td colspan="8" class="text-center small text-muted">لا توجد نتائج</td></tr>');
@@ -58,49 +104,23 @@ $(document).ready(function () {
   // عرض Pagination
   function renderPagination() {
     $pagination.empty();
-    const totalPages = Math.max(1, Math.ceil(flights.length / pageSize));
 
     for (let i = 1; i <= totalPages; i++) {
       const li = $('<li>').addClass('page-item ' + (i === currentPage ? 'active' : ''));
       const a = $('<a>').addClass('page-link').attr('href', '#').text(i).on('click', function (e) {
         e.preventDefault();
         currentPage = i;
-        renderTable();
+        loadFlights();
       });
       li.append(a);
       $pagination.append(li);
     }
   }
 
-  // تطبيق الفلاتر والبحث والفرز
+  // تطبيق الفلاتر والبحث والفرز (على الخادم)، والعودة للصفحة الأولى
   function applyFilters() {
-    const q = ($('#flight-search').val() || '').toLowerCase().trim();
-    const status = $('#filter-status').val();
-    const sortBy = $('#sort-by').val();
-    let list = flights.slice(); // نسخة من البيانات
-
-    // فلتر حسب الحالة
-    if (status) list = list.filter(x => (x.status || '').toLowerCase() === status.toLowerCase());
-
-    // فلتر حسب البحث
-    if (q) {
-      list = list.filter(x => {
-        const str = (x.code + ' ' + x.destination + ' ' + x.airline).toLowerCase();
-        return str.indexOf(q) !== -1;
-      });
-    }
-
-    // فرز
-    list.sort(function (a, b) {
-      if (sortBy === 'departure_time') return (a.departure_time || '').localeCompare(b.departure_time || '');
-      if (sortBy === 'destination') return (a.destination || '').localeCompare(b.destination || '');
-      if (sortBy === 'code') return (a.code || '').localeCompare(b.code || '');
-      return 0;
-    });
-
-    flights = list;
     currentPage = 1;
-    renderTable();
+    loadFlights();
   }
 
   // فتح تفاصيل الرحلة في Modal
@@ -136,6 +156,7 @@ $(document).ready(function () {
   $('#search-btn').on('click', applyFilters);
   $('#filter-status, #sort-by').on('change', applyFilters);
 
-  // تحميل البيانات أولاً
+  // تحميل البيانات أولاً ثم تحديث الصفحة الحالية دوريًا
   loadFlights();
+  setInterval(loadFlights, pollMs);
 });
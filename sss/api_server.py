@@ -0,0 +1,395 @@
+# api_server.py
+# خادم HTTP/JSON غير متزامن (asyncio) أمام خدمات معرض السيارات.
+# - مخزن واحد (DataStore) في الذاكرة مشترك بين كل العملاء المتزامنين.
+# - القراءة تُنفَّذ مباشرة في حلقة الأحداث، والكتابة متسلسلة (قفل كتابة واحد) وتعمل في خيط
+#   منفصل حتى لا يوقف الحفظ على القرص بقية الطلبات.
+# - الشراء محمي بقفل لكل سيارة: مشتريان متزامنان لنفس السيارة لا يحصلان أبدًا على فاتورتين.
+# لا يعتمد على مكتبات خارجية.
+#
+# التشغيل: python api_server.py --port 8080 [--data data_store.json]
+#
+# المسارات:
+#   POST /login              {"username", "password"}          -> {"token", "user"}
+#   POST /logout
+#   POST /register           {"username", "password", "phone", "gender"}
+#   GET  /cars               ?status=&price_min=&price_max=&year_min=&year_max=&color=&sort=&limit=&cursor=&facets=
+#   GET  /cars/search        ?q=&in_specs=
+#   GET  /cars/<id>
+#   POST /cars               {"name", "model_year", "price", "color", "specs"}   (موظف مبيعات/مدير)
+#   POST /purchase           {"car_id", "customer"?}            (customer لموظف المبيعات/المدير فقط)
+#   GET  /invoices/mine      ?limit=&cursor=
+#   GET  /reports/summary                                        (مدير)
+#   GET  /reports/top-customers ?n=                              (مدير)
+#   GET  /metrics            ?format=json                       (مع --metrics فقط؛ افتراضيًا صيغة Prometheus)
+
+import argparse
+import asyncio
+import json
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation
+from car_dealership_oop_full_commented import (DATA_FILE, AuthService, CarService, CompactUtil,
+                                               DataStore, ReportGenerator, SalesService, User)
+
+SESSION_TTL = 8 * 3600          # مدة صلاحية جلسة تسجيل الدخول بالثواني
+MAX_BODY = 1024 * 1024          # أكبر حجم مقبول لجسم الطلب
+EXPIRY_INTERVAL = 30            # فاصل فحص الحجوزات المنتهية بالثواني (يُعيدها "available")
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+               403: "Forbidden", 404: "Not Found", 409: "Conflict", 413: "Payload Too Large",
+               500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """خطأ يُعاد للعميل كـ JSON مع رمز حالة HTTP."""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class StoreGate:
+    """
+    تنسيق الوصول للمخزن المشترك:
+    - write(fn): الكتابات متسلسلة بقفل واحد، وتُنفَّذ في خيط كاتب واحد (الحفظ لا يوقف الحلقة).
+    - read(fn): تنتظر انتهاء أي كتابة جارية ثم تُنفَّذ مباشرة في الحلقة؛ لأنها بدون await
+      لا يمكن أن تبدأ كتابة أثناءها، فلا ترى القراءة حالة نصف معدلة.
+    - car_lock(car_id): قفل لكل سيارة يسلسل عمليات الشراء على نفس السيارة.
+    """
+    def __init__(self):
+        self.write_lock = asyncio.Lock()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store-writer")
+        self._car_locks: Dict[str, asyncio.Lock] = {}
+
+    async def read(self, fn, *args):
+        await self.idle.wait()
+        return fn(*args)
+
+    async def write(self, fn, *args):
+        async with self.write_lock:
+            self.idle.clear()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.writer, fn, *args)
+            finally:
+                self.idle.set()
+
+    def car_lock(self, car_id: str) -> asyncio.Lock:
+        lock = self._car_locks.get(car_id)
+        if lock is None:
+            lock = self._car_locks[car_id] = asyncio.Lock()
+        return lock
+
+    def release_car_lock(self, car_id: str):
+        """حذف قفل السيارة بعد انتهاء الشراء إن لم ينتظره أحد (حتى لا تتراكم الأقفال)."""
+        lock = self._car_locks.get(car_id)
+        if lock is not None and not lock.locked():
+            del self._car_locks[car_id]
+
+
+class DealershipApi:
+    """توجيه الطلبات إلى AuthService/CarService/SalesService/ReportGenerator."""
+    def __init__(self, store: DataStore):
+        self.store = store
+        self.auth = AuthService(store)
+        self.cars = CarService(store)
+        self.sales = SalesService(store)
+        self.report = ReportGenerator(store)
+        self.gate = StoreGate()
+        # token -> (username, وقت الانتهاء)
+        self.sessions: Dict[str, Tuple[str, float]] = {}
+
+    # -------------------------
+    # الجلسات والصلاحيات
+    # -------------------------
+    async def _session_user(self, headers: dict) -> Optional[User]:
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Bearer "):
+            return None
+        token = auth[7:].strip()
+        entry = self.sessions.get(token)
+        if entry is None or entry[1] < time.time():
+            self.sessions.pop(token, None)
+            return None
+        user = await self.gate.read(self.store.find_user_by_username, entry[0])
+        return user if user is not None and user.is_active else None
+
+    async def _require(self, headers: dict, *usertypes: str) -> User:
+        user = await self._session_user(headers)
+        if user is None:
+            raise ApiError(401, "سجّل الدخول أولًا")
+        if usertypes and user.usertype not in usertypes:
+            raise ApiError(403, "لا تملك صلاحية هذه العملية")
+        return user
+
+    @staticmethod
+    def _public_user(user: User) -> dict:
+        data = user.to_dict()
+        data.pop("password_hash", None)
+        return data
+
+    # -------------------------
+    # التوجيه
+    # -------------------------
+    async def dispatch(self, method: str, path: str, query: dict, headers: dict, body: dict):
+        """اختيار المعالج حسب الطريقة والمسار؛ نعيد (رمز الحالة, dict)."""
+        parts = [p for p in path.split("/") if p]
+        if method == "POST" and parts == ["login"]:
+            return await self.login(body)
+        if method == "POST" and parts == ["logout"]:
+            token = headers.get("authorization", "")[7:].strip()
+            self.sessions.pop(token, None)
+            return 200, {"ok": True}
+        if method == "POST" and parts == ["register"]:
+            return await self.register(body)
+        if method == "GET" and parts == ["cars"]:
+            return await self.list_cars(query)
+        if method == "GET" and parts == ["cars", "search"]:
+            q = query.get("q", "")
+            in_specs = query.get("in_specs") in ("1", "true")
+            cars = await self.gate.read(self.cars.search, q, in_specs)
+            return 200, {"items": [c.to_dict() for c in cars[:int(query.get("limit", 50))]]}
+        if method == "GET" and len(parts) == 2 and parts[0] == "cars":
+            car = await self.gate.read(self.store.find_car_by_id, parts[1])
+            if car is None:
+                raise ApiError(404, "السيارة غير موجودة")
+            return 200, car.to_dict()
+        if method == "POST" and parts == ["cars"]:
+            return await self.add_car(headers, body)
+        if method == "POST" and parts == ["purchase"]:
+            return await self.purchase(headers, body)
+        if method == "GET" and parts == ["invoices", "mine"]:
+            user = await self._require(headers)
+            page = await self.gate.read(self.store.invoices_for_customer, user.username,
+                                        int(query.get("limit", 20)), query.get("cursor"))
+            return 200, {"items": [i.to_dict() for i in page["items"]],
+                         "next_cursor": page["next_cursor"]}
+        if method == "GET" and parts == ["reports", "summary"]:
+            await self._require(headers, "Admin")
+            return 200, await self.gate.read(self.report.summary)
+        if method == "GET" and parts == ["reports", "top-customers"]:
+            await self._require(headers, "Admin")
+            top = await self.gate.read(self.report.top_customers_by_points, int(query.get("n", 5)))
+            return 200, {"items": [{"username": u.username, "loyalty_points": u.loyalty_points}
+                                   for u in top]}
+        if method == "GET" and parts == ["metrics"]:
+            metrics = instrumentation.active()
+            if metrics is None:
+                raise ApiError(404, "القياس غير مفعل (شغّل الخادم مع --metrics)")
+            if query.get("format") == "json":
+                return 200, metrics.to_json()
+            return 200, metrics.to_prometheus()
+        raise ApiError(404, "مسار غير معروف")
+
+    # -------------------------
+    # المعالجات
+    # -------------------------
+    async def login(self, body: dict):
+        user = await self.gate.read(self.auth.login, str(body.get("username", "")),
+                                    str(body.get("password", "")))
+        if user is None:
+            raise ApiError(401, "بيانات الدخول غير صحيحة")
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = (user.username, time.time() + SESSION_TTL)
+        return 200, {"token": token, "user": self._public_user(user)}
+
+    async def register(self, body: dict):
+        # التسجيل العام ينشئ حسابات عملاء فقط (مثل القائمة النصية)
+        user = await self.gate.write(self.auth.register, str(body.get("username", "")),
+                                     str(body.get("password", "")), "Customer",
+                                     str(body.get("phone", "")), str(body.get("gender", "M")))
+        if user is None:
+            raise ApiError(400, "تعذر إنشاء الحساب (تحقق من الاسم وكلمة المرور والهاتف)")
+        return 201, self._public_user(user)
+
+    async def list_cars(self, query: dict):
+        def num(key, cast):
+            return cast(query[key]) if query.get(key) not in (None, "") else None
+        try:
+            result = await self.gate.read(lambda: self.cars.query(
+                status=query.get("status") or None, color=query.get("color") or None,
+                price_min=num("price_min", float), price_max=num("price_max", float),
+                year_min=num("year_min", int), year_max=num("year_max", int),
+                sort=query.get("sort", "price") or None, limit=min(int(query.get("limit", 20)), 200),
+                cursor=query.get("cursor") or None, facets=query.get("facets") in ("1", "true")))
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        result["items"] = [c.to_dict() for c in result["items"]]
+        return 200, result
+
+    async def add_car(self, headers: dict, body: dict):
+        await self._require(headers, "SalesEmployee", "Admin")
+        try:
+            model_year, price = int(body["model_year"]), float(body["price"])
+            name = str(body["name"])
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(400, "name و model_year و price مطلوبة وبقيم صحيحة")
+        car = await self.gate.write(self.cars.add_car, name, model_year, price,
+                                    str(body.get("color", "")), str(body.get("specs", "")))
+        return 201, car.to_dict()
+
+    def _purchase_status(self, car_id: str, customer: str) -> int:
+        """
+        200 إن كانت السيارة متاحة (أو محجوزة لنفس المشتري، أو انتهى حجزها ولم يُفحص بعد)،
+        404 إن لم توجد، وإلا 409. buy_car نفسه ينهي الحجوزات المنتهية قبل البيع.
+        """
+        car = self.store.find_car_by_id(car_id)
+        if car is None:
+            return 404
+        if car.status == "reserved":
+            lapsed = car.reserved_ts is not None and car.reserved_ts <= CompactUtil.now_ts()
+            return 200 if lapsed or car.reserved_by == customer else 409
+        return 200 if car.status == "available" else 409
+
+    async def expire_reservations(self):
+        """
+        مهمة دورية: إعادة الحجوزات المنتهية إلى "available" عبر قفل الكتابة
+        (بدونها لا يفحصها إلا الشراء/الحجز، فتبقى القوائم تعرضها محجوزة).
+        """
+        while True:
+            await asyncio.sleep(EXPIRY_INTERVAL)
+            try:
+                due = await self.gate.read(self.store.reservations.due, self.store,
+                                           CompactUtil.now_ts())
+                if due:
+                    await self.gate.write(self.sales.expire_reservations)
+            except Exception as e:  # لا نوقف المهمة بسبب فشل حفظ واحد
+                print(f"تعذّر إنهاء الحجوزات المنتهية: {e}")
+
+    async def purchase(self, headers: dict, body: dict):
+        user = await self._require(headers)
+        customer = user.username
+        if body.get("customer") and user.usertype in ("SalesEmployee", "Admin"):
+            customer = str(body["customer"])
+        car_id = str(body.get("car_id", ""))
+        lock = self.gate.car_lock(car_id)
+        try:
+            async with lock:
+                # فحص سريع قبل انتظار قفل الكتابة العام: المشتري الثاني يُرفض مباشرة
+                # (عبر gate.read: لا نرى سيارة يعدّلها خيط الكتابة الآن)
+                status = await self.gate.read(self._purchase_status, car_id, customer)
+                if status == 404:
+                    raise ApiError(404, "السيارة غير موجودة")
+                if status == 409:
+                    raise ApiError(409, "السيارة غير متاحة للشراء")
+                inv = await self.gate.write(self.sales.buy_car, customer, car_id)
+        finally:
+            self.gate.release_car_lock(car_id)
+        if inv is None:
+            raise ApiError(409, "السيارة غير متاحة للشراء")
+        return 201, inv.to_dict()
+
+
+# ---------------------------------------------------------------------
+# طبقة HTTP/1.1 مبسطة فوق asyncio streams
+# ---------------------------------------------------------------------
+async def read_request(reader: asyncio.StreamReader):
+    """قراءة طلب واحد: (method, target, version, headers, body) أو None عند إغلاق الاتصال."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").strip().split(" ", 2)
+    except ValueError:
+        raise ApiError(400, "سطر طلب غير صالح")
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY:
+        raise ApiError(413, "جسم الطلب كبير جدًا")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version, headers, body
+
+
+def encode_response(status: int, payload, keep_alive: bool) -> bytes:
+    # النص (مثل قياسات Prometheus) يُرسل كما هو، وغير ذلك JSON
+    if isinstance(payload, str):
+        data, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        data, ctype = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}\r\n"
+            f"Content-Type: {ctype}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + data
+
+
+async def handle_connection(api: DealershipApi, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter):
+    """خدمة اتصال واحد (يدعم keep-alive لعدة طلبات متتالية)."""
+    try:
+        while True:
+            keep_alive = False
+            try:
+                req = await read_request(reader)
+                if req is None:
+                    break
+                method, target, version, headers, raw = req
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    raise ApiError(400, "JSON غير صالح")
+                if not isinstance(body, dict):
+                    raise ApiError(400, "الجسم يجب أن يكون كائن JSON")
+                status, payload = await api.dispatch(method, url.path, query, headers, body)
+            except ApiError as e:
+                status, payload = e.status, {"error": e.message}
+            except (ValueError, TypeError) as e:
+                status, payload = 400, {"error": str(e)}
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as e:  # لا نسقط الخادم بسبب طلب واحد
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            writer.write(encode_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(store: DataStore, host: str = "127.0.0.1", port: int = 8080):
+    """تشغيل الخادم حتى الإيقاف."""
+    api = DealershipApi(store)
+    server = await asyncio.start_server(lambda r, w: handle_connection(api, r, w), host, port)
+    expiry = asyncio.create_task(api.expire_reservations())
+    print(f"الخادم يعمل على http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        expiry.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Car dealership HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", default=DATA_FILE, help="ملف البيانات (.json أو .db)")
+    parser.add_argument("--metrics", action="store_true", help="تفعيل القياس وإتاحته على GET /metrics")
+    args = parser.parse_args()
+    if args.metrics:
+        instrumentation.enable()
+    store = DataStore(args.data)
+    try:
+        asyncio.run(serve(store, args.host, args.port))
+    except KeyboardInterrupt:
+        print("تم إيقاف الخادم.")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_analytics.py
+# قياس تحليلات المبيعات العمودية (sales_analytics) على عدد كبير من الفواتير (افتراضيًا 5M).
+# الأعمدة تُولَّد مباشرة (بدون إنشاء ملايين كائنات Invoice) لقياس التجميع نفسه،
+# ومع --from-objects نقيس أيضًا بناء الأعمدة من كائنات Invoice.
+# التشغيل: python benchmarks/bench_analytics.py [--count 5000000] [--from-objects]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sales_analytics  # noqa: E402
+from car_dealership_oop_full_commented import Car, DataStore, Invoice  # noqa: E402
+from sales_analytics import InvoiceColumns, SalesAnalytics  # noqa: E402
+
+START_TS = 1_577_836_800  # 2020-01-01
+SPAN = 6 * 365 * 86400    # ست سنوات من الفواتير
+
+
+def synthetic_columns(count: int, customers: int, cars: int) -> InvoiceColumns:
+    """أعمدة اصطناعية: تواريخ موزعة على سنوات، عملاء بنشاط غير متساوٍ."""
+    rnd = random.Random(7)
+    ts = array("q", sorted(START_TS + rnd.randrange(SPAN) for _ in range(count)))
+    price = array("d", (float(rnd.randrange(5000, 90000)) for _ in range(count)))
+    # توزيع باريتو: قلة من العملاء يشترون كثيرًا
+    customer = array("l", (min(int(rnd.paretovariate(1.2)) - 1, customers - 1) for _ in range(count)))
+    car = array("l", (rnd.randrange(cars) for _ in range(count)))
+    cols = InvoiceColumns(ts, price, customer, car,
+                          [f"customer{i}" for i in range(customers)],
+                          [f"car-{i:08x}" for i in range(cars)])
+    return cols.as_numpy() if sales_analytics.np is not None else cols
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar sales analytics benchmark")
+    parser.add_argument("--count", type=int, default=5_000_000)
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--cars", type=int, default=50_000)
+    parser.add_argument("--from-objects", action="store_true",
+                        help="also time building columns from Invoice objects")
+    args = parser.parse_args()
+
+    print(f"invoices: {args.count}  backend: {'numpy' if sales_analytics.np is not None else 'array'}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = DataStore(os.path.join(tmpdir, "bench.json"))
+        for i in range(min(args.cars, 1000)):
+            car = Car(f"MODEL {i % 40}", 2020, 10000.0, "white")
+            car.id = f"car-{i:08x}"
+            store.add_car(car)
+        analytics = SalesAnalytics(store)
+        analytics.columns = timed("generate columns", lambda: synthetic_columns(
+            args.count, args.customers, args.cars))
+        if args.from_objects:
+            n = min(args.count, 1_000_000)
+            invoices = [Invoice(f"customer{i % 1000}", f"car-{i % 1000:08x}", 1000.0, 1) for i in range(n)]
+            timed(f"from_invoices ({n} objects)", lambda: InvoiceColumns.from_invoices(invoices))
+        timed("revenue_by_period(day)", lambda: analytics.revenue_by_period("day"))
+        timed("revenue_by_period(week)", lambda: analytics.revenue_by_period("week"))
+        timed("revenue_by_period(month)", lambda: analytics.revenue_by_period("month"))
+        timed("revenue_by_period(month, 1 year range)",
+              lambda: analytics.revenue_by_period("month", "2023-01-01", "2024-01-01"))
+        timed("sales_by_car_name", analytics.sales_by_car_name)
+        timed("average_ticket_by_customer", analytics.average_ticket_by_customer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_import.py
+# قياس الاستيراد الجماعي للسيارات (CarService.bulk_import) مقابل add_car لكل سيارة
+# (الطريقة القديمة عبر القائمة: كل سيارة تعيد كتابة ملف البيانات كاملًا).
+# التشغيل: python benchmarks/bench_import.py [--count 100000] [--legacy 500] [--chunk 0]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from car_dealership_oop_full_commented import CarService, DataStore  # noqa: E402
+
+NAMES = ["Toyota Camry", "Honda Civic", "Kia Rio", "Hyundai Elantra", "Nissan Sunny", "BMW X5"]
+COLORS = ["white", "black", "red", "silver", "blue"]
+
+
+def write_file(path: str, count: int, fmt: str):
+    """ملف شحنة اصطناعية: CSV بسطر عناوين أو JSONL."""
+    rnd = random.Random(7)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            f.write("id,name,model_year,price,color,specs\n")
+        for i in range(count):
+            row = {"id": f"car-imp{i:07d}", "name": rnd.choice(NAMES),
+                   "model_year": rnd.randrange(2010, 2026), "price": rnd.randrange(5000, 90000),
+                   "color": rnd.choice(COLORS), "specs": "auto"}
+            if fmt == "csv":
+                f.write(",".join(str(v) for v in row.values()) + "\n")
+            else:
+                f.write(json.dumps(row) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk car import benchmark")
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--legacy", type=int, default=500,
+                        help="عدد السيارات للقياس بالطريقة القديمة (add_car لكل سيارة)")
+    parser.add_argument("--chunk", type=int, default=0, help="حجم الدفعة لكل حفظ (0 = حفظ واحد)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for fmt in ("csv", "jsonl"):
+            src = os.path.join(tmpdir, f"cars.{fmt}")
+            write_file(src, args.count, fmt)
+            store = DataStore(os.path.join(tmpdir, f"bulk_{fmt}.json"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = CarService(store).bulk_import(src, chunk_size=args.chunk)
+            elapsed = time.perf_counter() - start
+            print(f"bulk_import {fmt:5}: {result['imported']} cars in {elapsed:6.2f} s "
+                  f"({result['imported'] / elapsed:,.0f} cars/s)")
+
+        # الطريقة القديمة: حفظ كامل بعد كل سيارة (نقيس عددًا صغيرًا ونقدّر للعدد الكامل)
+        store = DataStore(os.path.join(tmpdir, "legacy.json"))
+        service = CarService(store)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.legacy):
+                service.add_car(NAMES[i % len(NAMES)], 2020, 10000.0 + i, "white")
+        elapsed = time.perf_counter() - start
+        # كلفة كل حفظ تزيد خطيًا مع حجم الملف: الإجمالي تربيعي في عدد السيارات
+        estimate = elapsed * (args.count / args.legacy) ** 2
+        print(f"add_car x{args.legacy}: {elapsed:6.2f} s  -> ~{estimate / 3600:,.1f} h estimated for {args.count}")
+
+
+if __name__ == "__main__":
+    main()
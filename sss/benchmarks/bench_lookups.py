@@ -0,0 +1,59 @@
+# bench_lookups.py
+# قياس زمن البحث في DataStore (find_user_by_username / find_user_by_id / find_car_by_id)
+# عند أحجام مختلفة: الهدف أن يبقى الزمن ثابتًا تقريبًا من 1k إلى 1M سجل.
+# التشغيل: python benchmarks/bench_lookups.py [--sizes 1000,10000,100000,1000000]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# نضيف مجلد sss إلى المسار لاستيراد الموديول الرئيسي
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from car_dealership_oop_full_commented import Car, DataStore, User  # noqa: E402
+
+LOOKUPS = 100_000  # عدد عمليات البحث لكل قياس
+
+
+def build_store(n: int, tmpdir: str) -> DataStore:
+    """إنشاء DataStore في ملف مؤقت وتعبئته بـ n مستخدم و n سيارة (في الذاكرة فقط)."""
+    store = DataStore(os.path.join(tmpdir, f"bench_{n}.json"))
+    for i in range(n):
+        store.add_user(User(f"user{i}", "dummy"))
+        store.add_car(Car(f"CAR {i}", 2020, 10000.0 + i, "white"))
+    return store
+
+
+def time_lookups(fn, keys) -> float:
+    """متوسط زمن الاستدعاء الواحد بالنانوثانية."""
+    start = time.perf_counter()
+    for k in keys:
+        fn(k)
+    return (time.perf_counter() - start) / len(keys) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DataStore lookup benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    args = parser.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    print(f"{'records':>10} {'by_username':>14} {'by_user_id':>14} {'by_car_id':>14}   (ns/lookup)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in sizes:
+            store = build_store(n, tmpdir)
+            rnd = random.Random(n)
+            names = [store.users[rnd.randrange(n)].username for _ in range(LOOKUPS)]
+            uids = [store.users[rnd.randrange(n)].id for _ in range(LOOKUPS)]
+            cids = [store.cars[rnd.randrange(n)].id for _ in range(LOOKUPS)]
+            print(f"{n:>10} "
+                  f"{time_lookups(store.find_user_by_username, names):>14.0f} "
+                  f"{time_lookups(store.find_user_by_id, uids):>14.0f} "
+                  f"{time_lookups(store.find_car_by_id, cids):>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
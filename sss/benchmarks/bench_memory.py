@@ -0,0 +1,77 @@
+# bench_memory.py
+# قياس الذاكرة لكل فاتورة: التمثيل القديم (__dict__ + تاريخ نصي) مقابل Invoice الحالي
+# (__slots__ + اسم عميل مشترك + تاريخ كعدد صحيح).
+# التشغيل: python benchmarks/bench_memory.py [--count 1000000]
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from car_dealership_oop_full_commented import Invoice  # noqa: E402
+
+
+class LegacyInvoice:
+    """نسخة من شكل Invoice قبل التمثيل المضغوط (كائن عادي بـ __dict__ وتاريخ نصي)."""
+    def __init__(self, data: dict):
+        self.id = data["id"]
+        self.customer = data["customer"]
+        self.car_id = data["car_id"]
+        self.price = data["price"]
+        self.points_earned = data["points_earned"]
+        self.date = data["date"]
+
+
+def make_json(count: int, customers: int = 20_000) -> str:
+    """نص JSON لفواتير اصطناعية كما تُقرأ من data_store.json."""
+    rnd = random.Random(42)
+    rows = []
+    for i in range(count):
+        rows.append({
+            "id": f"inv-{i:08x}",
+            "customer": f"customer{rnd.randrange(customers)}",
+            "car_id": f"car-{rnd.randrange(1 << 32):08x}",
+            "price": float(rnd.randrange(8000, 90000)),
+            "points_earned": rnd.randrange(8, 90),
+            "date": f"20{rnd.randrange(18, 26)}-{rnd.randrange(1, 13):02d}-"
+                    f"{rnd.randrange(1, 29):02d} {rnd.randrange(24):02d}:"
+                    f"{rnd.randrange(60):02d}:{rnd.randrange(60):02d}",
+        })
+    return json.dumps({"invoices": rows})
+
+
+def measure(text: str, build) -> int:
+    """الذاكرة المتبقية (بايت) بعد تحميل JSON وبناء الكائنات وحذف الـ dicts المؤقتة."""
+    gc.collect()
+    tracemalloc.start()
+    raw = json.loads(text)["invoices"]
+    objs = [build(d) for d in raw]
+    del raw
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice memory benchmark")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    text = make_json(args.count)
+    before = measure(text, LegacyInvoice)
+    after = measure(text, Invoice.from_dict)
+    print(f"invoices:          {args.count}")
+    print(f"legacy (__dict__): {before / args.count:8.1f} bytes/record")
+    print(f"compact (slots):   {after / args.count:8.1f} bytes/record")
+    print(f"saving:            {100 * (1 - after / before):8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
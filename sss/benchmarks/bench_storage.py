@@ -0,0 +1,78 @@
+# bench_storage.py
+# مقارنة صيغ التخزين: JSON (indent=2، مع/بدون اللقطة الثنائية المخزنة مؤقتًا)
+# مقابل الصيغة الثنائية (binary_backend) بدون ضغط ومع zlib و lzma:
+# حجم الملف، زمن DataStore.load، وزمن حفظ كامل (store.save بعد تعديل سجل واحد).
+# البيانات من datagen.py (نفس مولد حزمة القياس suite.py).
+# التشغيل: python benchmarks/bench_storage.py [--records 100k] [--repeat 3]
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import binary_backend  # noqa: E402
+import datagen  # noqa: E402
+from car_dealership_oop_full_commented import DataStore, JsonBackend  # noqa: E402
+
+# (الاسم، امتداد الملف، بناء DataStore)
+FORMATS = (
+    ("json", ".json", lambda p: DataStore(p, backend=JsonBackend(p, cache=False))),
+    ("json+cache", ".json", lambda p: DataStore(p)),
+    ("bin", ".bin", lambda p: DataStore(p)),
+    ("bin.zlib", ".bin.zlib", lambda p: DataStore(p)),
+    ("bin.xz", ".bin.xz", lambda p: DataStore(p)),
+)
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage format benchmark")
+    parser.add_argument("--records", default="100k")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    n = datagen.parse_size(args.records)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "source.json")
+        datagen.generate(source, n)
+        print(f"{n:,} records | median of {args.repeat}")
+        print(f"{'format':12} {'size MiB':>10} {'load s':>9} {'save s':>9}")
+        for name, ext, open_store in FORMATS:
+            path = os.path.join(tmpdir, name + ext)
+            if ext == ".json":
+                shutil.copyfile(source, path)
+            else:
+                binary_backend.convert(source, path)
+            # التحميل الأول يبني اللقطة المخزنة مؤقتًا (إن وُجدت) فلا نحسبه
+            with contextlib.redirect_stdout(io.StringIO()):
+                store = open_store(path)
+            load = timed(lambda: open_store(path), args.repeat)
+            car = store.cars[0]
+
+            def save():
+                store.update_car(car, price=car.price + 1)
+                store.save()
+            save_s = timed(save, args.repeat)
+            print(f"{name:12} {os.path.getsize(path) / (1 << 20):10.2f} {load:9.3f} {save_s:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
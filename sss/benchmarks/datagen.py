@@ -0,0 +1,127 @@
+# datagen.py
+# مولد ملفات data_store.json اصطناعية وواقعية لقياس الأداء (1k حتى 10M سجل):
+# - 15% مستخدمون (قلة من المدراء والموظفين، والباقي عملاء)، 45% سيارات، 40% فواتير.
+# - نشاط العملاء غير متساوٍ (توزيع باريتو): قلة من العملاء يملكون معظم الفواتير.
+# - تواريخ الفواتير موزعة على عدة سنوات وبترتيب زمني (كما تُضاف في النظام).
+# - الكتابة بالتدفق سجلًا بسجل، فلا نبني dict بحجم 10M في الذاكرة.
+# التشغيل: python benchmarks/datagen.py --records 100k --out bench_100k.json
+
+import argparse
+import json
+import os
+import random
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from car_dealership_oop_full_commented import (SCHEMA_VERSION, HashUtil,  # noqa: E402
+                                               LoyaltySystem)
+
+# كلمة مرور كل المستخدمين الاصطناعيين (ليمكن قياس login)
+PASSWORD = "Bench@1234"
+NAMES = ["Toyota Camry", "Toyota Corolla", "Honda Civic", "Honda Accord", "Kia Rio",
+         "Kia Sportage", "Hyundai Elantra", "Hyundai Tucson", "Nissan Sunny", "Nissan Patrol",
+         "BMW X5", "Mercedes C200", "Ford Focus", "Chevrolet Malibu", "Mazda 6"]
+COLORS = ["white", "black", "silver", "red", "blue", "grey", "green"]
+SPECS = ["automatic", "manual", "hybrid", "diesel", "sunroof", "leather seats", "4x4"]
+START = datetime(2019, 1, 1)
+YEARS = 6
+
+
+def parse_size(text: str) -> int:
+    """"1k" / "100k" / "1m" / "10m" / "2500" -> عدد صحيح."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def size_label(n: int) -> str:
+    """عكس parse_size للعرض: 100000 -> "100k"."""
+    for unit, scale in (("m", 1_000_000), ("k", 1_000)):
+        if n >= scale and n % scale == 0:
+            return f"{n // scale}{unit}"
+    return str(n)
+
+
+def split(records: int) -> tuple:
+    """عدد المستخدمين والسيارات والفواتير لإجمالي records."""
+    users = max(3, records * 15 // 100)
+    invoices = records * 40 // 100
+    return users, records - users - invoices, invoices
+
+
+def username(i: int) -> str:
+    if i == 0:
+        return "admin0"
+    if i < 5:
+        return f"sales{i}"
+    return f"customer{i}"
+
+
+def generate(path: str, records: int, seed: int = 42) -> dict:
+    """كتابة ملف بيانات بحجم records سجل؛ نعيد عدد كل نوع."""
+    rnd = random.Random(seed)
+    n_users, n_cars, n_invoices = split(records)
+    password_hash = HashUtil.hash_password(PASSWORD)
+    span = YEARS * 365 * 86400
+    # تواريخ الفواتير مرتبة زمنيًا (الفواتير تُضاف بالترتيب في النظام)
+    offsets = array("q", sorted(rnd.randrange(span) for _ in range(n_invoices)))
+    points = array("q", bytes(8 * n_users))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{\n  "version": 1,\n  "schema_version": %d,\n  "cars": [' % SCHEMA_VERSION)
+        prices = array("d")
+        for i in range(n_cars):
+            # أسعار صحيحة كما في data_store.json الحقيقي والبيانات المرحّلة ("price": 20000)
+            price = int(round(rnd.lognormvariate(10, 0.5), -2)) or 1000
+            prices.append(price)
+            car = {"id": f"car-{i:08x}", "name": rnd.choice(NAMES),
+                   "model_year": rnd.randrange(2005, 2026), "price": price,
+                   "color": rnd.choice(COLORS), "specs": ", ".join(rnd.sample(SPECS, 2)),
+                   # أول n_invoices سيارة مباعة (فاتورة i تبيع السيارة i)
+                   "status": "sold" if i < n_invoices else "available"}
+            f.write(("\n    " if i == 0 else ",\n    ") + json.dumps(car))
+        f.write("\n  ],\n  \"invoices\": [")
+        customers = max(1, n_users - 5)
+        for i in range(n_invoices):
+            # توزيع باريتو: العميل رقم 5 هو الأكثر نشاطًا ثم يتناقص النشاط
+            cust = 5 + min(int(rnd.paretovariate(1.16)) - 1, customers - 1) if n_users > 5 else 0
+            if rnd.random() < 0.5:
+                # نصف الفواتير لعملاء عشوائيين (ذيل طويل من العملاء قليلي النشاط)
+                cust = 5 + rnd.randrange(customers) if n_users > 5 else 0
+            price = int(prices[i]) if i < n_cars else 10000
+            pts = LoyaltySystem.points_for_price(price)
+            points[cust] += pts
+            date = (START + timedelta(seconds=offsets[i])).isoformat(sep=" ")
+            inv = {"id": f"inv-{i:08x}", "customer": username(cust), "car_id": f"car-{i:08x}",
+                   "price": price, "points_earned": pts, "date": date}
+            f.write(("\n    " if i == 0 else ",\n    ") + json.dumps(inv))
+        f.write("\n  ],\n  \"users\": [")
+        for i in range(n_users):
+            usertype = "Admin" if i == 0 else "SalesEmployee" if i < 5 else "Customer"
+            user = {"id": f"user-{i:08x}", "username": username(i), "password_hash": password_hash,
+                    "usertype": usertype, "phone": f"77{i % 10_000_000:07d}",
+                    "gender": "F" if i % 2 else "M", "is_active": True,
+                    "loyalty_points": points[i]}
+            f.write(("\n    " if i == 0 else ",\n    ") + json.dumps(user))
+        f.write("\n  ]\n}\n")
+    os.replace(tmp, path)
+    return {"users": n_users, "cars": n_cars, "invoices": n_invoices}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic data_store.json generator")
+    parser.add_argument("--records", default="100k", help="إجمالي السجلات (مثال: 1k, 100k, 1m, 10m)")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    n = parse_size(args.records)
+    out = args.out or f"bench_{size_label(n)}.json"
+    counts = generate(out, n, args.seed)
+    print(f"{out}: {counts} ({os.path.getsize(out) / (1 << 20):.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
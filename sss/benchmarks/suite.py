@@ -0,0 +1,224 @@
+# suite.py
+# حزمة قياس أداء لنواة المعرض على بيانات اصطناعية (datagen.py) بأحجام 1k حتى 10M سجل:
+# - تقيس DataStore.load/save، AuthService.login/register، CarService.search/edit_car،
+#   SalesService.buy_car، وكل طرق ReportGenerator.
+# - لكل عملية: الوسيط (median) لزمن عدة استدعاءات بدون تتبع، ثم تمرير منفصل تحت tracemalloc
+#   لقياس ذروة الذاكرة (التتبع يبطئ التنفيذ فلا نخلطه بالتوقيت).
+# - النتائج تُكتب في ملف JSON (baseline)، والأمر compare يقارن ملفين ويفشل عند التراجع.
+# التشغيل:
+#   python benchmarks/suite.py run --sizes 1k,100k --out baseline.json
+#   python benchmarks/suite.py compare baseline.json current.json --threshold 0.2
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import datagen  # noqa: E402
+from car_dealership_oop_full_commented import (AuthService, CarService, DataStore,  # noqa: E402
+                                               ReportGenerator, SalesService)
+
+SIZES = "1k,100k,1m,10m"
+# عدد الاستدعاءات لكل عملية: القراءة رخيصة فنكررها، والكتابة تعيد حفظ الملف فنقللها مع الحجم
+READ_CALLS = 5
+WRITE_CALLS = 3
+LARGE = 1_000_000
+# فروق أصغر من هذا (بالثواني) تُعد ضجيجًا في المقارنة
+NOISE_SECONDS = 0.001
+
+
+class Bench:
+    """العمليات المقاسة على مخزن محمل؛ كل عملية تأخذ رقم الاستدعاء i لتغيير مدخلاتها."""
+
+    def __init__(self, path: str, counts: dict):
+        self.path = path
+        self.counts = counts
+        self.store = DataStore(path)
+        self.auth = AuthService(self.store)
+        self.cars = CarService(self.store)
+        self.sales = SalesService(self.store)
+        self.reports = ReportGenerator(self.store)
+        # السيارات المتاحة تبدأ بعد المباعة (فاتورة i باعت السيارة i)
+        self.next_car = counts["invoices"]
+        self.customer = datagen.username(5 if counts["users"] > 5 else 0)
+
+    def ops(self, large: bool) -> dict:
+        """{الاسم: (الدالة، عدد الاستدعاءات)}."""
+        writes = 1 if large else WRITE_CALLS
+        reads = 1 if large else READ_CALLS
+        return {
+            "DataStore.load": (lambda i: DataStore(self.path), reads),
+            "DataStore.save": (self.save, writes),
+            "AuthService.login": (lambda i: self.auth.login(self._username(i), datagen.PASSWORD),
+                                  READ_CALLS),
+            "AuthService.register": (lambda i: self.auth.register(f"benchuser{i}x{time.time_ns()}",
+                                                                  datagen.PASSWORD), writes),
+            "CarService.search": (lambda i: self.cars.search(datagen.NAMES[i % len(datagen.NAMES)]),
+                                  READ_CALLS),
+            "CarService.edit_car": (lambda i: self.cars.edit_car(self._car_id(i), price=1000.0 + i),
+                                    writes),
+            "SalesService.buy_car": (self.buy, writes),
+            "ReportGenerator.summary": (lambda i: self.reports.summary(), READ_CALLS),
+            "ReportGenerator.top_customers_by_points":
+                (lambda i: self.reports.top_customers_by_points(10), READ_CALLS),
+            "ReportGenerator.list_sold_cars": (lambda i: self.reports.list_sold_cars(), READ_CALLS),
+            "ReportGenerator.check_consistency": (lambda i: self.reports.check_consistency(), reads),
+        }
+
+    def _username(self, i: int) -> str:
+        # عميل موجود في الملف المولَّد (العملاء من الرقم 5 فصاعدًا)
+        return datagen.username(5 + i % max(1, self.counts["users"] - 5))
+
+    def _car_id(self, i: int) -> str:
+        return f"car-{i % max(1, self.counts['cars']):08x}"
+
+    def save(self, i: int):
+        # تغيير سجل واحد ثم الحفظ (الحفظ بلا تغييرات لا يقيس شيئًا في وضع السجل)
+        car = self.store.find_car_by_id(self._car_id(i))
+        if car is not None:
+            self.store.update_car(car, price=car.price + 1)
+        self.store.save()
+
+    def buy(self, i: int):
+        # كل استدعاء يشتري سيارة متاحة جديدة (بما فيها تمرير الذاكرة)
+        if self.next_car >= self.counts["cars"]:
+            return None
+        car_id = f"car-{self.next_car:08x}"
+        self.next_car += 1
+        return self.sales.buy_car(self.customer, car_id)
+
+
+def measure(fn, calls: int, memory: bool, start: int) -> dict:
+    """الوسيط لزمن calls استدعاء، ثم (اختياريًا) ذروة الذاكرة لاستدعاء إضافي."""
+    times = []
+    for i in range(start, start + calls):
+        t0 = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - t0)
+    result = {"seconds": statistics.median(times), "calls": calls}
+    if memory:
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            fn(start + calls)
+            result["peak_kb"] = round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def dataset(data_dir: str, n: int) -> tuple:
+    """ملف بيانات مولَّد لحجم n (يُعاد استخدامه إن وُجد في data_dir)."""
+    path = os.path.join(data_dir, f"bench_{datagen.size_label(n)}.json")
+    if not os.path.exists(path):
+        print(f"generating {path} ...", flush=True)
+        datagen.generate(path, n)
+    users, cars, invoices = datagen.split(n)
+    return path, {"users": users, "cars": cars, "invoices": invoices}
+
+
+def run_size(n: int, data_dir: str, memory: bool) -> dict:
+    src, counts = dataset(data_dir, n)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # نسخة عمل: عمليات الكتابة لا تغيّر الملف المخزن مؤقتًا
+        path = os.path.join(tmpdir, "data_store.json")
+        shutil.copyfile(src, path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            bench = Bench(path, counts)
+        for k, (name, (fn, calls)) in enumerate(bench.ops(n >= LARGE).items()):
+            with contextlib.redirect_stdout(io.StringIO()):
+                # كل عملية تبدأ من رقم مختلف فلا تتكرر مدخلات الكتابة (أسماء/سيارات)
+                results[name] = measure(fn, calls, memory, start=k * 100)
+            r = results[name]
+            peak = f"{r['peak_kb']:>12,.0f} KiB" if "peak_kb" in r else ""
+            print(f"  {name:42} {r['seconds'] * 1000:12.3f} ms {peak}", flush=True)
+    return results
+
+
+def meta() -> dict:
+    try:
+        import numpy  # noqa: F401
+        has_numpy = True
+    except ImportError:
+        has_numpy = False
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "date": datetime.now().isoformat(timespec="seconds"), "numpy": has_numpy}
+
+
+def cmd_run(args) -> int:
+    os.makedirs(args.data_dir, exist_ok=True)
+    out = {"meta": meta(), "results": {}}
+    for label in args.sizes.split(","):
+        n = datagen.parse_size(label)
+        print(f"[{datagen.size_label(n)}]", flush=True)
+        out["results"][datagen.size_label(n)] = run_size(n, args.data_dir, not args.no_memory)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    print(f"results written to {args.out}")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    """نقارن الأحجام والعمليات الموجودة في الملفين؛ نعيد 1 إن تجاوزت أي نسبة العتبة."""
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)["results"]
+    regressions = 0
+    for size in base:
+        if size not in current:
+            continue
+        print(f"[{size}]")
+        for name, old in base[size].items():
+            new = current[size].get(name)
+            if new is None:
+                continue
+            ratio = new["seconds"] / old["seconds"] if old["seconds"] else 1.0
+            slow = ratio > 1 + args.threshold and new["seconds"] - old["seconds"] > NOISE_SECONDS
+            line = f"  {name:42} {old['seconds'] * 1000:10.3f} -> {new['seconds'] * 1000:10.3f} ms  x{ratio:5.2f}"
+            if "peak_kb" in old and "peak_kb" in new and old["peak_kb"] > 0:
+                mem_ratio = new["peak_kb"] / old["peak_kb"]
+                # فروق الذاكرة الصغيرة جدًا (أقل من 64 KiB) ضجيج
+                slow = slow or (mem_ratio > 1 + args.threshold and new["peak_kb"] - old["peak_kb"] > 64)
+                line += f"  mem x{mem_ratio:5.2f}"
+            if slow:
+                regressions += 1
+                line += "  REGRESSION"
+            print(line)
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dealership core benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="تشغيل القياسات وكتابة ملف النتائج")
+    run.add_argument("--sizes", default=SIZES, help="أحجام مفصولة بفواصل (مثال: 1k,100k,1m,10m)")
+    run.add_argument("--out", default="baseline.json")
+    run.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sss_bench_data"),
+                     help="مجلد الملفات المولَّدة (يُعاد استخدامها بين التشغيلات)")
+    run.add_argument("--no-memory", action="store_true", help="تخطي قياس ذروة الذاكرة")
+    compare = sub.add_parser("compare", help="مقارنة ملفي نتائج (خروج 1 عند التراجع)")
+    compare.add_argument("base")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.2, help="نسبة التباطؤ المسموحة (0.2 = 20%%)")
+    args = parser.parse_args()
+    sys.exit(cmd_run(args) if args.command == "run" else cmd_compare(args))
+
+
+if __name__ == "__main__":
+    main()
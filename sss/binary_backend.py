@@ -0,0 +1,374 @@
+# binary_backend.py
+# صيغة تخزين ثنائية مضغوطة لـ DataStore بديلة عن data_store.json:
+# - جدول نصوص (string table): كل نص مختلف يُخزَّن مرة واحدة، والسجلات تشير إليه برقم
+#   (أسماء المستخدمين، الحالات، أسماء السيارات، الألوان... تتكرر آلاف المرات في JSON).
+# - سجلات مسبوقة بطولها (length-prefixed): السجل العادي بتخطيط ثابت (struct)، والسجل الشاذ
+#   (بيانات قديمة بأنواع غير متوقعة) يُحفظ كـ JSON داخل نفس الإطار فلا نفقد شيئًا.
+# - ضغط اختياري: zlib أو lzma، يُختار من امتداد الملف (.bin / .bin.zlib / .bin.xz) أو صراحة.
+# - أداة تحويل في الاتجاهين:
+#   python binary_backend.py data_store.json data_store.bin.xz
+#   python binary_backend.py data_store.bin.xz data_store.json
+
+import json
+import lzma
+import os
+import struct
+import sys
+import zlib
+from typing import Optional
+
+from car_dealership_oop_full_commented import (SCHEMA_VERSION, Car, CompactUtil, FileLock,
+                                               Invoice, User)
+
+MAGIC = b"SSSB"
+FORMAT_VERSION = 1
+KINDS = ("users", "cars", "invoices")
+# رقم الضغط في الرأس <-> الاسم، والامتداد الافتراضي لكل نوع
+COMPRESSIONS = {0: None, 1: "zlib", 2: "lzma"}
+EXTENSIONS = ((".bin.zlib", "zlib"), (".bin.xz", "lzma"), (".bin", None))
+# الرأس غير مضغوط: MAGIC، إصدار الصيغة، نوع الضغط، إصدار الملف (version)، إصدار السجلات
+HEADER = struct.Struct("<4sBBQI")
+LENGTH = struct.Struct("<I")
+# ترميز السجل (أول بايت بعد الطول)
+FIXED, AS_JSON = 0, 1
+# فاصل النصوص في جدول النصوص (النصوص التي تحتويه تُحفظ سجلاتها كـ JSON)
+SEP = "\x00"
+
+# تخطيط ثابت لكل نوع: (الحقول بالترتيب، صيغة struct، نوع كل حقل)
+# s = رقم في جدول النصوص، b = منطقي، i = عدد صحيح، f = عشري، t = تاريخ كثوانٍ
+LAYOUTS = {
+    "users": (("id", "username", "password_hash", "usertype", "phone", "gender",
+               "is_active", "loyalty_points"), "<IIIIII?q", "ssssssbi"),
+    "cars": (("id", "name", "model_year", "price", "color", "specs", "status"),
+             "<IIqdIII", "ssifsss"),
+    "invoices": (("id", "customer", "car_id", "price", "points_earned", "date"),
+                 "<IIIdqq", "sssfit"),
+}
+STRUCTS = {kind: struct.Struct(fmt) for kind, (_fields, fmt, _types) in LAYOUTS.items()}
+# الإطار الكامل للسجل الثابت: الطول + بايت الترميز + الحقول
+FRAMES = {kind: struct.Struct("<IB" + fmt[1:]) for kind, (_fields, fmt, _types) in LAYOUTS.items()}
+MODELS = {"users": User, "cars": Car, "invoices": Invoice}
+# الأنواع المقبولة في التخطيط الثابت (bool ليس int هنا حتى لا تتغير القيم عند القراءة)
+INT_MIN, INT_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def compression_for(path: str) -> Optional[str]:
+    """نوع الضغط من امتداد الملف."""
+    lower = path.lower()
+    for ext, comp in EXTENSIONS:
+        if lower.endswith(ext):
+            return comp
+    return None
+
+
+def _compress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(data, 6)
+    if compression == "lzma":
+        return lzma.compress(data, preset=6)
+    return data
+
+
+def _decompress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == "zlib":
+        return zlib.decompress(data)
+    if compression == "lzma":
+        return lzma.decompress(data)
+    return data
+
+
+class _StringTable:
+    """النص -> رقمه (بترتيب أول ظهور)."""
+    def __init__(self):
+        self.index = {}
+
+    def ref(self, value: str) -> int:
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.index)
+        return i
+
+    def encode(self) -> bytes:
+        return SEP.join(self.index).encode("utf-8")
+
+
+def _fixed_values(rec: dict, fields: tuple, types: str, strings: _StringTable) -> Optional[list]:
+    """قيم السجل للتخطيط الثابت، أو None إن لم يطابقه (حقل زائد/ناقص أو نوع مختلف)."""
+    if len(rec) != len(fields):
+        return None
+    values = []
+    for field, kind in zip(fields, types):
+        if field not in rec:
+            return None
+        v = rec[field]
+        t = type(v)
+        if kind == "s":
+            if t is not str or SEP in v:
+                return None
+            v = strings.ref(v)
+        elif kind == "i":
+            if t is not int or not INT_MIN <= v <= INT_MAX:
+                return None
+        elif kind == "f":
+            # عدد صحيح يُمثَّل بدقة في double (مثل "price": 20000) يُحفظ كعدد عشري
+            if t is int and abs(v) <= 2 ** 53:
+                v = float(v)
+            elif t is not float:
+                return None
+        elif kind == "b":
+            if t is not bool:
+                return None
+        else:  # "t": التاريخ النصي يُحفظ كثوانٍ إن كان بالصيغة القياسية
+            v = CompactUtil.iso_to_ts(v)
+            if type(v) is not int:
+                return None
+        values.append(v)
+    return values
+
+
+def encode(data: dict, compression: Optional[str] = None) -> bytes:
+    """dict بصيغة data_store.json (users/cars/invoices) -> بايتات الملف الثنائي."""
+    strings = _StringTable()
+    sections = []
+    for kind in KINDS:
+        fields, _fmt, types = LAYOUTS[kind]
+        pack = STRUCTS[kind].pack
+        records = data.get(kind, [])
+        out = [LENGTH.pack(len(records))]
+        for rec in records:
+            values = _fixed_values(rec, fields, types, strings) if isinstance(rec, dict) else None
+            if values is not None:
+                body = bytes((FIXED,)) + pack(*values)
+            else:
+                body = bytes((AS_JSON,)) + json.dumps(rec, ensure_ascii=False).encode("utf-8")
+            out.append(LENGTH.pack(len(body)))
+            out.append(body)
+        sections.append(b"".join(out))
+    table = strings.encode()
+    payload = LENGTH.pack(len(strings.index)) + LENGTH.pack(len(table)) + table + b"".join(sections)
+    comp_id = {v: k for k, v in COMPRESSIONS.items()}[compression]
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, comp_id, data.get("version", 0),
+                         data.get("schema_version", 0))
+    return header + _compress(payload, compression)
+
+
+def read_header(head: bytes) -> dict:
+    """قراءة الرأس غير المضغوط (يكفي أول HEADER.size بايت)."""
+    magic, fmt, comp_id, version, schema_version = HEADER.unpack_from(head)
+    if magic != MAGIC:
+        raise ValueError("ليس ملف بيانات ثنائيًا (MAGIC غير مطابق)")
+    if fmt > FORMAT_VERSION:
+        raise ValueError(f"إصدار صيغة غير مدعوم: {fmt}")
+    return {"compression": COMPRESSIONS[comp_id], "version": version,
+            "schema_version": schema_version}
+
+
+def _decoders(strings: list, rows: bool) -> dict:
+    """
+    دالة لكل نوع: قيم الإطار (الطول، الترميز، ثم الحقول) -> dict السجل بمفاتيح to_dict،
+    أو مع rows=True صف الكائن (to_row) مباشرة: التاريخ يبقى ثوانٍ ولا نبني dict أصلًا.
+    """
+    S = strings
+    if rows:
+        return {
+            "users": lambda v: (S[v[2]], S[v[3]], S[v[4]], S[v[5]], S[v[6]], S[v[7]], v[8], v[9]),
+            "cars": lambda v: (S[v[2]], S[v[3]], v[4], v[5], S[v[6]], S[v[7]], S[v[8]]),
+            "invoices": lambda v: (S[v[2]], S[v[3]], S[v[4]], v[5], v[6], v[7]),
+        }
+    ts_to_iso = CompactUtil.ts_to_iso
+    return {
+        "users": lambda v: {"id": S[v[2]], "username": S[v[3]], "password_hash": S[v[4]],
+                            "usertype": S[v[5]], "phone": S[v[6]], "gender": S[v[7]],
+                            "is_active": v[8], "loyalty_points": v[9]},
+        "cars": lambda v: {"id": S[v[2]], "name": S[v[3]], "model_year": v[4], "price": v[5],
+                           "color": S[v[6]], "specs": S[v[7]], "status": S[v[8]]},
+        "invoices": lambda v: {"id": S[v[2]], "customer": S[v[3]], "car_id": S[v[4]],
+                               "price": v[5], "points_earned": v[6], "date": ts_to_iso(v[7])},
+    }
+
+
+def decode(blob: bytes, rows: bool = False) -> dict:
+    """
+    بايتات الملف الثنائي -> dict بصيغة data_store.json.
+    rows=True: القوائم صفوف كائنات (to_row) بدل dict، لبناء الكائنات عبر from_row مباشرة.
+    """
+    meta = read_header(blob)
+    buf = _decompress(blob[HEADER.size:], meta["compression"])
+    (count,) = LENGTH.unpack_from(buf, 0)
+    (size,) = LENGTH.unpack_from(buf, 4)
+    off = 8
+    # النصوص مفصولة بـ SEP: تقسيم واحد بدل فك كل نص على حدة؛ نحولها لنصوص مشتركة (interned)
+    strings = [sys.intern(s) for s in buf[off:off + size].decode("utf-8").split(SEP)] if count else []
+    off += size
+    decoders = _decoders(strings, rows)
+    out = {"version": meta["version"], "schema_version": meta["schema_version"]}
+    unpack_len = LENGTH.unpack_from
+    for kind in KINDS:
+        frame = FRAMES[kind]
+        body_len = frame.size - 4
+        convert_one = decoders[kind]
+        (n,) = unpack_len(buf, off)
+        off += 4
+        records = []
+        append = records.append
+        # المسار السريع: سلسلة سجلات بتخطيط ثابت متتالية = مصفوفة إطارات متساوية الحجم،
+        # نفكها بـ iter_unpack (في C) حتى أول سجل شاذ
+        fits = min(n, (len(buf) - off) // frame.size)
+        for v in frame.iter_unpack(memoryview(buf)[off:off + fits * frame.size]):
+            if v[0] != body_len or v[1] != FIXED:
+                break
+            append(convert_one(v))
+        off += len(records) * frame.size
+        # المسار العام: سجل بسجل (سجلات JSON الشاذة وما بعدها)
+        for _ in range(n - len(records)):
+            (length,) = unpack_len(buf, off)
+            if buf[off + 4] == FIXED:
+                append(convert_one(frame.unpack_from(buf, off)))
+            else:
+                rec = json.loads(bytes(buf[off + 5:off + 4 + length]))
+                append(MODELS[kind].from_dict(rec).to_row() if rows else rec)
+            off += 4 + length
+        out[kind] = records
+    return out
+
+
+class BinaryBackend:
+    """
+    واجهة تخزين بالصيغة الثنائية (نفس طرق JsonBackend: load/save/close و lock/unlock/poll).
+    مثل JSON العادي: كل حفظ يعيد كتابة الملف كاملًا بشكل ذري، لكنه أصغر بكثير وأسرع.
+    compression: None / "zlib" / "lzma"؛ إن لم يُمرَّر يُستنتج من الامتداد.
+    """
+    def __init__(self, path: str, compression: Optional[str] = "auto", shared: bool = True):
+        self.path = path
+        self.compression = compression_for(path) if compression == "auto" else compression
+        if self.compression not in COMPRESSIONS.values():
+            raise ValueError(f"compression must be one of {list(COMPRESSIONS.values())}")
+        self.shared = shared
+        self.file_lock = FileLock(path + ".lock")
+        self.version = 0
+        self._stamp = None
+
+    def lock(self):
+        if self.shared:
+            self.file_lock.acquire()
+
+    def unlock(self):
+        if self.shared:
+            self.file_lock.release()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load(self) -> Optional[dict]:
+        """قراءة الملف كاملًا وفكه إلى dict (أو None إن لم يوجد)."""
+        self.lock()
+        try:
+            try:
+                with open(self.path, "rb") as f:
+                    blob = f.read()
+            except FileNotFoundError:
+                return None
+            raw = decode(blob)
+            self.version = raw["version"]
+            self._stamp = self._file_stamp()
+        finally:
+            self.unlock()
+        return raw
+
+    def load_rows(self) -> Optional[dict]:
+        """
+        مثل load لكن القوائم صفوف كائنات (to_row) في "rows": DataStore يبني الكائنات مباشرة.
+        ملف بصيغة سجلات أقدم يعيد None فيُحمَّل عبر load() ويُرقّى.
+        """
+        self.lock()
+        try:
+            try:
+                with open(self.path, "rb") as f:
+                    blob = f.read()
+            except FileNotFoundError:
+                return None
+            if read_header(blob)["schema_version"] < SCHEMA_VERSION:
+                return None
+            raw = decode(blob, rows=True)
+            self.version = raw["version"]
+            self._stamp = self._file_stamp()
+        finally:
+            self.unlock()
+        raw["rows"] = {kind: raw.pop(kind) for kind in KINDS}
+        return raw
+
+    def poll(self):
+        """مثل JsonBackend: None إن لم يتغير الملف، وإلا ("full", raw)."""
+        if not self.shared:
+            return None
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                header = read_header(f.read(HEADER.size))
+        except (FileNotFoundError, struct.error, ValueError):
+            header = {}
+        if header.get("version", -1) == self.version:
+            self._stamp = stamp
+            return None
+        raw = self.load()
+        return None if raw is None else ("full", raw)
+
+    def save(self, store, changes: dict):
+        """كتابة لقطة كاملة (التغييرات changes لا تلزم: الملف يُعاد بناؤه في كل حفظ)."""
+        self.version += 1
+        data = store.snapshot()
+        data["version"] = self.version
+        write_file(self.path, data, self.compression)
+        self._stamp = self._file_stamp()
+
+    def close(self):
+        pass
+
+
+def write_file(path: str, data: dict, compression: Optional[str]):
+    """كتابة ذرية (ملف مؤقت ثم os.replace) مع fsync."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode(data, compression))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def convert(src: str, dst: str) -> dict:
+    """
+    تحويل بين JSON والصيغة الثنائية (الاتجاه من الامتدادات). نعيد عدد السجلات لكل نوع.
+    ملف JSON الناتج بنفس شكل JsonBackend (version ثم schema_version ثم القوائم، indent=2).
+    """
+    if src.lower().endswith(".json"):
+        with open(src, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        with open(src, "rb") as f:
+            data = decode(f.read())
+    if dst.lower().endswith(".json"):
+        out = {"version": data.get("version", 0), "schema_version": data.get("schema_version", 0)}
+        for kind in KINDS:
+            out[kind] = data.get(kind, [])
+        tmp_path = dst + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, dst)
+    else:
+        write_file(dst, data, compression_for(dst))
+    return {kind: len(data.get(kind, [])) for kind in KINDS}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("الاستخدام: python binary_backend.py data_store.json data_store.bin[.zlib|.xz]")
+        print("       أو: python binary_backend.py data_store.bin.xz data_store.json")
+        sys.exit(1)
+    result = convert(sys.argv[1], sys.argv[2])
+    print(f"✅ تم التحويل إلى {sys.argv[2]}: {result}")
@@ -8,31 +8,115 @@
 # استيراد المكتبات القياسية اللازمة
 # ---------------------------------------------------------------------
 import json                      # للتعامل مع ملفات JSON (البيانات)
-import uuid                      # لتوليد معرفات فريدة (IDs)
+import marshal                   # اللقطة الثنائية المخزنة مؤقتًا لتسريع بدء التشغيل
+import csv                       # لقراءة ملفات CSV في الاستيراد الجماعي للسيارات
+import bisect                    # للبحث الثنائي في الفهارس المرتبة (السعر/السنة)
+import heapq                     # طابور انتهاء الحجوزات (min-heap)
+import math                      # math.isclose لمقارنة المجاميع في فحص الاتساق
+import os                        # لمعرفة أحجام الملفات وإعادة تسميتها (السجل/journal)
+import re                        # لقراءة رقم الإصدار من بداية الملف دون تحليله كاملًا
+import threading                 # لتنفيذ ضغط السجل (compaction) في الخلفية
+from contextlib import contextmanager  # لبناء with store.transaction()
+import time                      # الوقت بالمللي ثانية في المعرفات المرتبة زمنيًا (IDs)
 import getpass                   # لقراءة كلمة المرور دون عرضها على الشاشة
 import hashlib                   # لتجزئة كلمات المرور (hash)
-from datetime import datetime    # للحصول على التاريخ/الوقت عند إنشاء الفواتير
-from typing import List, Optional  # لأنواع البيانات الواضحة في التعريفات
+import sys                       # sys.intern لمشاركة النصوص المتكررة في الذاكرة
+from datetime import datetime, timedelta  # للحصول على التاريخ/الوقت عند إنشاء الفواتير
+from typing import Dict, Iterator, List, Optional  # لأنواع البيانات الواضحة في التعريفات
+try:
+    import fcntl                 # أقفال الملفات الاستشارية (advisory) بين العمليات (لينكس/ماك)
+except ImportError:              # ويندوز: لا قفل بين العمليات، ويبقى فحص الإصدار فقط
+    fcntl = None
 
 # ---------------------------------------------------------------------
 # إعدادات/ثوابت عامة قابلة للتعديل بسهولة
 # ---------------------------------------------------------------------
 DATA_FILE = "data_store.json"   # اسم ملف تخزين البيانات (يمكن تغييره)
+SCHEMA_VERSION = 2              # إصدار صيغة السجلات في المخزن (خطوات الترقية في migrate_data.py)
 PASSWORD_MIN_LEN = 8            # الحد الأدنى لطول كلمة المرور (قابل للتعديل)
+USE_JOURNAL = False             # تفعيل وضع السجل الإلحاقي (journal) افتراضيًا
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024  # حجم السجل الذي نبدأ بعده دمجه في لقطة جديدة
+IMPORT_CHUNK_SIZE = 0           # الاستيراد الجماعي: عدد السيارات لكل حفظ (0 = حفظ واحد في النهاية)
+SHARED_ACCESS = True            # تنسيق عدة عمليات على نفس الملف (قفل + فحص التقادم قبل التعديل)
+SNAPSHOT_CACHE = True           # لقطة ثنائية بجانب ملف JSON ("<path>.cache") لتسريع التحميل
+RESERVATION_TTL = 15 * 60       # مدة حجز السيارة الافتراضية بالثواني
+POINTS_LEDGER = True            # سجل قيود نقاط الولاء ("<path>.ledger") بجانب ملف البيانات
+LEDGER_CHECKPOINT_BYTES = 1024 * 1024  # حجم القيود بعد آخر لقطة أرصدة الذي نكتب بعده لقطة جديدة
+METRICS_FILE = None             # مسار ملف القياسات (.prom أو .json) يُكتب عند الخروج؛ None = القياس معطل
+PARTITION_INVOICES = False      # أرشفة فواتير الأشهر المغلقة في أقسام شهرية ("<path>.archive/")
+ARCHIVE_CACHE_PARTITIONS = 6    # عدد الأقسام المؤرشفة المحمّلة في الذاكرة معًا (LRU)
 
 # ---------------------------------------------------------------------
-# فئة IDGenerator: لتوليد معرفات (IDs) قصيرة ومنظمة
+# فئة IDGenerator: لتوليد معرفات (IDs) مرتبة زمنيًا
 # ---------------------------------------------------------------------
 class IDGenerator:
     """
-    فئة مساعدة لتوليد معرفات (IDs) بصيغة واضحة.
-    نستخدم uuid.uuid4() ثم نأخذ أجزاء منه لتقليل الطول مع الحفاظ على التفرد.
+    معرفات بأسلوب ULID مع نفس صيغة البادئة: prefix-<26 حرفًا>، مثال: inv-01J9Z3K8QW7M2X4N6P8R0T2V4Y
+    - أول 10 أحرف: الوقت بالمللي ثانية (48 بت)، ثم 16 حرفًا عشوائية (80 بت)، بترميز Crockford base32
+      فالترتيب النصي للمعرفات هو ترتيب إنشائها.
+    - رتيبة (monotonic) داخل العملية: في نفس المللي ثانية (أو إن رجعت الساعة) نزيد الجزء العشوائي بواحد.
+    - التفرد داخل المخزن: new(prefix, taken) تعيد التوليد ما دام المعرف مستخدمًا؛ DataStore يمرر فحصه.
+    - المعرفات القديمة القصيرة (prefix-8 hex) تبقى مقبولة في كل مكان؛ time_of تعيد لها None.
     """
-    @staticmethod
-    def new(prefix: str) -> str:
-        # نعيد سلسلة مكونة من بادئة + '-' + أول 8 أحرف من uuid
-        # مثال: user-1a2b3c4d
-        return f"{prefix}-{uuid.uuid4().hex[:8]}"
+    ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+    LENGTH = 26
+    RANDOM_BITS = 80
+    _lock = threading.Lock()
+    # آخر (مللي ثانية، جزء عشوائي) صدر في هذه العملية
+    _last = (0, 0)
+
+    @classmethod
+    def new(cls, prefix: str, taken=None) -> str:
+        while True:
+            with cls._lock:
+                ms = time.time_ns() // 1_000_000
+                last_ms, last_rand = cls._last
+                if ms > last_ms:
+                    rand = int.from_bytes(os.urandom(cls.RANDOM_BITS // 8), "big")
+                else:
+                    ms, rand = last_ms, last_rand + 1
+                    if rand >> cls.RANDOM_BITS:
+                        # نفد الجزء العشوائي في هذه المللي ثانية (نظريًا فقط): ننتقل للتالية
+                        ms, rand = ms + 1, 0
+                cls._last = (ms, rand)
+            rid = f"{prefix}-{cls.encode((ms << cls.RANDOM_BITS) | rand)}"
+            if taken is None or not taken(rid):
+                return rid
+
+    @classmethod
+    def encode(cls, value: int) -> str:
+        chars = []
+        for _ in range(cls.LENGTH):
+            chars.append(cls.ALPHABET[value & 31])
+            value >>= 5
+        return "".join(reversed(chars))
+
+    @classmethod
+    def sort_key(cls, record_id) -> str:
+        """جزء ULID من المعرف للترتيب، أو "" لمعرف قديم (يأتي قبل كل المعرفات الجديدة)."""
+        if type(record_id) is not str:
+            return ""
+        key = record_id[record_id.rfind("-") + 1:]
+        return key if len(key) == cls.LENGTH else ""
+
+    @classmethod
+    def time_of(cls, record_id) -> Optional[int]:
+        """وقت إنشاء المعرف بالمللي ثانية (Unix)، أو None لمعرف قديم."""
+        key = cls.sort_key(record_id)
+        if not key:
+            return None
+        value = 0
+        for ch in key[:10]:
+            i = cls.ALPHABET.find(ch)
+            if i < 0:
+                return None
+            value = value * 32 + i
+        return value
+
+    @classmethod
+    def key_at(cls, ms: int) -> str:
+        """أصغر مفتاح ترتيب (sort_key) لمعرف أُنشئ عند ms أو بعده."""
+        return cls.encode(ms << cls.RANDOM_BITS)
 
 # ---------------------------------------------------------------------
 # فئة HashUtil: لتجزئة كلمات المرور (hash)
@@ -48,6 +132,59 @@ class HashUtil:
         # نعيد قيمة الهش كسلسلة سداسية عشرية
         return hashlib.sha256(password.encode()).hexdigest()
 
+# ---------------------------------------------------------------------
+# فئة CompactUtil: أدوات لتمثيل السجلات بشكل مضغوط في الذاكرة
+# ---------------------------------------------------------------------
+class CompactUtil:
+    """
+    أدوات تقلل الذاكرة عند ملايين السجلات:
+    - intern: نسخة واحدة مشتركة من النصوص المتكررة (status, usertype, username...).
+    - iso_to_ts / ts_to_iso: تخزين التاريخ كعدد صحيح من الثواني بدل نص ISO.
+      الثواني تُحسب للوقت المحلي كما هو (بدون منطقة زمنية) لتكون الإعادة للنص مطابقة تمامًا.
+    """
+    EPOCH = datetime(1970, 1, 1)
+
+    @staticmethod
+    def intern(value):
+        # النصوص فقط تُشارك؛ أي قيمة أخرى (بيانات قديمة مشوهة) تُعاد كما هي
+        return sys.intern(value) if type(value) is str else value
+
+    @staticmethod
+    def iso_to_ts(value):
+        """
+        تحويل "YYYY-MM-DD HH:MM:SS" إلى عدد صحيح.
+        أي صيغة أخرى (فارغة/مختلفة) تُعاد كنص كما هي حتى لا نغيّر البيانات المحفوظة.
+        """
+        if type(value) is str and len(value) == 19 and value[10] == " ":
+            try:
+                delta = datetime.fromisoformat(value) - CompactUtil.EPOCH
+            except ValueError:
+                return value
+            return delta.days * 86400 + delta.seconds
+        return value
+
+    @staticmethod
+    def ts_to_iso(value) -> str:
+        """عكس iso_to_ts: العدد الصحيح يُعاد نصًا بنفس الصيغة."""
+        if type(value) is int:
+            return (CompactUtil.EPOCH + timedelta(seconds=value)).isoformat(sep=' ')
+        return value
+
+    @staticmethod
+    def as_price(value):
+        """
+        السعر كعدد عشري دائمًا: الملفات القديمة/المرحّلة تحفظ 20000 بدل 20000.0، وبدون توحيد
+        النوع لا يطابق السجل التخطيط الثابت في binary_backend (حقل "f") فيُحفظ كـ JSON.
+        القيم غير العددية تبقى كما هي (يكشفها فحص الاتساق).
+        """
+        return float(value) if type(value) is int and abs(value) <= 2 ** 53 else value
+
+    @staticmethod
+    def now_ts() -> int:
+        """الوقت المحلي الحالي بنفس تمثيل iso_to_ts (بلا بناء نص ثم تحليله)."""
+        delta = datetime.now() - CompactUtil.EPOCH
+        return delta.days * 86400 + delta.seconds
+
 # ---------------------------------------------------------------------
 # فئة User: الكلاس الأساسي لكل المستخدمين (Base user class)
 # ---------------------------------------------------------------------
@@ -56,13 +193,17 @@ class User:
     الكلاس الأساسي User يحتوي على الحقول المشتركة لكل أنواع المستخدمين:
     id, username, password_hash, usertype, phone, gender, is_active, loyalty_points.
     يوفر إلى/من dict لتسهيل التخزين والتحميل من JSON.
+    نستخدم __slots__ بدل __dict__ لكل كائن لتقليل الذاكرة، و usertype نص مشترك (interned).
     """
+    __slots__ = ("id", "username", "password_hash", "_usertype", "phone", "gender",
+                 "is_active", "loyalty_points")
+
     def __init__(self, username: str, password: str, usertype: str = "Customer",
                  phone: str = "", gender: str = "M"):
         # إنشاء معرف فريد عند إنشاء المستخدم
         self.id = IDGenerator.new("user")
-        # اسم المستخدم (نستخدمه لتسجيل الدخول والبحث)
-        self.username = username
+        # اسم المستخدم (نستخدمه لتسجيل الدخول والبحث) — مشترك مع حقل customer في الفواتير
+        self.username = CompactUtil.intern(username)
         # تخزين هاش كلمة المرور (وليس النص)
         self.password_hash = HashUtil.hash_password(password)
         # نوع المستخدم: "Admin" أو "SalesEmployee" أو "Customer"
@@ -70,12 +211,21 @@ class User:
         # رقم الهاتف (اختياري)
         self.phone = phone
         # الجنس (M أو F) — يمكن تعديله حسب الحاجة
-        self.gender = gender
+        self.gender = CompactUtil.intern(gender)
         # حالة الحساب: True => نشط، False => معطل
         self.is_active = True
         # نقاط الولاء للعملاء (تزداد عند عمليات الشراء)
         self.loyalty_points = 0
 
+    @property
+    def usertype(self):
+        return self._usertype
+
+    @usertype.setter
+    def usertype(self, value):
+        # القيم قليلة ومتكررة جدًا: نسخة واحدة مشتركة لكل قيمة
+        self._usertype = CompactUtil.intern(value)
+
     def to_dict(self) -> dict:
         """
         تحويل الكائن إلى dict لبساطة الحفظ في JSON.
@@ -96,21 +246,38 @@ class User:
     def from_dict(data: dict) -> 'User':
         """
         إنشاء كائن User من dict (مقروء من JSON).
-        ملاحظة: نستخدم "dummy" لكلمة المرور لأن الهش يأتي من الملف.
+        نبني الكائن عبر __new__ دون __init__: لا نولّد معرفًا جديدًا ولا نجزئ كلمة مرور وهمية
+        لكل مستخدم، فالمعرف والهش يأتيان من الملف (ونولّدهما فقط إن غابا).
         """
-        # نستخرج الحقول الأساسية، ونضع قيمة مبدئية لكلمة المرور ثم نستبدل الهش
-        u = User(data["username"], "dummy", data.get("usertype", "Customer"),
-                 data.get("phone", ""), data.get("gender", "M"))
+        u = User.__new__(User)
         # نستخدم معرف الملف إن وُجد
-        u.id = data.get("id", u.id)
+        u.id = data["id"] if "id" in data else IDGenerator.new("user")
+        u.username = CompactUtil.intern(data["username"])
         # نحتفظ بقيمة الهش المحفوظة في الملف (إن وُجد)
-        u.password_hash = data.get("password_hash", u.password_hash)
+        u.password_hash = (data["password_hash"] if "password_hash" in data
+                           else HashUtil.hash_password("dummy"))
+        u.usertype = data.get("usertype", "Customer")
+        u.phone = data.get("phone", "")
+        u.gender = CompactUtil.intern(data.get("gender", "M"))
         # حالة النشاط
         u.is_active = data.get("is_active", True)
         # نقاط الولاء إن وُجدت
         u.loyalty_points = data.get("loyalty_points", 0)
         return u
 
+    def to_row(self) -> tuple:
+        """الحالة الداخلية كصف (بترتيب __slots__) للقطة الثنائية المخزنة مؤقتًا."""
+        return (self.id, self.username, self.password_hash, self._usertype, self.phone,
+                self.gender, self.is_active, self.loyalty_points)
+
+    @staticmethod
+    def from_row(row: tuple) -> 'User':
+        """عكس to_row: تعيين الحقول مباشرة دون أي تحويل."""
+        u = User.__new__(User)
+        (u.id, u.username, u.password_hash, u._usertype, u.phone,
+         u.gender, u.is_active, u.loyalty_points) = row
+        return u
+
 # ---------------------------------------------------------------------
 # فئات فرعية للمستخدمين: Admin, SalesEmployee, Customer
 # (تُستخدم لتوضيح الـ OOP وتلبية شرط وجود أكثر من كلاس)
@@ -120,6 +287,8 @@ class Admin(User):
     كلاس Admin يورث من User.
     يمكن إضافة وظائف خاصة بالمدير هنا، لكن يكفي الوراثة حالياً.
     """
+    __slots__ = ()
+
     def __init__(self, username: str, password: str, phone: str = "", gender: str = "M"):
         # استدعاء منشئ الأب مع تعيين usertype إلى "Admin"
         super().__init__(username, password, "Admin", phone, gender)
@@ -129,6 +298,8 @@ class SalesEmployee(User):
     كلاس موظف المبيعات يورث من User.
     يمكن إضافة صلاحيات أو خصائص خاصة لموظف المبيعات.
     """
+    __slots__ = ()
+
     def __init__(self, username: str, password: str, phone: str = "", gender: str = "M"):
         super().__init__(username, password, "SalesEmployee", phone, gender)
 
@@ -137,6 +308,8 @@ class Customer(User):
     كلاس العميل (Customer) يورث من User.
     يبقى في الوراثة لتوضيح التصميم الكائني.
     """
+    __slots__ = ()
+
     def __init__(self, username: str, password: str, phone: str = "", gender: str = "M"):
         super().__init__(username, password, "Customer", phone, gender)
 
@@ -148,7 +321,13 @@ class Car:
     كلاس يمثل سيارة في المخزون.
     الحقول: id, name, model_year, price, color, specs, status.
     الحالة status يمكن أن تكون: "available", "sold", "reserved", ...
+    __slots__ لتقليل الذاكرة، و status نص مشترك (interned).
+    السيارة المحجوزة تحمل reserved_by (اسم العميل) و reserved_ts (انتهاء الحجز كثوانٍ)؛
+    الحقلان يُحفظان في dict فقط عند وجود حجز، فسجلات باقي السيارات لا تتغير.
     """
+    __slots__ = ("id", "name", "model_year", "price", "color", "specs", "_status",
+                 "reserved_by", "reserved_ts")
+
     def __init__(self, name: str, model_year: int, price: float, color: str, specs: str = ""):
         # معرف فريد للسيارة
         self.id = IDGenerator.new("car")
@@ -164,10 +343,30 @@ class Car:
         self.specs = specs
         # الحالة الافتراضية: متاحة للبيع
         self.status = "available"
+        # لا حجز
+        self.reserved_by = None
+        self.reserved_ts = None
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = CompactUtil.intern(value)
+
+    @property
+    def reserved_until(self) -> Optional[str]:
+        """انتهاء الحجز كنص "YYYY-MM-DD HH:MM:SS" (أو None بلا حجز)."""
+        return CompactUtil.ts_to_iso(self.reserved_ts)
+
+    @reserved_until.setter
+    def reserved_until(self, value):
+        self.reserved_ts = None if value is None else CompactUtil.iso_to_ts(value)
 
     def to_dict(self) -> dict:
         """تحويل السيارة إلى dict لحفظها في JSON"""
-        return {
+        data = {
             "id": self.id,
             "name": self.name,
             "model_year": self.model_year,
@@ -176,16 +375,49 @@ class Car:
             "specs": self.specs,
             "status": self.status
         }
+        if self.reserved_ts is not None:
+            data["reserved_by"] = self.reserved_by
+            data["reserved_until"] = self.reserved_until
+        return data
 
     @staticmethod
     def from_dict(data: dict) -> 'Car':
-        """إنشاء كائن Car من dict (مقروء من JSON)"""
-        c = Car(data["name"], data.get("model_year", 0), data.get("price", 0.0),
-                data.get("color", ""), data.get("specs", ""))
+        """إنشاء كائن Car من dict (مقروء من JSON) عبر __new__ دون توليد معرف جديد"""
+        c = Car.__new__(Car)
         # إعادة المعرف إن وُجد في الملف
-        c.id = data.get("id", c.id)
-        # استرجاع الحالة (متاحة/مباعة)
+        c.id = data["id"] if "id" in data else IDGenerator.new("car")
+        c.name = data["name"]
+        c.model_year = data.get("model_year", 0)
+        c.price = CompactUtil.as_price(data.get("price", 0.0))
+        c.color = data.get("color", "")
+        c.specs = data.get("specs", "")
+        # استرجاع الحالة (متاحة/مباعة/محجوزة) والحجز إن وُجد
         c.status = data.get("status", "available")
+        c.reserved_by = data.get("reserved_by")
+        c.reserved_until = data.get("reserved_until")
+        return c
+
+    def to_row(self) -> tuple:
+        """
+        الحالة الداخلية كصف (بترتيب __slots__) للقطة الثنائية المخزنة مؤقتًا.
+        حقلا الحجز يُضافان فقط للسيارة المحجوزة (صفوف باقي السيارات بنفس الشكل السابق).
+        """
+        if self.reserved_ts is None:
+            return (self.id, self.name, self.model_year, self.price, self.color, self.specs,
+                    self._status)
+        return (self.id, self.name, self.model_year, self.price, self.color, self.specs,
+                self._status, self.reserved_by, self.reserved_ts)
+
+    @staticmethod
+    def from_row(row: tuple) -> 'Car':
+        """عكس to_row."""
+        c = Car.__new__(Car)
+        if len(row) == 7:
+            c.id, c.name, c.model_year, c.price, c.color, c.specs, c._status = row
+            c.reserved_by = c.reserved_ts = None
+        else:
+            (c.id, c.name, c.model_year, c.price, c.color, c.specs, c._status,
+             c.reserved_by, c.reserved_ts) = row
         return c
 
 # ---------------------------------------------------------------------
@@ -195,7 +427,11 @@ class Invoice:
     """
     كلاس الفاتورة (Invoice).
     يحتوي المعرف، اسم العميل، معرف السيارة، السعر، النقاط المكتسبة، والتاريخ.
+    التمثيل المضغوط: __slots__، اسم العميل نص مشترك (interned)،
+    والتاريخ عدد صحيح من الثواني (ts) مع خاصية date تعيده نصًا ISO كما كان.
     """
+    __slots__ = ("id", "_customer", "car_id", "price", "points_earned", "ts")
+
     def __init__(self, customer_username: str, car_id: str, price: float, points_earned: int):
         # معرف الفاتورة الفريد
         self.id = IDGenerator.new("inv")
@@ -207,9 +443,27 @@ class Invoice:
         self.price = price
         # نقاط الولاء المكتسبة من هذه العملية
         self.points_earned = points_earned
-        # تاريخ الإنشاء بصيغة قابلة للقراءة
+        # تاريخ الإنشاء (يُخزن كعدد ثوانٍ، ويُقرأ كنص عبر date)
         self.date = datetime.now().isoformat(sep=' ', timespec='seconds')
 
+    @property
+    def customer(self):
+        return self._customer
+
+    @customer.setter
+    def customer(self, value):
+        # اسم العميل يتكرر في كل فواتيره: نسخة واحدة مشتركة
+        self._customer = CompactUtil.intern(value)
+
+    @property
+    def date(self) -> str:
+        """التاريخ كنص "YYYY-MM-DD HH:MM:SS" (متوافق مع صيغة JSON)."""
+        return CompactUtil.ts_to_iso(self.ts)
+
+    @date.setter
+    def date(self, value):
+        self.ts = CompactUtil.iso_to_ts(value)
+
     def to_dict(self) -> dict:
         """تحويل الفاتورة إلى dict لحفظها"""
         return {
@@ -223,10 +477,26 @@ class Invoice:
 
     @staticmethod
     def from_dict(data: dict) -> 'Invoice':
-        """إنشاء الفاتورة من dict المحفوظة"""
-        inv = Invoice(data.get("customer", ""), data.get("car_id", ""), data.get("price", 0.0), data.get("points_earned", 0))
-        inv.id = data.get("id", inv.id)
-        inv.date = data.get("date", inv.date)
+        """إنشاء الفاتورة من dict المحفوظة (عبر __new__: بلا معرف جديد ولا datetime.now())"""
+        inv = Invoice.__new__(Invoice)
+        inv.id = data["id"] if "id" in data else IDGenerator.new("inv")
+        inv.customer = data.get("customer", "")
+        inv.car_id = data.get("car_id", "")
+        inv.price = CompactUtil.as_price(data.get("price", 0.0))
+        inv.points_earned = data.get("points_earned", 0)
+        inv.date = (data["date"] if "date" in data
+                    else datetime.now().isoformat(sep=' ', timespec='seconds'))
+        return inv
+
+    def to_row(self) -> tuple:
+        """الحالة الداخلية كصف (التاريخ كثوانٍ كما في الذاكرة) للقطة الثنائية المخزنة مؤقتًا."""
+        return (self.id, self._customer, self.car_id, self.price, self.points_earned, self.ts)
+
+    @staticmethod
+    def from_row(row: tuple) -> 'Invoice':
+        """عكس to_row (بلا إعادة تحليل نص التاريخ)."""
+        inv = Invoice.__new__(Invoice)
+        inv.id, inv._customer, inv.car_id, inv.price, inv.points_earned, inv.ts = row
         return inv
 
 # ---------------------------------------------------------------------
@@ -238,7 +508,8 @@ class Validator:
     - username_ok: تحقق من اسم المستخدم
     - password_ok: تحقق من قوة كلمة المرور
     - phone_ok: تحقق من رقم الهاتف
-    - positive_number: تحقق من أن القيمة رقم موجب
+    - positive_number: تحقق من أن القيمة رقم موجب محدود (ليس bool ولا inf/nan)
+    - model_year_ok: تحقق من سنة الموديل
     الهدف: فصل قواعد التحقق عن منطق الأعمال (separation of concerns).
     """
     @staticmethod
@@ -263,11 +534,1081 @@ class Validator:
 
     @staticmethod
     def positive_number(val) -> bool:
-        # نتحقق أن val يمكن تحويله إلى float وأنه موجب
+        # نتحقق أن val يمكن تحويله إلى float وأنه موجب ومحدود:
+        # نرفض true/false (float(True) == 1.0) و "inf"/"nan" (Infinity ليس JSON صالحًا)
+        if isinstance(val, bool):
+            return False
         try:
-            return float(val) > 0
+            num = float(val)
         except Exception:
             return False
+        return math.isfinite(num) and num > 0
+
+    @staticmethod
+    def model_year_ok(val) -> bool:
+        # سنة صحيحة بين أول سيارة (1886) والسنة القادمة (موديلات العام الجديد)
+        try:
+            year = int(val)
+        except (TypeError, ValueError):
+            return False
+        return 1886 <= year <= datetime.now().year + 1
+
+# ---------------------------------------------------------------------
+# فئة CarSearchIndex: فهرس مقلوب بالثلاثيات (trigrams) للبحث في السيارات
+# ---------------------------------------------------------------------
+class CarSearchIndex:
+    """
+    فهرس مقلوب (inverted index): كل ثلاثية أحرف -> مجموعة السيارات التي تحتويها.
+    - name و color في فهرس، و specs في فهرس منفصل، و id بمطابقة كاملة.
+    - البحث عن نص طوله >= 3 يأخذ تقاطع قوائم الثلاثيات فقط (المرشحين)،
+      ثم نتحقق من المطابقة الفعلية ليبقى الناتج مطابقًا للبحث القديم.
+    - يُبنى عند أول بحث (لا يبطئ التحميل)، ثم يُحدَّث مع كل إضافة/تعديل/حذف.
+    """
+    # الحقول النصية التي يؤثر تغييرها على الفهرس
+    FIELDS = ("id", "name", "color", "specs")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """تفريغ الفهرس (سيُعاد بناؤه عند أول بحث)."""
+        self.built = False
+        self._grams: Dict[str, set] = {}
+        self._spec_grams: Dict[str, set] = {}
+        self._ids: Dict[str, set] = {}
+        # Car -> (name, color, id, specs بحروف صغيرة, رقم الترتيب)
+        self._entries: dict = {}
+        self._seq = 0
+        # عدد السيارات المرشحة التي فُحصت في آخر بحث (للقياس)
+        self.last_scanned = 0
+
+    @staticmethod
+    def grams(text: str) -> set:
+        """ثلاثيات النص؛ النص الأقصر من 3 أحرف يُفهرس كما هو."""
+        if len(text) < 3:
+            return {text} if text else set()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def build(self, cars: List['Car']):
+        """بناء الفهرس من قائمة السيارات كاملة."""
+        self.reset()
+        self.built = True
+        for car in cars:
+            self.add(car)
+
+    def add(self, car: 'Car'):
+        """فهرسة سيارة جديدة (أو بعد تعديل)."""
+        if not self.built:
+            return
+        name, color = str(car.name).lower(), str(car.color).lower()
+        cid, specs = str(car.id).lower(), str(car.specs).lower()
+        self._seq += 1
+        self._entries[car] = (name, color, cid, specs, self._seq)
+        for g in self.grams(name) | self.grams(color):
+            self._grams.setdefault(g, set()).add(car)
+        for g in self.grams(specs):
+            self._spec_grams.setdefault(g, set()).add(car)
+        self._ids.setdefault(cid, set()).add(car)
+
+    def remove(self, car: 'Car'):
+        """حذف سيارة من كل قوائم الثلاثيات التي أُضيفت إليها."""
+        entry = self._entries.pop(car, None)
+        if entry is None:
+            return
+        name, color, cid, specs, _seq = entry
+        for index, keys in ((self._grams, self.grams(name) | self.grams(color)),
+                            (self._spec_grams, self.grams(specs)),
+                            (self._ids, {cid})):
+            for g in keys:
+                posting = index.get(g)
+                if posting is not None:
+                    posting.discard(car)
+                    if not posting:
+                        del index[g]
+
+    @staticmethod
+    def _candidates(index: Dict[str, set], term: str) -> set:
+        """السيارات المرشحة من فهرس ثلاثيات واحد."""
+        if len(term) >= 3:
+            # تقاطع قوائم الثلاثيات من الأصغر للأكبر مع توقف مبكر
+            postings = sorted((index.get(g, ()) for g in CarSearchIndex.grams(term)), key=len)
+            result = set(postings[0])
+            for p in postings[1:]:
+                if not result:
+                    break
+                result &= p
+            return result
+        # نص قصير: نجمع قوائم المفاتيح التي تحتويه (عدد المفاتيح محدود بعدد الثلاثيات المختلفة)
+        result = set()
+        for g, posting in index.items():
+            if term in g:
+                result |= posting
+        return result
+
+    def search(self, term: str, cars: List['Car'], in_specs: bool = False) -> List['Car']:
+        """
+        بحث بنفس قواعد CarService.search القديمة (الاسم أو اللون يحتوي النص، أو المعرف يساويه)،
+        مع ترتيب النتائج: معرف مطابق، ثم اسم مطابق، ثم اسم يبدأ بالنص، ثم اسم يحتويه، ثم اللون، ثم المواصفات.
+        """
+        if not self.built:
+            self.build(cars)
+        term = term.lower()
+        if not term:
+            # النص الفارغ يطابق كل السيارات (مثل السلوك القديم)
+            candidates = self._entries.keys()
+        else:
+            candidates = self._candidates(self._grams, term)
+            candidates |= self._ids.get(term, set())
+            if in_specs:
+                candidates |= self._candidates(self._spec_grams, term)
+        self.last_scanned = len(candidates)
+        ranked = []
+        for car in candidates:
+            name, color, cid, specs, seq = self._entries[car]
+            if cid == term:
+                rank = 0
+            elif name == term:
+                rank = 1
+            elif name.startswith(term):
+                rank = 2
+            elif term in name:
+                rank = 3
+            elif term in color:
+                rank = 4
+            elif in_specs and term in specs:
+                rank = 5
+            else:
+                continue
+            ranked.append((rank, seq, car))
+        ranked.sort(key=lambda r: (r[0], r[1]))
+        return [r[2] for r in ranked]
+
+# ---------------------------------------------------------------------
+# فئة CarQueryIndex: فهارس مرتبة (السعر/السنة) وفهارس تصنيف (الحالة/اللون)
+# ---------------------------------------------------------------------
+class CarQueryIndex:
+    """
+    فهارس ثانوية للاستعلام المركب عن السيارات:
+    - قائمتان مرتبتان (bisect) على price و model_year: نطاق السعر/السنة بـ O(log n).
+    - قاموسان (hash facets) على status و color: القيمة -> مجموعة السيارات.
+    مثل CarSearchIndex: يُبنى عند أول استعلام ثم يُحدَّث مع كل تعديل.
+    """
+    # الحقول التي يؤثر تغييرها على هذا الفهرس
+    FIELDS = ("price", "model_year", "status", "color")
+    # خيارات الترتيب: الاسم -> (الحقل المرتب، تنازلي؟)
+    SORTS = {None: (None, False), "price": ("price", False), "-price": ("price", True),
+             "year": ("year", False), "-year": ("year", True)}
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """تفريغ الفهرس (سيُعاد بناؤه عند أول استعلام)."""
+        self.built = False
+        # مفاتيح مرتبة (القيمة, رقم الترتيب) وقائمة السيارات الموازية لها
+        self._keys = {"price": [], "year": []}
+        self._cars = {"price": [], "year": []}
+        self._status: Dict[str, set] = {}
+        self._color: Dict[str, set] = {}
+        # Car -> (seq, price, year, status, color)
+        self._entries: dict = {}
+        self._seq = 0
+        # عدد السيارات التي فُحصت في آخر استعلام (للقياس)
+        self.last_scanned = 0
+
+    @staticmethod
+    def _num(value, cast, default):
+        """تحويل رقمي آمن (بيانات قديمة قد تحفظ السنة كنص)."""
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return default
+
+    def build(self, cars: List['Car']):
+        """بناء الفهارس من قائمة السيارات كاملة."""
+        self.reset()
+        self.built = True
+        for car in cars:
+            self.add(car)
+
+    def add(self, car: 'Car'):
+        """إدراج سيارة في القوائم المرتبة وقواميس التصنيف."""
+        if not self.built:
+            return
+        self._seq += 1
+        seq = self._seq
+        price = self._num(car.price, float, 0.0)
+        year = self._num(car.model_year, int, 0)
+        color = str(car.color).lower()
+        self._entries[car] = (seq, price, year, car.status, color)
+        for field, value in (("price", price), ("year", year)):
+            keys = self._keys[field]
+            i = bisect.bisect_right(keys, (value, seq))
+            keys.insert(i, (value, seq))
+            self._cars[field].insert(i, car)
+        self._status.setdefault(car.status, set()).add(car)
+        self._color.setdefault(color, set()).add(car)
+
+    def remove(self, car: 'Car'):
+        """حذف سيارة من كل الفهارس (بحث ثنائي عن موضعها)."""
+        entry = self._entries.pop(car, None)
+        if entry is None:
+            return
+        seq, price, year, status, color = entry
+        for field, value in (("price", price), ("year", year)):
+            i = bisect.bisect_left(self._keys[field], (value, seq))
+            del self._keys[field][i]
+            del self._cars[field][i]
+        for facet, value in ((self._status, status), (self._color, color)):
+            members = facet.get(value)
+            if members is not None:
+                members.discard(car)
+                if not members:
+                    del facet[value]
+
+    def facet_counts(self) -> dict:
+        """أعداد السيارات لكل حالة ولكل لون في المخزون كله (O(عدد القيم))."""
+        return {"status": {k: len(v) for k, v in self._status.items()},
+                "color": {k: len(v) for k, v in self._color.items()}}
+
+    def _range(self, field: str, lo, hi) -> tuple:
+        """حدود النطاق [lo, hi] داخل القائمة المرتبة للحقل."""
+        keys = self._keys[field]
+        start = 0 if lo is None else bisect.bisect_left(keys, (lo, 0))
+        end = len(keys) if hi is None else bisect.bisect_right(keys, (hi, float("inf")))
+        return start, end
+
+    def query(self, cars: List['Car'], status=None, color=None, price_min=None, price_max=None,
+              year_min=None, year_max=None, sort="price", limit: int = 20,
+              cursor: Optional[str] = None, facets: bool = False) -> dict:
+        """
+        تنفيذ الاستعلام. نختار أرخص مصدر للمرشحين:
+        - المشي على القائمة المرتبة لحقل الترتيب بدءًا من حد النطاق/المؤشر والتوقف عند limit
+          (O(log n + k))،
+        - أو أصغر مجموعة تصنيف (status/color) إن كانت أصغر بكثير من النطاق، ثم ترتيبها.
+        المؤشر cursor هو "القيمة:الترتيب" لآخر عنصر، ويُعاد next_cursor للصفحة التالية.
+        """
+        if not self.built:
+            self.build(cars)
+        if sort not in self.SORTS:
+            raise ValueError(f"sort must be one of {list(self.SORTS)}")
+        field, reverse = self.SORTS[sort]
+        color = color.lower() if color else None
+        bounds = {"price": (price_min, price_max), "year": (year_min, year_max)}
+        entries = self._entries
+
+        def match(car) -> bool:
+            _seq, price, year, st, col = entries[car]
+            return ((status is None or st == status)
+                    and (color is None or col == color)
+                    and (price_min is None or price >= price_min)
+                    and (price_max is None or price <= price_max)
+                    and (year_min is None or year >= year_min)
+                    and (year_max is None or year <= year_max))
+
+        def sort_key(car) -> tuple:
+            seq, price, year = entries[car][:3]
+            return ({"price": price, "year": year}.get(field, 0), seq)
+
+        after = None
+        if cursor:
+            value, seq = cursor.rsplit(":", 1)
+            after = ({"price": float, "year": int}.get(field, int)(value), int(seq))
+
+        # أصغر مجموعة تصنيف مطلوبة (إن وُجدت)
+        facet_sets = []
+        if status is not None:
+            facet_sets.append(self._status.get(status, set()))
+        if color is not None:
+            facet_sets.append(self._color.get(color, set()))
+        smallest = min(facet_sets, key=len) if facet_sets else None
+
+        page: list = []
+        walk = False
+        if field is not None:
+            start, end = self._range(field, *bounds[field])
+            # مجموعة التصنيف أصغر بكثير من النطاق؟ الأرخص فرزها بدل المشي على النطاق
+            walk = smallest is None or len(smallest) * 8 >= end - start
+        if walk:
+            # الخطة 1: المشي المرتب على فهرس الترتيب
+            keys, ordered = self._keys[field], self._cars[field]
+            if after is not None:
+                if reverse:
+                    end = min(end, bisect.bisect_left(keys, after))
+                else:
+                    start = max(start, bisect.bisect_right(keys, after))
+            indices = range(end - 1, start - 1, -1) if reverse else range(start, end)
+            scanned = 0
+            for scanned, i in enumerate(indices, 1):
+                car = ordered[i]
+                if match(car):
+                    page.append(car)
+                    if len(page) > limit:
+                        break
+        else:
+            # الخطة 2: مجموعة تصنيف صغيرة (أو ترتيب الإدخال) ثم ترتيب النتائج
+            if smallest is not None:
+                source = smallest
+            elif field is not None:
+                source = self._cars[field][start:end]
+            else:
+                source = entries.keys()
+            matched = []
+            scanned = 0
+            for scanned, car in enumerate(source, 1):
+                if match(car):
+                    key = sort_key(car)
+                    if after is None or (key < after if reverse else key > after):
+                        matched.append((key, car))
+                        # ترتيب الإدخال بدون تصنيف: المصدر مرتب أصلًا فنتوقف مبكرًا
+                        if smallest is None and field is None and len(matched) > limit:
+                            break
+            matched.sort(key=lambda m: m[0], reverse=reverse)
+            page = [m[1] for m in matched[:limit + 1]]
+        self.last_scanned = scanned
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            value, seq = sort_key(page[-1])
+            next_cursor = f"{value}:{seq}"
+        result = {"items": page, "next_cursor": next_cursor}
+        if facets:
+            result["facets"] = self._matched_facets(match, smallest, field, bounds)
+        return result
+
+    def _matched_facets(self, match, smallest, field, bounds) -> dict:
+        """أعداد الحالة واللون داخل كل النتائج المطابقة (بدون حد الصفحة) لفلاتر الواجهة."""
+        if smallest is not None:
+            source = smallest
+        elif field is not None:
+            start, end = self._range(field, *bounds[field])
+            source = self._cars[field][start:end]
+        else:
+            source = self._entries.keys()
+        counts = {"status": {}, "color": {}}
+        for car in source:
+            if match(car):
+                _seq, _price, _year, st, col = self._entries[car]
+                counts["status"][st] = counts["status"].get(st, 0) + 1
+                counts["color"][col] = counts["color"].get(col, 0) + 1
+        return counts
+
+# ---------------------------------------------------------------------
+# فئة ReservationQueue: طابور انتهاء حجوزات السيارات
+# ---------------------------------------------------------------------
+class ReservationQueue:
+    """
+    min-heap من (انتهاء الحجز، معرف السيارة): معرفة أقرب انتهاء O(1) وإخراج كل حجز منتهٍ
+    O(log n)، بدل المرور على كل السيارات في كل فحص.
+    الحذف كسول: الحجز الملغى أو المجدد أو المبيع يبقى مدخله القديم في الطابور ويُتجاهل عند
+    خروجه (نقارنه بحقول السيارة الحالية). يُبنى من السيارات عند أول استخدام.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._heap: List[tuple] = []
+        self.built = False
+
+    def build(self, cars: List['Car']):
+        self._heap = [(c.reserved_ts, c.id) for c in cars if c.reserved_ts is not None]
+        heapq.heapify(self._heap)
+        self.built = True
+
+    def push(self, car: 'Car'):
+        # قبل البناء لا داعي: البناء سيقرأ الحجز من السيارة نفسها
+        if self.built and car.reserved_ts is not None:
+            heapq.heappush(self._heap, (car.reserved_ts, car.id))
+
+    def due(self, store: 'DataStore', now_ts: int) -> bool:
+        """هل يوجد مدخل انتهى وقته (قد يكون قديمًا)؟ O(1) بعد البناء."""
+        if not self.built:
+            self.build(store.cars)
+        return bool(self._heap) and self._heap[0][0] <= now_ts
+
+    def pop_expired(self, store: 'DataStore', now_ts: int) -> List['Car']:
+        """إخراج الحجوزات المنتهية حتى now_ts؛ نعيد السيارات التي ما زال حجزها قائمًا."""
+        if not self.built:
+            self.build(store.cars)
+        expired = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            ts, car_id = heapq.heappop(self._heap)
+            car = store.find_car_by_id(car_id)
+            if car is not None and car.status == "reserved" and car.reserved_ts == ts:
+                expired.append(car)
+        return expired
+
+# ---------------------------------------------------------------------
+# فئة ReportAggregates: مجاميع التقارير المحدّثة تدريجيًا
+# ---------------------------------------------------------------------
+class ReportAggregates:
+    """
+    مجاميع تُحدَّث مع كل عملية بدل إعادة حسابها في كل تقرير:
+    - total_revenue: مجموع أسعار الفواتير.
+    - cars_by_status: عدد السيارات لكل حالة.
+    - ترتيب نقاط الولاء: قائمة مرتبة مقسمة إلى كتل (bucketed) بمفاتيح (-النقاط, ترتيب الإدخال)؛
+      البحث الثنائي على أكبر مفتاح في كل كتلة ثم داخل الكتلة، والإزاحة داخل كتلة واحدة
+      (حجمها محدود بـ POINTS_BUCKET) لا في القائمة كلها، فأعلى k مستخدمين = أول k عناصر.
+    تُبنى مرة واحدة عند DataStore.load() ثم يحدّثها DataStore مع كل إضافة/حذف/تعديل.
+    """
+    POINTS_BUCKET = 256   # حجم الكتلة عند البناء؛ تُقسم الكتلة إلى نصفين عند ضعفه
+
+    def __init__(self):
+        self.total_revenue = 0.0
+        self.cars_by_status: Dict[str, int] = {}
+        # كتل المفاتيح وكتل المستخدمين المقابلة، وأكبر مفتاح (آخر عنصر) في كل كتلة
+        self._points_keys: List[list] = []
+        self._points_users: List[list] = []
+        self._points_max: list = []
+        # User -> (النقاط المفهرسة, رقم الترتيب)
+        self._user_keys: dict = {}
+        self._seq = 0
+
+    def rebuild(self, store: 'DataStore'):
+        """إعادة الحساب الكامل (عند التحميل فقط)."""
+        self.__init__()
+        self.total_revenue = sum(inv.price for inv in store.invoices)
+        for c in store.cars:
+            self.add_car(c)
+        entries = []
+        for u in store.users:
+            self._seq += 1
+            self._user_keys[u] = (u.loyalty_points, self._seq)
+            entries.append(((-u.loyalty_points, self._seq), u))
+        entries.sort(key=lambda e: e[0])
+        size = self.POINTS_BUCKET
+        for i in range(0, len(entries), size):
+            chunk = entries[i:i + size]
+            self._points_keys.append([e[0] for e in chunk])
+            self._points_users.append([e[1] for e in chunk])
+            self._points_max.append(chunk[-1][0])
+
+    # --- الفواتير ---
+    def add_invoice(self, inv: 'Invoice'):
+        self.total_revenue += inv.price
+
+    def remove_invoice(self, inv: 'Invoice'):
+        self.total_revenue -= inv.price
+
+    # --- السيارات ---
+    def add_car(self, car: 'Car'):
+        self.cars_by_status[car.status] = self.cars_by_status.get(car.status, 0) + 1
+
+    def remove_car(self, car: 'Car', status=None):
+        """status: الحالة القديمة عند تعديل الحالة (وإلا الحالة الحالية)."""
+        status = car.status if status is None else status
+        left = self.cars_by_status.get(status, 0) - 1
+        if left > 0:
+            self.cars_by_status[status] = left
+        else:
+            self.cars_by_status.pop(status, None)
+
+    # --- المستخدمون ونقاط الولاء ---
+    def add_user(self, user: 'User', seq: Optional[int] = None):
+        if seq is None:
+            self._seq += 1
+            seq = self._seq
+        key = (-user.loyalty_points, seq)
+        self._user_keys[user] = (user.loyalty_points, seq)
+        if not self._points_keys:
+            self._points_keys.append([key])
+            self._points_users.append([user])
+            self._points_max.append(key)
+            return
+        # أول كتلة أكبر مفاتيحها >= key (أو الأخيرة إن كان key أكبر من الكل)
+        b = min(bisect.bisect_left(self._points_max, key), len(self._points_max) - 1)
+        keys, users = self._points_keys[b], self._points_users[b]
+        i = bisect.bisect_left(keys, key)
+        keys.insert(i, key)
+        users.insert(i, user)
+        self._points_max[b] = keys[-1]
+        if len(keys) > 2 * self.POINTS_BUCKET:
+            half = len(keys) // 2
+            self._points_keys[b + 1:b + 1] = [keys[half:]]
+            self._points_users[b + 1:b + 1] = [users[half:]]
+            del keys[half:], users[half:]
+            self._points_max[b:b + 1] = [keys[-1], self._points_keys[b + 1][-1]]
+
+    def remove_user(self, user: 'User') -> Optional[int]:
+        """حذف المستخدم من ترتيب النقاط؛ نعيد رقم ترتيبه لإعادة الإدراج بعد تعديل النقاط."""
+        entry = self._user_keys.pop(user, None)
+        if entry is None:
+            return None
+        points, seq = entry
+        key = (-points, seq)
+        b = bisect.bisect_left(self._points_max, key)
+        keys, users = self._points_keys[b], self._points_users[b]
+        i = bisect.bisect_left(keys, key)
+        del keys[i], users[i]
+        if keys:
+            self._points_max[b] = keys[-1]
+        else:
+            del self._points_keys[b], self._points_users[b], self._points_max[b]
+        return seq
+
+    def points_changed(self, user: 'User'):
+        """تحديث موضع المستخدم بعد تغيّر نقاطه (نحافظ على ترتيبه بين المتساوين)."""
+        self.add_user(user, self.remove_user(user))
+
+    def top_users(self, top_n: int) -> List['User']:
+        """أعلى top_n مستخدمين بالنقاط (بنفس ترتيب sorted المستقر القديم)."""
+        top: List['User'] = []
+        for users in self._points_users:
+            if len(top) >= top_n:
+                break
+            top.extend(users[:top_n - len(top)])
+        return top
+
+    def verify(self, store: 'DataStore', top_n: int = 5) -> List[str]:
+        """
+        وضع فحص الاتساق: مقارنة المجاميع بإعادة حساب كاملة.
+        نعيد قائمة بالاختلافات (فارغة إن كان كل شيء متسقًا).
+        """
+        problems = []
+        revenue = sum(inv.price for inv in store.invoices)
+        if not math.isclose(revenue, self.total_revenue, rel_tol=1e-9, abs_tol=1e-6):
+            problems.append(f"total_revenue: {self.total_revenue} != {revenue}")
+        statuses: Dict[str, int] = {}
+        for c in store.cars:
+            statuses[c.status] = statuses.get(c.status, 0) + 1
+        if statuses != self.cars_by_status:
+            problems.append(f"cars_by_status: {self.cars_by_status} != {statuses}")
+        expected = sorted(store.users, key=lambda u: u.loyalty_points, reverse=True)[:top_n]
+        got = self.top_users(top_n)
+        # نقارن النقاط (المتساوون في النقاط قد يختلف ترتيبهم بعد تراجع معاملة)
+        if [u.loyalty_points for u in got] != [u.loyalty_points for u in expected]:
+            problems.append("top_customers_by_points: ranking differs from full sort")
+        return problems
+
+# ---------------------------------------------------------------------
+# فئة FileLock: قفل ملف بين العمليات (عدة نسخ من البرنامج على نفس الملف)
+# ---------------------------------------------------------------------
+class FileLock:
+    """
+    قفل ملف استشاري (advisory) بين العمليات عبر fcntl.flock على "<path>.lock".
+    قابل لإعادة الدخول (reentrant) داخل نفس العملية: الحفظ داخل معاملة لا يقفل مرتين.
+    على الأنظمة بدون fcntl يصبح القفل بلا أثر (ويبقى فحص الإصدار يكشف التقادم).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        self._depth += 1
+        if self._depth == 1:
+            self._fd = open(self.path, "a")
+            if fcntl is not None:
+                # ننتظر حتى تنهي العملية الأخرى كتابتها
+                fcntl.flock(self._fd.fileno(), fcntl.LOCK_EX)
+
+    def release(self):
+        if not self._depth:
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd.fileno(), fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
+
+# ---------------------------------------------------------------------
+# فئة SnapshotCache: لقطة ثنائية مخزنة مؤقتًا بجانب ملف JSON
+# ---------------------------------------------------------------------
+class SnapshotCache:
+    """
+    نسخة ثنائية (marshal) من حالة المخزن في "<path>.cache" لتسريع بدء التشغيل:
+    - تحوي صفوف الكائنات (to_row) بدل dict لكل سجل، فالتحميل لا يحلل JSON ولا التواريخ.
+    - مفتاحها (الحجم، mtime، هش blake2b) لملف JSON: نفس الحجم والوقت = صالحة دون قراءة الملف،
+      ونفس الحجم بوقت مختلف (نسخ/touch) = نتحقق بالهش. أي اختلاف آخر يعني إعادة البناء من JSON.
+    - ملف JSON يبقى المصدر الوحيد للحقيقة: حذف ملف cache لا يفقد شيئًا.
+    صيغة marshal خاصة بإصدار بايثون، لذا نتحقق من الإصدار ومن SCHEMA_VERSION أيضًا.
+    """
+    MAGIC = b"SSSCACHE1\n"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @classmethod
+    def key_for(cls, source_path: str, data: Optional[bytes] = None) -> tuple:
+        """مفتاح ملف المصدر؛ data محتواه إن كان مقروءًا بالفعل (لا نقرؤه مرتين)."""
+        st = os.stat(source_path)
+        if data is None:
+            with open(source_path, "rb") as f:
+                data = f.read()
+        return (st.st_size, st.st_mtime_ns, cls.digest(data))
+
+    def _header(self) -> list:
+        return [list(sys.version_info[:2]), SCHEMA_VERSION]
+
+    def read(self, source_path: str) -> Optional[dict]:
+        """محتوى اللقطة إن طابقت ملف المصدر، وإلا None."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            with f:
+                if f.read(len(self.MAGIC)) != self.MAGIC:
+                    return None
+                # الرأس مسبوق بطوله: نتحقق منه قبل قراءة الجسم
+                length = int.from_bytes(f.read(4), "big")
+                header, (size, mtime, digest) = marshal.loads(f.read(length))
+                if header != self._header():
+                    return None
+                st = os.stat(source_path)
+                if st.st_size != size:
+                    return None
+                if st.st_mtime_ns != mtime:
+                    with open(source_path, "rb") as src:
+                        if self.digest(src.read()) != digest:
+                            return None
+                # marshal.loads على البايتات كاملة أسرع بكثير من marshal.load على الملف
+                return marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            # ملف تالف أو من إصدار آخر: نتجاهله ويُعاد بناؤه
+            return None
+
+    def write(self, key: tuple, store: 'DataStore', version: int, gen: int):
+        """كتابة اللقطة ذريًا (ملف مؤقت ثم os.replace)."""
+        body = {"version": version, "gen": gen, "schema_version": store.schema_version,
+                "rows": {"users": [u.to_row() for u in store.users],
+                         "cars": [c.to_row() for c in store.cars],
+                         "invoices": [i.to_row() for i in store.invoices]}}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                header = marshal.dumps([self._header(), list(key)])
+                f.write(self.MAGIC + len(header).to_bytes(4, "big") + header)
+                f.write(marshal.dumps(body))
+            os.replace(tmp_path, self.path)
+        except (OSError, ValueError):
+            # اللقطة تسريع فقط: فشلها (قرص ممتلئ/قيمة غير قابلة للتسلسل) لا يوقف البرنامج
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+# ---------------------------------------------------------------------
+# فئة JsonBackend: تخزين البيانات في ملف JSON (مع وضع السجل الاختياري)
+# ---------------------------------------------------------------------
+class JsonBackend:
+    """
+    واجهة التخزين الافتراضية: ملف JSON واحد.
+    كل واجهة تخزين (backend) توفر نفس الطرق:
+    - load(): تعيد dict فيه قوائم users/cars/invoices (كـ dict) أو None إن لم توجد بيانات.
+    - save(store, changes): تحفظ؛ changes هي (kind, id) -> السجل أو None للحذف.
+    - close(): إنهاء أي عمل معلق.
+    وطرق اختيارية للوصول المشترك بين العمليات:
+    - lock()/unlock(): قفل الملف حول القراءة-التعديل-الكتابة.
+    - poll(): فحص التقادم؛ تعيد None أو ("delta", ops) أو ("full", raw).
+    وطرق اختيارية للقطة الثنائية المخزنة مؤقتًا (SnapshotCache):
+    - load_rows(): dict فيه "rows" (صفوف الكائنات) أو None إن لم تصلح اللقطة.
+    - store_cache(store): تحديث اللقطة بعد تحميل من JSON، وعند الإغلاق إن حفظنا منذ آخر تحديث.
+
+    وضع السجل (journal=True): بدل إعادة كتابة الملف كاملًا في كل حفظ،
+    نضيف سطرًا صغيرًا لكل سجل تغيّر إلى ملف "<path>.journal".
+    عند التحميل نقرأ آخر لقطة (snapshot) ثم نعيد تطبيق السجل،
+    وعندما يتجاوز السجل JOURNAL_COMPACT_BYTES ندمجه في لقطة جديدة.
+
+    الوصول المشترك (shared=True): الملف يحمل رقم إصدار (version) يزيد مع كل حفظ،
+    ونتذكر (inode, mtime, size) للملفات بعد آخر قراءة/كتابة. إن لم تتغير فالنسخة في الذاكرة حديثة
+    دون أي قراءة. في وضع السجل نقرأ السطور الجديدة فقط من موضعنا السابق في السجل.
+    """
+    # أسماء المجموعات المحفوظة
+    KINDS = ("users", "cars", "invoices")
+    # رقم الإصدار والجيل يُكتبان أول الملف ليُقرآ دون تحليل JSON كاملًا
+    HEADER_RE = re.compile(rb'"(version|gen)":\s*(\d+)')
+
+    def __init__(self, path: str = DATA_FILE, journal: bool = USE_JOURNAL,
+                 compact_bytes: int = JOURNAL_COMPACT_BYTES, background_compaction: bool = True,
+                 shared: bool = SHARED_ACCESS, cache: bool = SNAPSHOT_CACHE):
+        # مسار ملف البيانات
+        self.path = path
+        # إعدادات وضع السجل
+        self.journal = journal
+        self.journal_path = path + ".journal"
+        self.compact_bytes = compact_bytes
+        self.background_compaction = background_compaction
+        # رقم الجيل: يزيد مع كل دمج للسجل في لقطة جديدة
+        self._gen = 0
+        # خيط الدمج في الخلفية (إن وُجد)
+        self._compactor: Optional[threading.Thread] = None
+        # الوصول المشترك: القفل، رقم الإصدار، بصمة الملفات، وموضع القراءة في السجل
+        self.shared = shared
+        self.file_lock = FileLock(path + ".lock")
+        self.version = 0
+        self._stamp = None
+        self._journal_offset = 0
+        # اللقطة الثنائية المخزنة مؤقتًا، ومفتاح آخر ملف JSON قرأناه ولم نخزنه بعد
+        self.cache = SnapshotCache(path + ".cache") if cache else None
+        self._cache_key = None
+        self._cache_stale = False
+
+    def lock(self):
+        """قفل الملف بين العمليات (لا شيء إن كان الوصول المشترك معطلًا)."""
+        if self.shared:
+            self.file_lock.acquire()
+
+    def unlock(self):
+        if self.shared:
+            self.file_lock.release()
+
+    def load(self) -> Optional[dict]:
+        """
+        قراءة اللقطة من ملف JSON ثم إعادة تطبيق السجل (إن وُجد) فوقها.
+        إن وُجد سجل بينما وضع السجل غير مفعل ندمجه فورًا في الملف.
+        """
+        self.wait_for_compaction()
+        self.lock()
+        try:
+            self._cache_key = None
+            try:
+                # نفتح الملف ونقرأ المحتوى (كبايتات: نحتاجها أيضًا لهش مفتاح اللقطة الثنائية)
+                with open(self.path, "rb") as f:
+                    data = f.read()
+                raw = json.loads(data)
+                if self.cache is not None and not self._has_journal():
+                    self._cache_key = SnapshotCache.key_for(self.path, data)
+                del data
+            except FileNotFoundError:
+                raw = None
+            replayed = self._replay_journals(raw)
+            if replayed is not None:
+                raw = replayed
+                if not self.journal:
+                    self.version = raw.get("version", 0)
+                    self._write_snapshot(self._with_header(raw))
+                    self._remove_journals()
+            if raw is not None:
+                self._gen = raw.get("gen", 0)
+                self.version = raw.get("version", 0)
+            self._journal_offset = self._journal_size()
+            self._stamp = self._file_stamp()
+        finally:
+            self.unlock()
+        return raw
+
+    def _has_journal(self) -> bool:
+        return os.path.exists(self.journal_path) or os.path.exists(self.journal_path + ".old")
+
+    def load_rows(self) -> Optional[dict]:
+        """
+        التحميل من اللقطة الثنائية إن طابقت ملف JSON الحالي (بدون سجل معلق).
+        نعيد {"version", "gen", "schema_version", "rows": {...}} أو None ليُستخدم load().
+        """
+        if self.cache is None or self._has_journal():
+            return None
+        self.wait_for_compaction()
+        self.lock()
+        try:
+            raw = self.cache.read(self.path)
+            if raw is not None:
+                self._gen = raw.get("gen", 0)
+                self.version = raw.get("version", 0)
+                self._journal_offset = self._journal_size()
+                self._stamp = self._file_stamp()
+        finally:
+            self.unlock()
+        return raw
+
+    def store_cache(self, store: 'DataStore'):
+        """
+        كتابة اللقطة الثنائية لآخر ملف JSON قرأناه، أو (عند الإغلاق) لآخر ملف كتبناه:
+        الحفظ نفسه لا يكتب اللقطة حتى لا يبطئ كل عملية، بل نكتبها مرة واحدة في close().
+        """
+        if self.cache is None:
+            return
+        if self._cache_key is None and self._cache_stale and not self._has_journal():
+            self.lock()
+            try:
+                # عملية أخرى كتبت بعدنا؟ الملف لم يعد يطابق ما في الذاكرة
+                if self._peek_header().get("version", -1) == self.version:
+                    self._cache_key = SnapshotCache.key_for(self.path)
+            finally:
+                self.unlock()
+        if self._cache_key is not None:
+            self.cache.write(self._cache_key, store, self.version, self._gen)
+            self._cache_key = None
+            self._cache_stale = False
+
+    def save(self, store: 'DataStore', changes: dict):
+        """
+        - الوضع العادي: نكتب users, cars, invoices كاملة كقوائم dict.
+        - وضع السجل: نضيف سطرًا لكل سجل تغيّر فقط، وندمج السجل عند تجاوز الحد.
+        (مع الوصول المشترك يستدعيها DataStore.save تحت القفل وبعد تحديث الذاكرة من الملف)
+        """
+        if not self.journal:
+            self.version += 1
+            self._write_snapshot(self._with_header(store.snapshot()))
+            # اللقطة الثنائية أصبحت قديمة؛ تُحدَّث عند الإغلاق (store_cache)
+            self._cache_key = None
+            self._cache_stale = self.cache is not None
+        elif not changes and os.path.exists(self.path):
+            return
+        elif not os.path.exists(self.path) and not os.path.exists(self.journal_path):
+            # أول حفظ لمخزن جديد: نكتب لقطة فارغة/ابتدائية
+            self._write_snapshot(self._with_header(store.snapshot()))
+        else:
+            self._append_journal(changes)
+            if self._journal_offset >= self.compact_bytes:
+                self.compact(store, background=self.background_compaction)
+        self._stamp = self._file_stamp()
+
+    def close(self):
+        """انتظار أي دمج جارٍ قبل الإغلاق."""
+        self.wait_for_compaction()
+
+    def _with_header(self, data: dict) -> dict:
+        """اللقطة مع رقم الإصدار (والجيل في وضع السجل) وإصدار الصيغة في أول الملف."""
+        out = {"version": self.version}
+        if self.journal:
+            out["gen"] = self._gen
+        out["schema_version"] = data.get("schema_version", 0)
+        for kind in self.KINDS:
+            out[kind] = data.get(kind, [])
+        return out
+
+    def _write_snapshot(self, data: dict):
+        """
+        كتابة لقطة كاملة للملف بشكل ذري (atomic):
+        نكتب إلى ملف مؤقت ثم os.replace، فلا يُقطع الملف الأصلي إن توقف البرنامج أثناء json.dump.
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if self.journal:
+                # في وضع السجل نكتب بدون مسافات لأن الملف يُقرأ آليًا فقط
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # -------------------------
+    # فحص التقادم (عدة عمليات على نفس الملف)
+    # -------------------------
+    def _file_stamp(self) -> tuple:
+        """(inode, mtime, size) لملف البيانات والسجل: تغيّرها يعني أن عملية أخرى كتبت."""
+        stamp = []
+        for p in (self.path, self.journal_path):
+            try:
+                st = os.stat(p)
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def _peek_header(self) -> dict:
+        """قراءة version/gen من أول بايتات الملف فقط."""
+        try:
+            with open(self.path, "rb") as f:
+                head = f.read(128)
+        except FileNotFoundError:
+            return {}
+        return {k.decode(): int(v) for k, v in self.HEADER_RE.findall(head)}
+
+    def poll(self):
+        """
+        هل كتبت عملية أخرى منذ آخر قراءة/كتابة لنا؟ (تُستدعى تحت القفل)
+        - لم تتغير بصمة الملفات: None دون قراءة أي شيء.
+        - وضع السجل ونفس الجيل: ("delta", [(kind, id, السجل أو None), ...]) من السطور الجديدة فقط.
+        - غير ذلك (لقطة جديدة أو دمج): ("full", raw) بعد قراءة الملف كاملًا.
+        """
+        if not self.shared:
+            return None
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return None
+        header = self._peek_header()
+        if self.journal:
+            ops = self._read_journal_tail(header)
+            if ops is not None:
+                self._stamp = stamp
+                return ("delta", ops) if ops else None
+        elif header.get("version", -1) == self.version:
+            # الملف أعيدت كتابته بنفس المحتوى (نفس الإصدار)
+            self._stamp = stamp
+            return None
+        raw = self.load()
+        return None if raw is None else ("full", raw)
+
+    def _read_journal_tail(self, header: dict) -> Optional[list]:
+        """
+        السطور التي أضافتها عمليات أخرى إلى السجل بعد موضعنا.
+        نعيد None إن تغيّر الجيل (تم الدمج) فيلزم تحميل كامل.
+        """
+        if header.get("gen", 0) != self._gen:
+            return None
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return [] if self._journal_offset == 0 else None
+        ops = []
+        with f:
+            if self._journal_offset == 0:
+                first = f.readline()
+                try:
+                    if json.loads(first).get("gen", 0) != self._gen:
+                        return None
+                except ValueError:
+                    return []
+                pos = len(first)
+            else:
+                f.seek(self._journal_offset)
+                pos = self._journal_offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # سطر لم يكتمل بعد: نقرؤه في المرة القادمة
+                    break
+                pos += len(line)
+                rec = json.loads(line)
+                op = rec.get("op")
+                if op == "ver":
+                    self.version = rec["v"]
+                elif op == "del":
+                    ops.append((rec["kind"], rec["id"], None))
+                else:
+                    ops.append((rec["kind"], rec["data"].get("id"), rec["data"]))
+        self._journal_offset = pos
+        return ops
+
+    # -------------------------
+    # السجل الإلحاقي (journal)
+    # -------------------------
+    def _append_journal(self, changes: dict):
+        """إضافة التغييرات كسطور JSON إلى نهاية ملف السجل ثم fsync."""
+        # كل دفعة تبدأ برقم الإصدار الجديد
+        self.version += 1
+        lines = [json.dumps({"op": "ver", "v": self.version})]
+        for (kind, record_id), obj in changes.items():
+            if obj is None:
+                rec = {"op": "del", "kind": kind, "id": record_id}
+            else:
+                rec = {"op": "put", "kind": kind, "data": obj.to_dict()}
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        new_file = not os.path.exists(self.journal_path)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            if new_file:
+                # أول سطر: رقم الجيل الذي يُطبَّق عليه هذا السجل
+                f.write(json.dumps({"gen": self._gen}) + "\n")
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            self._journal_offset = f.tell()
+
+    def _replay_journals(self, raw: Optional[dict]) -> Optional[dict]:
+        """
+        إعادة تطبيق ملفات السجل (القديم المدوَّر ثم الحالي) فوق اللقطة raw.
+        نعيد None إن لم يوجد أي سجل.
+        """
+        paths = [p for p in (self.journal_path + ".old", self.journal_path) if os.path.exists(p)]
+        if not paths:
+            return None
+        snap_gen = (raw or {}).get("gen", 0)
+        version = (raw or {}).get("version", 0)
+        # نحول القوائم إلى dict مرتب حسب المعرف ليسهل الاستبدال والحذف
+        tables = {}
+        for kind in self.KINDS:
+            table = {}
+            for rec in (raw or {}).get(kind, []):
+                key = rec.get("id")
+                # معرفات مكررة في بيانات قديمة: نحتفظ بها بمفتاح مختلف
+                while key in table:
+                    key = (key, len(table))
+                table[key] = rec
+            tables[kind] = table
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                header = f.readline()
+                try:
+                    gen = json.loads(header).get("gen", 0)
+                except ValueError:
+                    continue
+                if gen < snap_gen:
+                    # سجل قديم تم دمجه في اللقطة بالفعل
+                    continue
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # سطر ناقص في النهاية (انقطاع أثناء الكتابة): نتوقف هنا
+                        break
+                    if rec.get("op") == "ver":
+                        version = max(version, rec.get("v", 0))
+                        continue
+                    table = tables.get(rec.get("kind"))
+                    if table is None:
+                        continue
+                    if rec.get("op") == "del":
+                        table.pop(rec.get("id"), None)
+                    else:
+                        table[rec["data"].get("id")] = rec["data"]
+        result = {kind: list(tables[kind].values()) for kind in self.KINDS}
+        result["gen"] = snap_gen
+        result["version"] = version
+        result["schema_version"] = (raw or {}).get("schema_version", 0)
+        return result
+
+    def compact(self, store: 'DataStore', background: bool = False):
+        """
+        دمج السجل في لقطة جديدة:
+        - ندوّر السجل الحالي إلى "<journal>.old" ونبدأ جيلًا جديدًا، فتستمر الكتابة فورًا.
+        - نكتب اللقطة (في الخلفية إن طُلب) ثم نحذف السجل القديم.
+        """
+        self.wait_for_compaction()
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.journal_path + ".old")
+        self._gen += 1
+        self._journal_offset = 0
+        # تحويل الكائنات إلى dict يتم هنا في الخيط الرئيسي ليكون متسقًا
+        data = self._with_header(store.snapshot())
+
+        def run():
+            self._write_snapshot(data)
+            try:
+                os.remove(self.journal_path + ".old")
+            except FileNotFoundError:
+                pass
+
+        if background and not self.shared:
+            # مع الوصول المشترك يكون الدمج متزامنًا تحت القفل: عملية أخرى قد تقرأ السجل القديم
+            self._compactor = threading.Thread(target=run, name="journal-compaction")
+            self._compactor.start()
+        else:
+            run()
+            self._stamp = self._file_stamp()
+
+    def wait_for_compaction(self):
+        """انتظار انتهاء الدمج الجاري في الخلفية (إن وُجد)."""
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _remove_journals(self):
+        """حذف ملفات السجل بعد دمجها في اللقطة."""
+        for p in (self.journal_path, self.journal_path + ".old"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
 
 # ---------------------------------------------------------------------
 # فئة DataStore: مسؤول عن تحميل وحفظ البيانات في JSON
@@ -275,60 +1616,771 @@ class Validator:
 class DataStore:
     """
     DataStore يحتفظ بالقوائم في الذاكرة (users, cars, invoices)
-    ويقوم بتحميلها من الملف وحفظها فيه.
+    ويقوم بتحميلها وحفظها عبر واجهة تخزين (backend) قابلة للتبديل:
+    - JsonBackend (الافتراضي): ملف JSON، مع وضع السجل الاختياري.
+    - SqliteBackend (sqlite_backend.py): يُختار تلقائيًا لامتدادات .db/.sqlite/.sqlite3.
+    - BinaryBackend (binary_backend.py): صيغة ثنائية مضغوطة لامتدادات .bin/.bin.zlib/.bin.xz.
+    عدة عمليات على نفس الملف (shared=True): كل معاملة تقفل الملف وتحدّث الذاكرة بما كتبته
+    العمليات الأخرى (refresh) قبل أي تعديل، فلا تكتب عملية فوق مبيعات عملية أخرى.
+    partition_invoices=True: store.invoices يحوي فواتير الشهر الحالي فقط (القسم النشط)؛
+    الأشهر المغلقة تُنقل إلى self.archive (invoice_archive.py) وتُفتح عند الحاجة.
+    points_ledger=True: كل تغيير في نقاط الولاء قيد في self.ledger (points_ledger.py) عبر post_points.
     """
-    def __init__(self, path: str = DATA_FILE):
+    # امتدادات الملفات التي تُفتح بقاعدة SQLite
+    SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+    # امتدادات الصيغة الثنائية (الضغط يُستنتج من الامتداد)
+    BINARY_EXTENSIONS = (".bin", ".bin.zlib", ".bin.xz")
+
+    def __init__(self, path: str = DATA_FILE, journal: bool = USE_JOURNAL,
+                 compact_bytes: int = JOURNAL_COMPACT_BYTES, background_compaction: bool = True,
+                 backend=None, shared: bool = SHARED_ACCESS,
+                 partition_invoices: bool = PARTITION_INVOICES,
+                 points_ledger: bool = POINTS_LEDGER):
         # مسار ملف البيانات
         self.path = path
+        # إصدار صيغة السجلات (الملفات الأقدم تُرقّى عند التحميل)
+        self.schema_version = SCHEMA_VERSION
+        # واجهة التخزين: إما ممررة صراحة أو تُختار من امتداد الملف
+        if backend is None:
+            if path.lower().endswith(self.SQLITE_EXTENSIONS):
+                from sqlite_backend import SqliteBackend
+                backend = SqliteBackend(path, shared)
+            elif path.lower().endswith(self.BINARY_EXTENSIONS):
+                from binary_backend import BinaryBackend
+                backend = BinaryBackend(path, shared=shared)
+            else:
+                backend = JsonBackend(path, journal, compact_bytes, background_compaction, shared)
+        self.backend = backend
+        # التغييرات المعلقة منذ آخر حفظ: (kind, id) -> السجل أو None للحذف
+        self._changes: Dict[tuple, object] = {}
+        # حالة المعاملات: العمق، سجل التراجع (undo)، وهل طُلب حفظ داخل المعاملة
+        self._tx_depth = 0
+        self._undo: list = []
+        self._save_requested = False
+        self._rolling_back = False
+        # قيود النقاط المؤجلة حتى نجاح حفظ المعاملة، وأرصدة اللقطة الافتتاحية إن بدأ السجل فيها
+        self._pending_points: list = []
+        self._ledger_opening: Optional[dict] = None
         # القوائم في الذاكرة (مبدئيًا فارغة)
         self.users: List[User] = []
         self.cars: List[Car] = []
         self.invoices: List[Invoice] = []
+        # فهارس (dict) للبحث السريع O(1) بدل المرور على القوائم كاملة
+        self._users_by_name: Dict[str, User] = {}
+        self._users_by_id: Dict[str, User] = {}
+        self._cars_by_id: Dict[str, Car] = {}
+        # فهارس الفواتير: حسب العميل (بترتيب الإنشاء) وحسب السيارة (آخر فاتورة لها)
+        self._invoices_by_customer: Dict[str, List[Invoice]] = {}
+        self._invoice_by_car: Dict[str, Invoice] = {}
+        # هل self.invoices مرتبة بالمعرف (IDGenerator.sort_key)؟ تُفحص كسولًا عند أول استعلام زمني
+        self._invoices_sorted = False
+        # فهرس البحث النصي وفهارس الاستعلام في السيارات (تُبنى عند أول استخدام)
+        self.car_index = CarSearchIndex()
+        self.car_query = CarQueryIndex()
+        self.car_indexes = (self.car_index, self.car_query)
+        # مجاميع التقارير (الإيراد، حالات السيارات، ترتيب نقاط الولاء)
+        self.aggregates = ReportAggregates()
+        # طابور انتهاء حجوزات السيارات (يُبنى عند أول استخدام)
+        self.reservations = ReservationQueue()
+        # أرشيف الفواتير الشهري (None = كل الفواتير في القسم النشط)
+        self.archive = None
+        if partition_invoices:
+            from invoice_archive import InvoiceArchive
+            self.archive = InvoiceArchive(path + ".archive", ARCHIVE_CACHE_PARTITIONS)
+        # سجل قيود النقاط (None = النقاط تتغير في المستخدم فقط بلا تاريخ)
+        self.ledger = None
+        if points_ledger:
+            from points_ledger import PointsLedger
+            self.ledger = PointsLedger(path + ".ledger", LEDGER_CHECKPOINT_BYTES)
         # محاولة تحميل البيانات من الملف
         self.load()
+        if self.archive is not None:
+            self.archive_closed_months()
 
     def load(self):
         """
-        تحميل البيانات من ملف JSON إلى قوائم الكائنات.
-        إن لم يوجد الملف، ننشئ واحدًا جديدًا عبر save().
+        تحميل البيانات من واجهة التخزين إلى قوائم الكائنات.
+        إن لم توجد بيانات، ننشئ الملف عبر save().
+        إن استطاعت الواجهة إعادة صفوف الكائنات مباشرة (load_rows: اللقطة المخزنة مؤقتًا لـ JSON
+        أو الصيغة الثنائية) نبني الكائنات منها دون dict وسيط.
         """
-        try:
-            # نفتح الملف ونقرأ المحتوى
-            with open(self.path, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-            # نحول كل dict إلى كائن مطابق
-            self.users = [User.from_dict(u) for u in raw.get("users", [])]
-            self.cars = [Car.from_dict(c) for c in raw.get("cars", [])]
-            self.invoices = [Invoice.from_dict(i) for i in raw.get("invoices", [])]
-        except FileNotFoundError:
+        self._changes = {}
+        load_rows = getattr(self.backend, "load_rows", None)
+        loaded = load_rows() if load_rows is not None else None
+        if loaded is not None:
+            rows = loaded["rows"]
+            self.users = [User.from_row(r) for r in rows["users"]]
+            self.cars = [Car.from_row(r) for r in rows["cars"]]
+            self.invoices = [Invoice.from_row(r) for r in rows["invoices"]]
+            self._rebuild_indexes()
+            return
+        raw = self.backend.load()
+        if raw is None:
             # إذا الملف غير موجود ننشئه عبر حفظ الحالة الحالية (الفارغة)
             self.save()
+            return
+        upgraded = raw.get("schema_version", 0) < SCHEMA_VERSION
+        if upgraded:
+            # ملف بصيغة أقدم: نطبق خطوات الترقية الناقصة فقط
+            from migrate_data import upgrade_store
+            old_ids = {kind: {r.get("id") for r in raw.get(kind, [])} for kind in JsonBackend.KINDS}
+            raw = upgrade_store(raw, SCHEMA_VERSION)
+        # نحول كل dict إلى كائن مطابق
+        self.users = [User.from_dict(u) for u in raw.get("users", [])]
+        self.cars = [Car.from_dict(c) for c in raw.get("cars", [])]
+        self.invoices = [Invoice.from_dict(i) for i in raw.get("invoices", [])]
+        # بناء الفهارس مرة واحدة بعد التحميل
+        self._rebuild_indexes()
+        if upgraded:
+            # نكتب كل السجلات بالصيغة الجديدة في لقطة واحدة
+            for kind, objs in (("users", self.users), ("cars", self.cars), ("invoices", self.invoices)):
+                for rid in old_ids[kind] - {obj.id for obj in objs}:
+                    # سجلات استُبدلت أثناء الترقية (مثل مستخدم مشوه فُكّ إلى عدة مستخدمين)
+                    self._mark(kind, rid, None)
+                for obj in objs:
+                    self._mark(kind, obj.id, obj)
+            self.compact()
+        elif hasattr(self.backend, "store_cache"):
+            # التشغيل التالي يحمّل من اللقطة الثنائية بدل تحليل JSON
+            self.backend.store_cache(self)
 
     def save(self):
         """
-        حفظ الحالة الحالية إلى ملف JSON. نكتب users, cars, invoices كقوائم dict.
+        حفظ التغييرات عبر واجهة التخزين.
+        نمرر التغييرات المعلقة فقط؛ واجهة JSON العادية تتجاهلها وتكتب كل شيء.
+        داخل store.transaction() يؤجَّل الحفظ إلى نهاية المعاملة (حفظ واحد للدفعة).
+        """
+        if self._tx_depth:
+            self._save_requested = True
+            return
+        with self._locked():
+            # ما كتبته العمليات الأخرى يُدمج أولًا؛ تغييراتنا المعلقة تفوز على نفس السجل
+            self.refresh()
+            changes, self._changes = self._changes, {}
+            try:
+                self.backend.save(self, changes)
+            except BaseException:
+                # فشل الحفظ: نعيد التغييرات لتُحفظ في المحاولة القادمة
+                changes.update(self._changes)
+                self._changes = changes
+                raise
+            if self.ledger is not None:
+                # القيود حتى الآن محفوظة مع أرصدتها: يمكن تثبيتها في لقطة
+                self.ledger.maybe_checkpoint()
+
+    @contextmanager
+    def _locked(self):
+        """قفل واجهة التخزين بين العمليات (إن كانت تدعمه) طوال الكتلة."""
+        lock = getattr(self.backend, "lock", None)
+        if lock is None:
+            yield
+            return
+        lock()
+        try:
+            yield
+        finally:
+            self.backend.unlock()
+
+    def refresh(self) -> bool:
+        """
+        تحديث الذاكرة بما كتبته عمليات أخرى في نفس الملف (رخيص إن لم يتغير شيء).
+        التغييرات تُطبَّق سجلًا بسجل عبر طرق التعديل فتبقى الفهارس والمجاميع صحيحة
+        دون إعادة بنائها. نعيد True إن تغيّر شيء.
+        """
+        poll = getattr(self.backend, "poll", None)
+        if poll is None or self._tx_depth:
+            return False
+        with self._locked():
+            result = poll()
+        if self.archive is not None:
+            # عملية أخرى ربما أرشفت شهرًا: نقرأ manifest الجديد (فحص stat رخيص)
+            self.archive.reload()
+        if result is None:
+            return False
+        mode, data = result
+        self._apply_remote(data if mode == "delta" else self._diff_remote(data))
+        return True
+
+    def _diff_remote(self, raw: dict) -> list:
+        """مقارنة لقطة كاملة بالذاكرة: نعيد فقط السجلات المضافة/المعدلة/المحذوفة."""
+        ops = []
+        for kind, objs in (("users", self.users), ("cars", self.cars), ("invoices", self.invoices)):
+            local = {o.id: o for o in objs}
+            seen = set()
+            for rec in raw.get(kind, []):
+                rid = rec.get("id")
+                seen.add(rid)
+                obj = local.get(rid)
+                if obj is None or obj.to_dict() != rec:
+                    ops.append((kind, rid, rec))
+            ops.extend((kind, rid, None) for rid in local if rid not in seen)
+        return ops
+
+    def _apply_remote(self, ops: list):
+        """تطبيق تغييرات عملية أخرى دون اعتبارها تغييرات معلقة لنا."""
+        pending, self._changes = self._changes, {}
+        try:
+            for kind, rid, rec in ops:
+                if (kind, rid) not in pending:
+                    self._apply_record(kind, rid, rec)
+        finally:
+            self._changes = pending
+
+    def _apply_record(self, kind: str, rid: str, rec: Optional[dict]):
+        """إضافة/تعديل/حذف سجل واحد قادم من الملف (rec=None يعني حُذف)."""
+        if kind == "users":
+            cur = self._users_by_id.get(rid)
+            if rec is None:
+                if cur is not None:
+                    self.remove_user(cur)
+            elif cur is None:
+                self.add_user(User.from_dict(rec))
+            else:
+                fields = User.from_dict(rec).to_dict()
+                del fields["id"]
+                self.update_user(cur, **fields)
+        elif kind == "cars":
+            cur = self._cars_by_id.get(rid)
+            if rec is None:
+                if cur is not None:
+                    self.remove_car(cur)
+            elif cur is None:
+                self.add_car(Car.from_dict(rec))
+            else:
+                fields = Car.from_dict(rec).to_dict()
+                del fields["id"]
+                # السجل بلا حجز لا يحمل حقليه: نلغي الحجز المحلي صراحة
+                fields.setdefault("reserved_by", None)
+                fields.setdefault("reserved_until", None)
+                self.update_car(cur, **fields)
+        elif kind == "invoices":
+            # الفواتير لا تتعدل: إضافة جديدة أو حذف فقط
+            if rec is not None:
+                history = self._invoices_by_customer.get(rec.get("customer"), ())
+                if not any(i.id == rid for i in history):
+                    self.add_invoice(Invoice.from_dict(rec))
+            else:
+                cur = next((i for i in reversed(self.invoices) if i.id == rid), None)
+                if cur is not None:
+                    self._remove_invoice(cur)
+
+    @contextmanager
+    def transaction(self):
+        """
+        وحدة عمل (unit of work):
+            with store.transaction():
+                sales.buy_car(...)
+                sales.buy_car(...)
+        - المعاملة الخارجية تقفل الملف وتحدّث الذاكرة من الملف قبل أي فحص أو تعديل،
+          فيبقى الفحص (مثل: هل السيارة متاحة؟) صحيحًا حتى الحفظ.
+        - كل استدعاءات save() داخلها تؤجَّل إلى حفظ واحد عند الخروج.
+        - إن خرج استثناء (أو فشل الحفظ) نتراجع عن كل التغييرات في الذاكرة.
+        - المعاملات المتداخلة تعمل كنقاط حفظ (savepoints) داخل المعاملة الخارجية.
+        """
+        if self._tx_depth:
+            with self._unit_of_work():
+                yield self
+            return
+        with self._locked():
+            self.refresh()
+            with self._unit_of_work():
+                yield self
+
+    @contextmanager
+    def _unit_of_work(self):
+        """التراجع ونقاط الحفظ والحفظ المؤجل (انظر transaction)."""
+        outer = self._tx_depth == 0
+        if outer:
+            self._undo = []
+            self._save_requested = False
+            changes_before = dict(self._changes)
+        mark = len(self._undo)
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            self._rollback(mark)
+            if outer:
+                self._changes = changes_before
+                self._undo = []
+                self._discard_points()
+            raise
+        self._tx_depth -= 1
+        if not outer:
+            return
+        # نهاية المعاملة الخارجية: حفظ واحد لكل التغييرات
+        try:
+            if self._changes or self._save_requested:
+                self.save()
+        except BaseException:
+            self._rollback(0)
+            self._changes = changes_before
+            self._discard_points()
+            raise
+        finally:
+            self._undo = []
+            self._save_requested = False
+        self._flush_points()
+
+    def _flush_points(self):
+        """كتابة قيود النقاط المؤجلة بعد نجاح الحفظ (والملف ما زال مقفلًا بالمعاملة)."""
+        pending, opening = self._pending_points, self._ledger_opening
+        self._discard_points()
+        if self.ledger is None or not pending:
+            return
+        if opening is not None:
+            self.ledger.start(opening, pending[0]["date"])
+        for entry in pending:
+            self.ledger.append(entry)
+
+    def _discard_points(self):
+        self._pending_points = []
+        self._ledger_opening = None
+
+    def _log_undo(self, fn, *args):
+        """تسجيل عملية عكسية تُنفَّذ عند التراجع (داخل معاملة فقط)."""
+        if self._tx_depth and not self._rolling_back:
+            self._undo.append((fn, args))
+
+    def _rollback(self, mark: int):
+        """تنفيذ عمليات التراجع بالعكس حتى نقطة الحفظ mark."""
+        self._rolling_back = True
+        try:
+            while len(self._undo) > mark:
+                fn, args = self._undo.pop()
+                fn(*args)
+        finally:
+            self._rolling_back = False
+
+    def snapshot(self) -> dict:
+        """تمثيل الحالة الحالية كاملة كـ dict قابل للحفظ."""
+        return {
+            "schema_version": self.schema_version,
+            "users": [u.to_dict() for u in self.users],
+            "cars": [c.to_dict() for c in self.cars],
+            "invoices": [i.to_dict() for i in self.invoices]
+        }
+
+    def compact(self, background: bool = False):
+        """دمج السجل في لقطة جديدة (لواجهات التخزين التي تدعم ذلك)."""
+        with self._locked():
+            self.save()
+            if hasattr(self.backend, "compact"):
+                self.backend.compact(self, background)
+
+    def wait_for_compaction(self):
+        """انتظار انتهاء الدمج الجاري في الخلفية (إن وُجد)."""
+        if hasattr(self.backend, "wait_for_compaction"):
+            self.backend.wait_for_compaction()
+
+    def close(self):
+        """إغلاق واجهة التخزين (إغلاق الاتصال أو انتظار الدمج) بعد تحديث اللقطة المخزنة مؤقتًا."""
+        if hasattr(self.backend, "store_cache"):
+            self.backend.store_cache(self)
+        self.backend.close()
+
+    def _mark(self, kind: str, record_id: str, obj):
+        """تسجيل أن السجل (kind, id) تغيّر؛ obj=None يعني أنه حُذف."""
+        self._changes[(kind, record_id)] = obj
+
+    # -------------------------
+    # الفهارس: بناء وتحديث
+    # -------------------------
+    def _rebuild_indexes(self):
+        """
+        إعادة بناء كل الفهارس من القوائم.
+        نستخدم setdefault ليبقى أول سجل مكرر هو المُرجَع (مثل سلوك next() السابق).
+        """
+        self._users_by_name = {}
+        self._users_by_id = {}
+        self._cars_by_id = {}
+        self._invoices_by_customer = {}
+        self._invoice_by_car = {}
+        self._invoices_sorted = False
+        for inv in self.invoices:
+            self._invoices_by_customer.setdefault(inv.customer, []).append(inv)
+            self._invoice_by_car[inv.car_id] = inv
+        for u in self.users:
+            self._users_by_name.setdefault(u.username, u)
+            self._users_by_id.setdefault(u.id, u)
+        for c in self.cars:
+            self._cars_by_id.setdefault(c.id, c)
+        # فهارس البحث/الاستعلام وطابور الحجوزات يُعاد بناؤها كسولًا عند أول استخدام
+        for ix in self.car_indexes:
+            ix.reset()
+        self.reservations.reset()
+        # مجاميع التقارير تُبنى مرة واحدة هنا ثم تُحدّث تدريجيًا
+        self.aggregates.rebuild(self)
+
+    @staticmethod
+    def _unindex(index: dict, key, obj, items: list, attr: str):
+        """
+        حذف obj من الفهرس تحت المفتاح key.
+        إن وُجد سجل آخر بنفس المفتاح (بيانات مكررة قديمة) نجعله هو المُرجَع.
+        """
+        if index.get(key) is not obj:
+            return
+        del index[key]
+        # حالة نادرة: مفاتيح مكررة في الملف، نبحث عن البديل الأول
+        replacement = next((x for x in items if x is not obj and getattr(x, attr) == key), None)
+        if replacement is not None:
+            index[key] = replacement
+
+    # -------------------------
+    # عمليات التعديل: كل إضافة/حذف/تعديل تمر من هنا لتبقى الفهارس صحيحة
+    # -------------------------
+    @staticmethod
+    def _pop_obj(items: list, obj):
+        """حذف obj من القائمة؛ سريع إن كان آخر عنصر (الحالة المعتادة عند التراجع)."""
+        if items and items[-1] is obj:
+            items.pop()
+        else:
+            items.remove(obj)
+
+    @staticmethod
+    def _rekey(obj, taken=None):
+        """معرف جديد لسجل اصطدم معرفه بسجل آخر من نفس النوع (بنفس البادئة)."""
+        prefix = obj.id.rpartition("-")[0] if type(obj.id) is str and "-" in obj.id else "id"
+        obj.id = IDGenerator.new(prefix, taken)
+
+    def add_user(self, user: User, _pos: Optional[int] = None):
+        """إضافة مستخدم إلى القائمة والفهارس (معرف مكرر لمستخدم آخر يُستبدل بمعرف جديد)."""
+        if self._users_by_id.get(user.id, user) is not user:
+            self._rekey(user, self._users_by_id.__contains__)
+        if _pos is None:
+            self.users.append(user)
+        else:
+            # إعادة الإدراج في الموضع الأصلي (تراجع عن حذف)
+            self.users.insert(_pos, user)
+        self._users_by_name.setdefault(user.username, user)
+        self._users_by_id.setdefault(user.id, user)
+        self.aggregates.add_user(user)
+        self._mark("users", user.id, user)
+        self._log_undo(self.remove_user, user)
+
+    def remove_user(self, user: User):
+        """حذف مستخدم من القائمة والفهارس."""
+        if self._tx_depth and not self._rolling_back:
+            pos = self.users.index(user)
+            del self.users[pos]
+            self._log_undo(self.add_user, user, pos)
+        else:
+            self._pop_obj(self.users, user)
+        self._unindex(self._users_by_name, user.username, user, self.users, "username")
+        self._unindex(self._users_by_id, user.id, user, self.users, "id")
+        self.aggregates.remove_user(user)
+        self._mark("users", user.id, None)
+
+    def update_user(self, user: User, **fields):
+        """
+        تعديل حقول مستخدم (مثل username أو is_active) مع تحديث الفهارس
+        إن تغيّر اسم المستخدم أو المعرف. الحقول غير الموجودة تُتجاهل.
+        """
+        old_name, old_id = user.username, user.id
+        old_values = {}
+        for k, v in fields.items():
+            if hasattr(user, k):
+                old_values[k] = getattr(user, k)
+                setattr(user, k, v)
+        self._log_undo(lambda: self.update_user(user, **old_values))
+        if "loyalty_points" in old_values:
+            self.aggregates.points_changed(user)
+        if user.username != old_name:
+            self._unindex(self._users_by_name, old_name, user, self.users, "username")
+            self._users_by_name.setdefault(user.username, user)
+        if user.id != old_id:
+            self._unindex(self._users_by_id, old_id, user, self.users, "id")
+            self._users_by_id.setdefault(user.id, user)
+            self._mark("users", old_id, None)
+        self._mark("users", user.id, user)
+
+    def add_car(self, car: Car, _pos: Optional[int] = None):
+        """إضافة سيارة إلى القائمة والفهرس (معرف مكرر لسيارة أخرى يُستبدل بمعرف جديد)."""
+        if self._cars_by_id.get(car.id, car) is not car:
+            self._rekey(car, self._cars_by_id.__contains__)
+        if _pos is None:
+            self.cars.append(car)
+        else:
+            self.cars.insert(_pos, car)
+        self._cars_by_id.setdefault(car.id, car)
+        for ix in self.car_indexes:
+            ix.add(car)
+        self.aggregates.add_car(car)
+        self.reservations.push(car)
+        self._mark("cars", car.id, car)
+        self._log_undo(self.remove_car, car)
+
+    # عدد السيارات في الدفعة الذي يصبح بعده إعادة بناء الفهارس أرخص من الإدراج واحدة واحدة
+    BULK_REINDEX = 1000
+
+    def add_cars(self, cars: List[Car]):
+        """
+        إضافة دفعة سيارات. مع دفعة كبيرة نفرّغ فهارس البحث/الاستعلام فتُبنى مرة واحدة
+        عند أول استخدام، بدل الإدراج المرتب لكل سيارة (O(n) لكل إدراج).
+        """
+        if len(cars) >= self.BULK_REINDEX:
+            for ix in self.car_indexes:
+                ix.reset()
+        for car in cars:
+            self.add_car(car)
+
+    def remove_car(self, car: Car):
+        """حذف سيارة من القائمة والفهرس."""
+        if self._tx_depth and not self._rolling_back:
+            pos = self.cars.index(car)
+            del self.cars[pos]
+            self._log_undo(self.add_car, car, pos)
+        else:
+            self._pop_obj(self.cars, car)
+        self._unindex(self._cars_by_id, car.id, car, self.cars, "id")
+        for ix in self.car_indexes:
+            ix.remove(car)
+        self.aggregates.remove_car(car)
+        self._mark("cars", car.id, None)
+
+    def update_car(self, car: Car, **fields):
+        """تعديل حقول سيارة مع تحديث الفهرس إن تغيّر المعرف."""
+        old_id = car.id
+        # نعيد فهرسة السيارة فقط في الفهارس التي تعتمد على الحقول المتغيرة
+        touched = [ix for ix in self.car_indexes if any(k in ix.FIELDS for k in fields)]
+        for ix in touched:
+            ix.remove(car)
+        old_values = {}
+        for k, v in fields.items():
+            if hasattr(car, k):
+                old_values[k] = getattr(car, k)
+                setattr(car, k, v)
+        for ix in touched:
+            ix.add(car)
+        if "status" in old_values:
+            self.aggregates.remove_car(car, old_values["status"])
+            self.aggregates.add_car(car)
+        if "reserved_until" in old_values:
+            self.reservations.push(car)
+        self._log_undo(lambda: self.update_car(car, **old_values))
+        if car.id != old_id:
+            self._unindex(self._cars_by_id, old_id, car, self.cars, "id")
+            self._cars_by_id.setdefault(car.id, car)
+            self._mark("cars", old_id, None)
+        self._mark("cars", car.id, car)
+
+    def add_invoice(self, inv: Invoice):
+        """
+        إضافة فاتورة إلى القائمة مع إبقائها مرتبة بالمعرف: الفاتورة الجديدة تأتي في النهاية عادة،
+        وفاتورة عملية أخرى أقدم بقليل (refresh) تُدرج قبل الفواتير الأحدث منها.
+        معرف مساوٍ لجارة في نفس الموضع (تصادم) يُستبدل بمعرف جديد.
         """
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump({
-                "users": [u.to_dict() for u in self.users],
-                "cars": [c.to_dict() for c in self.cars],
-                "invoices": [i.to_dict() for i in self.invoices]
-            }, f, indent=2, ensure_ascii=False)
+        while True:
+            key = IDGenerator.sort_key(inv.id)
+            pos = len(self.invoices)
+            while pos and IDGenerator.sort_key(self.invoices[pos - 1].id) > key:
+                pos -= 1
+            if not (key and pos and self.invoices[pos - 1].id == inv.id):
+                break
+            self._rekey(inv, None)
+        self.invoices.insert(pos, inv)
+        self._invoices_by_customer.setdefault(inv.customer, []).append(inv)
+        self._invoice_by_car[inv.car_id] = inv
+        self.aggregates.add_invoice(inv)
+        self._mark("invoices", inv.id, inv)
+        self._log_undo(self._remove_invoice, inv)
+
+    def _remove_invoice(self, inv: Invoice):
+        """حذف فاتورة (يُستخدم عند التراجع عن معاملة فقط؛ الفواتير لا تُحذف عادة)."""
+        self._pop_obj(self.invoices, inv)
+        history = self._invoices_by_customer.get(inv.customer)
+        if history is not None:
+            self._pop_obj(history, inv)
+            if not history:
+                del self._invoices_by_customer[inv.customer]
+        if self._invoice_by_car.get(inv.car_id) is inv:
+            # نعيد الفاتورة السابقة للسيارة إن وُجدت (حالة نادرة: سيارة بيعت أكثر من مرة)
+            previous = next((i for i in reversed(self.invoices) if i.car_id == inv.car_id), None)
+            if previous is None:
+                del self._invoice_by_car[inv.car_id]
+            else:
+                self._invoice_by_car[inv.car_id] = previous
+        self.aggregates.remove_invoice(inv)
+        self._mark("invoices", inv.id, None)
 
     # -------------------------
-    # طرق بحث مساعدة داخل DataStore
+    # طرق بحث مساعدة داخل DataStore (O(1) عبر الفهارس)
     # -------------------------
     def find_user_by_username(self, username: str) -> Optional[User]:
         """البحث عن مستخدم حسب الاسم (username)."""
-        return next((u for u in self.users if u.username == username), None)
+        return self._users_by_name.get(username)
 
     def find_user_by_id(self, user_id: str) -> Optional[User]:
         """البحث عن مستخدم حسب المعرف (id)."""
-        return next((u for u in self.users if u.id == user_id), None)
+        return self._users_by_id.get(user_id)
 
     def find_car_by_id(self, car_id: str) -> Optional[Car]:
         """البحث عن سيارة حسب المعرف (id)."""
-        return next((c for c in self.cars if c.id == car_id), None)
+        return self._cars_by_id.get(car_id)
+
+    def invoices_for_customer(self, username: str, limit: int = 20,
+                              cursor: Optional[str] = None) -> dict:
+        """
+        فواتير عميل واحد بترتيب الإنشاء، مقسمة صفحات: O(limit) مهما كبر عدد الفواتير الكلي.
+        cursor هو موضع البداية (يُعاد next_cursor للصفحة التالية أو None في النهاية).
+        مع الأرشيف: الأشهر المؤرشفة أولًا ثم القسم النشط؛ أعداد manifest تتخطى الأشهر
+        السابقة للصفحة فلا يُفتح إلا القسم الذي تقع فيه الصفحة.
+        """
+        history = self._invoices_by_customer.get(username, [])
+        start = int(cursor) if cursor else 0
+        page: List[Invoice] = []
+        archived = 0
+        if self.archive is not None:
+            for month, count in self.archive.customer_counts(username):
+                if archived + count > start and len(page) < limit:
+                    items = self.archive.customer_invoices(month, username)
+                    lo = max(0, start - archived)
+                    page.extend(items[lo:lo + limit - len(page)])
+                archived += count
+        if len(page) < limit:
+            lo = max(0, start - archived)
+            page.extend(history[lo:lo + limit - len(page)])
+        end = start + len(page)
+        total = archived + len(history)
+        return {"items": page, "next_cursor": str(end) if end < total else None}
+
+    def invoice_for_car(self, car_id: str) -> Optional[Invoice]:
+        """الفاتورة التي بيعت بها السيارة (آخر فاتورة إن تكررت)، أو None."""
+        inv = self._invoice_by_car.get(car_id)
+        if inv is None and self.archive is not None:
+            # نفتح الأرشيف فقط لسيارة مباعة فاتورتها ليست في القسم النشط
+            car = self._cars_by_id.get(car_id)
+            if car is not None and car.status == "sold":
+                inv = self.archive.find_car(car_id)
+        return inv
+
+    def invoices_between(self, start=None, end=None) -> List[Invoice]:
+        """
+        الفواتير المنشأة في [start, end) ("YYYY-MM-DD" أو "YYYY-MM-DD HH:MM:SS" أو datetime محلي).
+        القسم النشط مرتب بالمعرف، والمعرف يحمل وقت إنشائه: بحث ثنائي على المعرفات بدل قراءة
+        تاريخ كل فاتورة. الفواتير ذات المعرفات القديمة (في أول القائمة) والأشهر المؤرشفة
+        المتقاطعة مع المدى فقط تُفحص بتاريخها.
+        """
+        lo, hi = self._range_bound(start), self._range_bound(end)
+        lo_ts = None if lo is None else CompactUtil.iso_to_ts(lo.isoformat(sep=" ", timespec="seconds"))
+        hi_ts = None if hi is None else CompactUtil.iso_to_ts(hi.isoformat(sep=" ", timespec="seconds"))
+
+        def in_range(inv) -> bool:
+            ts = inv.ts
+            return (type(ts) is int and (lo_ts is None or ts >= lo_ts)
+                    and (hi_ts is None or ts < hi_ts))
+
+        result: List[Invoice] = []
+        if self.archive is not None:
+            for month in self.archive.months():
+                if ((lo is not None and month < f"{lo.year:04d}-{lo.month:02d}")
+                        or (hi is not None and month > f"{hi.year:04d}-{hi.month:02d}")):
+                    continue
+                result.extend(inv for inv in self.archive.partition(month).invoices if in_range(inv))
+        self._sort_invoices()
+        first_new = self._invoice_position("0")
+        result.extend(inv for inv in self.invoices[:first_new] if in_range(inv))
+        begin = first_new if lo is None else max(
+            first_new, self._invoice_position(IDGenerator.key_at(int(lo.timestamp() * 1000))))
+        stop = (len(self.invoices) if hi is None
+                else self._invoice_position(IDGenerator.key_at(int(hi.timestamp() * 1000))))
+        result.extend(self.invoices[begin:stop])
+        return result
+
+    @staticmethod
+    def _range_bound(value) -> Optional[datetime]:
+        if value is None or isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(value)
+
+    def _sort_invoices(self):
+        """ترتيب القسم النشط بالمعرف مرة واحدة بعد التحميل (الإضافات بعدها تحافظ على الترتيب)."""
+        if self._invoices_sorted:
+            return
+        keys = [IDGenerator.sort_key(inv.id) for inv in self.invoices]
+        if any(a > b for a, b in zip(keys, keys[1:])):
+            # ملف كتبته نسخة أقدم أو مزامنة أضافت معرفات قديمة بعد الجديدة: ترتيب مستقر
+            self.invoices.sort(key=lambda inv: IDGenerator.sort_key(inv.id))
+        self._invoices_sorted = True
+
+    def _invoice_position(self, key: str) -> int:
+        """أول موضع في self.invoices (المرتبة) مفتاح معرفه >= key (بحث ثنائي)."""
+        lo, hi = 0, len(self.invoices)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if IDGenerator.sort_key(self.invoices[mid].id) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def all_invoices(self) -> Iterator[Invoice]:
+        """كل الفواتير بترتيب الإنشاء: الأقسام المؤرشفة (تُفتح واحدًا تلو الآخر) ثم القسم النشط."""
+        if self.archive is not None:
+            yield from self.archive.iter_invoices()
+        yield from self.invoices
+
+    def post_points(self, user: User, kind: str, points: int, ref: str = "",
+                    note: str = "") -> dict:
+        """
+        تغيير نقاط مستخدم بقيد (earn / redeem / expire / adjust) وتحديث رصيده المادي معًا.
+        points بإشارته: موجب للاكتساب، سالب للاستبدال والانتهاء، وأي إشارة للتعديل.
+        ValueError لنوع غير معروف أو إشارة خاطئة أو رصيد يصبح سالبًا.
+        القيد يُكتب في السجل بعد نجاح حفظ المعاملة فقط (_flush_points): انقطاع قبل الحفظ
+        لا يترك قيدًا لبيع لم يُحفظ، والتراجع عن المعاملة يُسقط القيد مع الرصيد.
+        """
+        from points_ledger import KINDS
+        points = int(points)
+        sign = KINDS.get(kind)
+        if sign is None or points * sign < 0:
+            raise ValueError(f"قيد نقاط غير صالح: {kind} {points}")
+        with self.transaction():
+            # بعد refresh (بداية المعاملة): الرصيد هو آخر رصيد محفوظ
+            if user.loyalty_points + points < 0:
+                raise ValueError("رصيد النقاط غير كافٍ.")
+            date = datetime.now().isoformat(sep=' ', timespec='seconds')
+            entry = {"id": IDGenerator.new("pts"), "kind": kind, "user": user.id,
+                     "name": user.username, "points": points, "ref": ref, "note": note,
+                     "date": date}
+            if self.ledger is not None:
+                # أول قيد: لقطة افتتاحية بالأرصدة الموجودة قبل السجل (تُكتب مع القيود)
+                if self._ledger_opening is None and not self.ledger.started():
+                    self._ledger_opening = {u.id: u.loyalty_points for u in self.users
+                                            if u.loyalty_points}
+                self._pending_points.append(entry)
+                self._log_undo(self._pending_points.pop)
+            self.update_user(user, loyalty_points=user.loyalty_points + points)
+            self.save()
+        return entry
+
+    # -------------------------
+    # أرشفة الأشهر المغلقة
+    # -------------------------
+    def archive_closed_months(self, now: Optional[datetime] = None) -> int:
+        """
+        نقل فواتير الأشهر السابقة للشهر الحالي من القسم النشط إلى الأرشيف.
+        الأرشيف يُكتب أولًا ثم تُحذف الفواتير من الملف الرئيسي: انقطاع بينهما يترك الفاتورة
+        في الموضعين، والأرشفة التالية تدمجها بالمعرف دون تكرار. نعيد عدد الفواتير المنقولة.
+        """
+        if self.archive is None or self._tx_depth:
+            return 0
+        from invoice_archive import month_start_ts
+        cutoff = month_start_ts(now)
+        with self._locked():
+            self.refresh()
+            old = [inv for inv in self.invoices if type(inv.ts) is int and inv.ts < cutoff]
+            if not old:
+                return 0
+            self.archive.append(old)
+            moved = {id(inv) for inv in old}
+            self.invoices = [inv for inv in self.invoices if id(inv) not in moved]
+            for inv in old:
+                self._mark("invoices", inv.id, None)
+            # حذف جماعي: إعادة بناء الفهارس مرة واحدة بدل حذف كل فاتورة من القوائم
+            self._rebuild_indexes()
+            self.save()
+        return len(old)
 
 # ---------------------------------------------------------------------
 # فئة LoyaltySystem: نظام حساب نقاط الولاء
@@ -337,12 +2389,90 @@ class LoyaltySystem:
     """
     نظام نقاط الولاء: تحسب النقاط بناءً على السعر.
     القاعدة الحالية: نقطة واحدة لكل 1000 وحدة عملة.
+    عند الاستبدال: كل نقطة تساوي POINT_VALUE وحدة عملة خصمًا من سعر الشراء.
     """
+    POINT_VALUE = 10.0
+
     @staticmethod
     def points_for_price(price: float) -> int:
         # floor division للحصول على عدد النقاط الكاملة
         return int(price // 1000)
 
+    @staticmethod
+    def discount_for_points(points: int) -> float:
+        return points * LoyaltySystem.POINT_VALUE
+
+# ---------------------------------------------------------------------
+# فئة LoyaltyService: رصيد النقاط وسجل قيودها
+# ---------------------------------------------------------------------
+class LoyaltyService:
+    """
+    عمليات النقاط فوق DataStore.post_points وسجل القيود (store.ledger):
+    - balance: الرصيد المادي O(1) من المستخدم نفسه
+    - history: قيود المستخدم من السجل (للتدقيق)
+    - adjust: تعديل يدوي بقيد adjust (موجب أو سالب)
+    - expire_inactive: انتهاء رصيد من لم يكن له نشاط نقاط منذ days يومًا (قيد expire)
+    - rebuild_balances: إعادة حساب الأرصدة من آخر لقطة + القيود بعدها فقط
+    الاستبدال كخصم عند الشراء يتم في SalesService.buy_car(redeem_points=...).
+    """
+    def __init__(self, store: DataStore):
+        self.store = store
+
+    def balance(self, username: str) -> Optional[int]:
+        user = self.store.find_user_by_username(username)
+        return user.loyalty_points if user else None
+
+    def history(self, username: str, limit: Optional[int] = None) -> List[dict]:
+        user = self.store.find_user_by_username(username)
+        if user is None or self.store.ledger is None:
+            return []
+        return self.store.ledger.history(user.id, limit)
+
+    def adjust(self, username: str, points: int, note: str = "") -> Optional[dict]:
+        user = self.store.find_user_by_username(username)
+        if not user:
+            print("المستخدم غير موجود.")
+            return None
+        try:
+            return self.store.post_points(user, "adjust", points, note=note)
+        except ValueError as e:
+            print(e)
+            return None
+
+    def expire_inactive(self, days: int) -> int:
+        """قيد expire لكامل رصيد كل مستخدم آخر نشاط نقاط له (أو افتتاح السجل) أقدم من days يومًا."""
+        if self.store.ledger is None:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat(sep=' ', timespec='seconds')
+        expired = 0
+        with self.store.transaction():
+            state = self.store.ledger.state()
+            for user in self.store.users:
+                last = state["last_activity"].get(user.id) or state.get("opened", "")
+                if user.loyalty_points > 0 and last and last < cutoff:
+                    self.store.post_points(user, "expire", -user.loyalty_points,
+                                           note=f"لا نشاط منذ {days} يومًا")
+                    expired += 1
+        return expired
+
+    def rebuild_balances(self, apply: bool = True) -> List[tuple]:
+        """
+        الأرصدة حسب السجل (لقطة + القيود بعدها)؛ نعيد [(username, الرصيد الحالي, رصيد السجل)]
+        للمختلفين، ومع apply=True نصحح الأرصدة المادية لتطابق السجل.
+        """
+        if self.store.ledger is None or not self.store.ledger.started():
+            return []
+        with self.store.transaction():
+            balances = self.store.ledger.state()["balances"]
+            diffs = [(u.username, u.loyalty_points, balances.get(u.id, 0)) for u in self.store.users
+                     if u.loyalty_points != balances.get(u.id, 0)]
+            if apply:
+                for username, _current, expected in diffs:
+                    user = self.store.find_user_by_username(username)
+                    self.store.update_user(user, loyalty_points=expected)
+                self.store.save()
+        return diffs
+
 # ---------------------------------------------------------------------
 # فئة AuthService: تسجيل المستخدمين وتسجيل الدخول
 # ---------------------------------------------------------------------
@@ -368,10 +2498,6 @@ class AuthService:
         if not Validator.username_ok(username):
             print("اسم المستخدم غير صالح (يجب أن يبدأ بحرف ويحتوي أحرف وأرقام فقط وطول >=3).")
             return None
-        # عدم تكرار اسم المستخدم
-        if self.store.find_user_by_username(username):
-            print("اسم المستخدم موجود بالفعل.")
-            return None
         # تحقق قوة كلمة المرور
         if not Validator.password_ok(password):
             print(f"كلمة المرور ضعيفة. يجب أن تكون طولها >= {PASSWORD_MIN_LEN} وتحتوي حرفًا، رقمًا ورمزًا.")
@@ -389,9 +2515,15 @@ class AuthService:
         else:
             user = Customer(username, password, phone, gender)
 
-        # إضافة المستخدم إلى DataStore وحفظ الملف
-        self.store.users.append(user)
-        self.store.save()
+        # داخل معاملة: فحص التكرار يرى ما سجلته العمليات الأخرى حتى لحظة الحفظ
+        with self.store.transaction():
+            # عدم تكرار اسم المستخدم
+            if self.store.find_user_by_username(username):
+                print("اسم المستخدم موجود بالفعل.")
+                return None
+            # إضافة المستخدم إلى DataStore (مع الفهارس) وحفظ الملف
+            self.store.add_user(user)
+            self.store.save()
         print(f"تم إنشاء حساب {username} بنجاح كـ {usertype}.")
         return user
 
@@ -428,7 +2560,11 @@ class CarService:
     - edit_car: تعديل حقل/حقول في سيارة موجودة
     - remove_car: حذف سيارة
     - search: بحث بسيط عن السيارة
+    - bulk_import: استيراد شحنة سيارات من CSV/JSONL
     """
+    # أعمدة ملف الاستيراد (id و color و specs و status اختيارية)
+    IMPORT_FIELDS = ("id", "name", "model_year", "price", "color", "specs", "status")
+    IMPORT_STATUSES = ("available", "reserved", "sold")
     def __init__(self, store: DataStore):
         self.store = store
 
@@ -437,8 +2573,9 @@ class CarService:
         إنشاء كائن Car جديد وإضافته إلى DataStore ثم الحفظ.
         """
         car = Car(name, model_year, price, color, specs)
-        self.store.cars.append(car)
-        self.store.save()
+        with self.store.transaction():
+            self.store.add_car(car)
+            self.store.save()
         print(f"تمت إضافة السيارة {car.id}")
         return car
 
@@ -448,16 +2585,15 @@ class CarService:
         - نقبل kwargs بحيث تكون أسماء الحقول: name, model_year, price, color, specs, status
         - نتحقق إن الحقل موجود في الكائن Car قبل التعديل
         """
-        car = self.store.find_car_by_id(car_id)
-        if not car:
-            print("السيارة غير موجودة.")
-            return False
-        # نحدث الحقول المسموح بها فقط
-        for k, v in kwargs.items():
-            if hasattr(car, k):
-                setattr(car, k, v)
-        # الحفظ بعد التعديل
-        self.store.save()
+        with self.store.transaction():
+            car = self.store.find_car_by_id(car_id)
+            if not car:
+                print("السيارة غير موجودة.")
+                return False
+            # نحدث الحقول المسموح بها فقط (عبر DataStore ليبقى الفهرس صحيحًا)
+            self.store.update_car(car, **kwargs)
+            # الحفظ بعد التعديل
+            self.store.save()
         print("تم تحديث بيانات السيارة.")
         return True
 
@@ -465,23 +2601,136 @@ class CarService:
         """
         حذف السيارة من المخزون (إن وُجدت).
         """
-        car = self.store.find_car_by_id(car_id)
-        if not car:
-            print("السيارة غير موجودة.")
-            return False
-        self.store.cars.remove(car)
-        self.store.save()
+        with self.store.transaction():
+            car = self.store.find_car_by_id(car_id)
+            if not car:
+                print("السيارة غير موجودة.")
+                return False
+            self.store.remove_car(car)
+            self.store.save()
         print("تم حذف السيارة.")
         return True
 
-    def search(self, term: str) -> List[Car]:
+    def bulk_import(self, source, fmt: Optional[str] = None,
+                    chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
         """
-        بحث بسيط: نبحث بالاسم أو اللون أو المعرف.
-        - نعيد قائمة من السيارات التي تطابق المصطلح.
+        استيراد سيارات من ملف (مسار) أو stream نصي بصيغة CSV (بسطر عناوين) أو JSONL (كائن لكل سطر).
+        - الصفوف تُقرأ بالتدفق (streaming) دون تحميل الملف كاملًا.
+        - كل صف يُتحقق منه (الاسم، Validator.model_year_ok، Validator.positive_number للسعر)،
+          والصف الخاطئ يُسجل في errors ولا يوقف الاستيراد.
+        - الصف بمعرف موجود مسبقًا (أو مكرر في نفس الملف) يُتجاهل ويُعد في duplicates.
+        - الحفظ مرة واحدة في النهاية، أو كل chunk_size سيارة (كل دفعة معاملة مستقلة).
+        نعيد {"imported", "duplicates", "errors": [(رقم السطر, السبب), ...]}.
         """
-        term = term.lower()
-        res = [c for c in self.store.cars if term in c.name.lower() or term in c.color.lower() or term == c.id.lower()]
-        return res
+        if isinstance(source, str):
+            if fmt is None:
+                fmt = "csv" if source.lower().endswith(".csv") else "jsonl"
+            with open(source, "r", encoding="utf-8-sig", newline="") as f:
+                return self.bulk_import(f, fmt, chunk_size)
+        if fmt is None:
+            # stream بدون اسم: JSONL إن بدأ بـ "{"
+            first = source.readline()
+            fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+            source = _chain_lines(first, source)
+        result = {"imported": 0, "duplicates": 0, "errors": []}
+        batch: List[Car] = []
+        seen = set()
+        for line_no, row in self._import_rows(source, fmt, result["errors"]):
+            car, error = self._car_from_row(row)
+            if error:
+                result["errors"].append((line_no, error))
+                continue
+            if car.id in seen or self.store.find_car_by_id(car.id):
+                result["duplicates"] += 1
+                continue
+            seen.add(car.id)
+            batch.append(car)
+            if chunk_size and len(batch) >= chunk_size:
+                self._commit_import(batch)
+                result["imported"] += len(batch)
+                batch = []
+        if batch:
+            self._commit_import(batch)
+            result["imported"] += len(batch)
+        print(f"تم استيراد {result['imported']} سيارة | مكررة: {result['duplicates']} "
+              f"| أخطاء: {len(result['errors'])}")
+        return result
+
+    @staticmethod
+    def _import_rows(stream, fmt: str, errors: list):
+        """(رقم السطر, dict) لكل صف؛ سطور JSONL غير الصالحة تُسجل كأخطاء."""
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                errors.append((line_no, "JSON غير صالح"))
+                continue
+            if not isinstance(row, dict):
+                errors.append((line_no, "السطر ليس كائن JSON"))
+                continue
+            yield line_no, row
+
+    def _car_from_row(self, row: dict):
+        """(Car, None) للصف الصحيح أو (None, سبب الخطأ)."""
+        name = str(row.get("name") or "").strip()
+        if not name:
+            return None, "الاسم مطلوب"
+        if not Validator.model_year_ok(row.get("model_year")):
+            return None, f"سنة موديل غير صالحة: {row.get('model_year')!r}"
+        if not Validator.positive_number(row.get("price")):
+            return None, f"سعر غير صالح: {row.get('price')!r}"
+        status = str(row.get("status") or "available").strip()
+        if status not in self.IMPORT_STATUSES:
+            return None, f"حالة غير معروفة: {status!r}"
+        car = Car(name, int(row["model_year"]), float(row["price"]),
+                  str(row.get("color") or "").strip(), str(row.get("specs") or "").strip())
+        if row.get("id"):
+            car.id = str(row["id"]).strip()
+        if status != "available":
+            car.status = status
+        return car, None
+
+    def _commit_import(self, batch: List[Car]):
+        """حفظ دفعة واحدة داخل معاملة (إما تُضاف كلها أو لا شيء)."""
+        with self.store.transaction():
+            self.store.add_cars(batch)
+            self.store.save()
+
+    def search(self, term: str, in_specs: bool = False) -> List[Car]:
+        """
+        بحث بالاسم أو اللون (يحتوي المصطلح) أو المعرف (يساويه)، وبالمواصفات إن طُلب in_specs.
+        - يستخدم فهرس الثلاثيات في DataStore فلا يمر على كل المخزون.
+        - نعيد قائمة السيارات المطابقة مرتبة حسب قوة المطابقة.
+        """
+        return self.store.car_index.search(term, self.store.cars, in_specs)
+
+    def query(self, status: Optional[str] = None, price_min: Optional[float] = None,
+              price_max: Optional[float] = None, year_min: Optional[int] = None,
+              year_max: Optional[int] = None, color: Optional[str] = None,
+              sort: Optional[str] = "price", limit: int = 20, cursor: Optional[str] = None,
+              facets: bool = False) -> dict:
+        """
+        استعلام مركب مع ترتيب وتقسيم صفحات، مثال:
+            query(status="available", price_min=15000, price_max=25000, year_min=2019, sort="price")
+        - sort: "price" / "-price" / "year" / "-year" / None (ترتيب الإدخال).
+        - نعيد {"items": [...], "next_cursor": ...} و "facets" (أعداد الحالة/اللون) إن طُلبت.
+        """
+        return self.store.car_query.query(
+            self.store.cars, status=status, color=color, price_min=price_min,
+            price_max=price_max, year_min=year_min, year_max=year_max, sort=sort,
+            limit=limit, cursor=cursor, facets=facets)
+
+def _chain_lines(first: str, stream):
+    """إعادة السطر الأول المقروء للكشف عن الصيغة ثم بقية الـ stream."""
+    yield first
+    yield from stream
 
 # ---------------------------------------------------------------------
 # فئة SalesService: تنفيذ عملية البيع وإنشاء الفواتير وتحديث نقاط الولاء
@@ -494,38 +2743,140 @@ class SalesService:
     - إنشاء فاتورة وتخزينها
     - تحديث حالة السيارة إلى 'sold'
     - إضافة النقاط إلى حساب العميل
+    - حجز سيارة لعميل لمدة محددة (reserve_car / release)، والحجز يتحول إلى بيع في buy_car
     """
     def __init__(self, store: DataStore):
         self.store = store
 
-    def buy_car(self, customer_username: str, car_id: str) -> Optional[Invoice]:
+    def expire_reservations(self) -> int:
+        """
+        إعادة السيارات ذات الحجز المنتهي إلى "available" (معاملة واحدة لكل الدفعة).
+        بلا حجز منتهٍ الفحص O(1) (قمة الطابور)؛ نعيد عدد الحجوزات المنتهية.
+        """
+        now = CompactUtil.now_ts()
+        if not self.store.reservations.due(self.store, now):
+            return 0
+        with self.store.transaction():
+            expired = self.store.reservations.pop_expired(self.store, now)
+            for car in expired:
+                self.store.update_car(car, status="available", reserved_by=None, reserved_until=None)
+            if expired:
+                self.store.save()
+        return len(expired)
+
+    def reserve_car(self, customer_username: str, car_id: str,
+                    ttl: float = RESERVATION_TTL) -> Optional[Car]:
+        """
+        حجز سيارة متاحة للعميل لمدة ttl ثانية (العميل نفسه يستطيع تجديد حجزه).
+        الحجز يُحفظ في السيارة نفسها (status="reserved" + reserved_by/reserved_until)
+        فيبقى بعد إعادة التشغيل وتراه العمليات الأخرى.
+        """
+        if not Validator.positive_number(ttl):
+            print("مدة الحجز يجب أن تكون رقمًا موجبًا.")
+            return None
+        self.expire_reservations()
+        with self.store.transaction():
+            car = self.store.find_car_by_id(car_id)
+            if not car:
+                print("السيارة غير موجودة.")
+                return None
+            if not self.store.find_user_by_username(customer_username):
+                print("المستخدم غير موجود.")
+                return None
+            renew = car.status == "reserved" and car.reserved_by == customer_username
+            if car.status != "available" and not renew:
+                print("السيارة غير متاحة للحجز.")
+                return None
+            until = CompactUtil.ts_to_iso(CompactUtil.now_ts() + math.ceil(float(ttl)))
+            self.store.update_car(car, status="reserved", reserved_by=customer_username,
+                                  reserved_until=until)
+            self.store.save()
+        print(f"تم حجز السيارة {car.id} حتى {until}")
+        return car
+
+    def release(self, customer_username: Optional[str], car_id: str) -> bool:
+        """
+        إلغاء حجز سيارة وإعادتها متاحة. العميل يلغي حجزه فقط؛
+        customer_username=None للموظف/المدير (إلغاء أي حجز).
+        """
+        with self.store.transaction():
+            car = self.store.find_car_by_id(car_id)
+            if not car:
+                print("السيارة غير موجودة.")
+                return False
+            if car.status != "reserved":
+                print("السيارة غير محجوزة.")
+                return False
+            if customer_username is not None and car.reserved_by != customer_username:
+                print("الحجز ليس باسمك.")
+                return False
+            self.store.update_car(car, status="available", reserved_by=None, reserved_until=None)
+            self.store.save()
+        print(f"تم إلغاء حجز السيارة {car.id}")
+        return True
+
+    def buy_car(self, customer_username: str, car_id: str,
+                redeem_points: int = 0) -> Optional[Invoice]:
         """
         شراء سيارة:
-        - نبحث السيارة، نتأكد أنها متاحة
-        - نحسب النقاط وننشئ فاتورة
+        - نبحث السيارة، نتأكد أنها متاحة (أو محجوزة لنفس العميل: الحجز يتحول إلى بيع)
+        - redeem_points: نقاط يستبدلها العميل خصمًا من السعر (قيد redeem)؛ سعر الفاتورة هو المدفوع
+        - نحسب النقاط على المدفوع وننشئ فاتورة
         - نحدث بيانات المستخدم وحالة السيارة ونحفظ
+        كل شيء داخل معاملة واحدة: إما يُحفظ كله أو يُتراجع عنه كله، والمعاملة تقفل الملف
+        وتقرأ آخر حالة له، فلا تبيع عمليتان نفس السيارة.
         """
-        car = self.store.find_car_by_id(car_id)
-        if not car:
-            print("السيارة غير موجودة.")
-            return None
-        if car.status != "available":
-            print("السيارة غير متاحة للشراء.")
+        try:
+            redeem = int(redeem_points or 0)
+        except (TypeError, ValueError):
+            redeem = -1
+        if redeem < 0:
+            print("عدد نقاط الاستبدال غير صالح.")
             return None
-        # حساب النقاط
-        points = LoyaltySystem.points_for_price(car.price)
-        # إنشاء الفاتورة
-        inv = Invoice(customer_username, car.id, car.price, points)
-        # إضافة الفاتورة إلى المستودع
-        self.store.invoices.append(inv)
-        # تغيير حالة السيارة إلى مباعة
-        car.status = "sold"
-        # تحديث نقاط العميل في المستخدم المخزن
-        user = self.store.find_user_by_username(customer_username)
-        if user:
-            user.loyalty_points = user.loyalty_points + points
-        # حفظ التغييرات في الملف
-        self.store.save()
+        # حجز منتهٍ لعميل آخر لا يمنع الشراء
+        self.expire_reservations()
+        with self.store.transaction():
+            car = self.store.find_car_by_id(car_id)
+            if not car:
+                print("السيارة غير موجودة.")
+                return None
+            held = car.status == "reserved" and car.reserved_by == customer_username
+            if car.status != "available" and not held:
+                print("السيارة غير متاحة للشراء.")
+                return None
+            user = self.store.find_user_by_username(customer_username)
+            # خصم النقاط المستبدلة (لا يتجاوز رصيد العميل ولا سعر السيارة)
+            discount = 0.0
+            if redeem:
+                if not user or user.loyalty_points < redeem:
+                    print("رصيد النقاط غير كافٍ.")
+                    return None
+                discount = LoyaltySystem.discount_for_points(redeem)
+                if discount > car.price:
+                    print("النقاط المستبدلة تتجاوز سعر السيارة.")
+                    return None
+            price = car.price - discount
+            # حساب النقاط على المبلغ المدفوع
+            points = LoyaltySystem.points_for_price(price)
+            # إنشاء الفاتورة
+            inv = Invoice(customer_username, car.id, price, points)
+            # إضافة الفاتورة إلى المستودع
+            self.store.add_invoice(inv)
+            # تغيير حالة السيارة إلى مباعة (مع إزالة الحجز إن كانت محجوزة)
+            if held:
+                self.store.update_car(car, status="sold", reserved_by=None, reserved_until=None)
+            else:
+                self.store.update_car(car, status="sold")
+            # قيود النقاط (استبدال ثم اكتساب) تحدّث رصيد العميل المخزن
+            if user:
+                if redeem:
+                    self.store.post_points(user, "redeem", -redeem, ref=inv.id)
+                if points:
+                    self.store.post_points(user, "earn", points, ref=inv.id)
+            # حفظ التغييرات في الملف (يُنفَّذ مرة واحدة عند نهاية المعاملة)
+            self.store.save()
+        if redeem:
+            print(f"خصم النقاط: {redeem} نقطة = {discount}")
         print(f"تم بيع السيارة. فاتورة: {inv.id} | نقاط مكتسبة: {points}")
         return inv
 
@@ -538,27 +2889,52 @@ class ReportGenerator:
     - summary: ملخص النظام (عدد المستخدمين/السيارات/الفواتير/الإيراد الكلي)
     - top_customers_by_points: أعلى العملاء بنقاط الولاء
     - list_sold_cars: استعراض الفواتير (السيارات المباعة)
+    الأرقام تأتي من store.aggregates المحدّثة تدريجيًا (O(1) للملخص).
+    check=True يفعّل وضع الفحص: كل تقرير يقارن المجاميع بإعادة حساب كاملة.
     """
-    def __init__(self, store: DataStore):
+    def __init__(self, store: DataStore, check: bool = False):
         self.store = store
+        self.check = check
+
+    def check_consistency(self) -> List[str]:
+        """مقارنة المجاميع التدريجية بإعادة حساب كاملة؛ نعيد قائمة الاختلافات."""
+        problems = self.store.aggregates.verify(self.store)
+        if self.store.archive is not None:
+            problems += self.store.archive.verify()
+        if self.store.ledger is not None and self.store.ledger.started():
+            # الأرصدة المادية مقابل السجل (آخر لقطة + القيود بعدها فقط)
+            problems += self.store.ledger.verify(self.store.users)
+        return problems
+
+    def _maybe_check(self):
+        # في وضع الفحص نرفض إعادة أرقام غير متسقة
+        if self.check:
+            problems = self.check_consistency()
+            if problems:
+                raise RuntimeError("مجاميع التقارير غير متسقة: " + "; ".join(problems))
 
     def summary(self) -> dict:
-        """حساب الملخص البسيط للنظام"""
-        total_revenue = sum(inv.price for inv in self.store.invoices)  # مجموع أسعار الفواتير
+        """الملخص البسيط للنظام (O(1) من المجاميع المحدّثة)"""
+        self._maybe_check()
+        agg = self.store.aggregates
+        archive = self.store.archive
         return {
             "users_count": len(self.store.users),
             "cars_count": len(self.store.cars),
-            "invoices_count": len(self.store.invoices),
-            "total_revenue": total_revenue
+            # الأشهر المؤرشفة من manifest دون فتح أقسامها
+            "invoices_count": len(self.store.invoices) + (archive.count if archive else 0),
+            "total_revenue": agg.total_revenue + (archive.revenue if archive else 0.0),
+            "cars_by_status": dict(agg.cars_by_status)
         }
 
     def top_customers_by_points(self, top_n: int = 5) -> List[User]:
         """إرجاع أعلى العملاء من حيث نقاط الولاء"""
-        return sorted(self.store.users, key=lambda u: u.loyalty_points, reverse=True)[:top_n]
+        self._maybe_check()
+        return self.store.aggregates.top_users(top_n)
 
     def list_sold_cars(self) -> List[Invoice]:
-        """إرجاع جميع الفواتير (التي تمثل السيارات المباعة)"""
-        return [inv for inv in self.store.invoices]
+        """إرجاع جميع الفواتير (التي تمثل السيارات المباعة)، بما فيها المؤرشفة"""
+        return list(self.store.all_invoices())
 
 # ---------------------------------------------------------------------
 # فئة Menu: واجهة سطر الأوامر (CLI) للمستخدمين
@@ -601,6 +2977,9 @@ class Menu:
 
         # حلقة القوائم الرئيسية
         while True:
+            # ما كتبته نسخ البرنامج الأخرى منذ آخر عرض (فحص رخيص إن لم يتغير شيء)
+            self.store.refresh()
+            self.sales.expire_reservations()
             print("\n--- نظام بيع السيارات ---")
             print("1) تسجيل الدخول")
             print("2) إنشاء حساب جديد")
@@ -657,6 +3036,7 @@ class Menu:
         استعراض المستخدمين، تفعيل/تعطيل، حذف، حذف سيارة، عرض تقارير.
         """
         while True:
+            self.store.refresh()
             print("\n--- قائمة المدير (Admin) ---")
             print("1) إضافة مستخدم (Admin / SalesEmployee / Customer)")
             print("2) استعراض المستخدمين")
@@ -664,7 +3044,8 @@ class Menu:
             print("4) حذف مستخدم")
             print("5) حذف سيارة")
             print("6) تقارير الملخص")
-            print("7) خروج")
+            print("7) عرض فاتورة سيارة مباعة")
+            print("8) خروج")
             ch = input("> ").strip()
             if ch == "1":
                 # إضافة مستخدم جديد بأنواعه
@@ -680,20 +3061,24 @@ class Menu:
             elif ch == "3":
                 # تفعيل/تعطيل مستخدم حسب اسمه
                 uname = input("ادخل اسم المستخدم للتبديل: ").strip()
-                u = self.store.find_user_by_username(uname)
+                with self.store.transaction():
+                    u = self.store.find_user_by_username(uname)
+                    if u:
+                        self.store.update_user(u, is_active=not u.is_active)
+                        self.store.save()
                 if u:
-                    u.is_active = not u.is_active
-                    self.store.save()
                     print("تم التبديل.")
                 else:
                     print("المستخدم غير موجود.")
             elif ch == "4":
                 # حذف مستخدم
                 uname = input("اسم المستخدم للحذف: ").strip()
-                u = self.store.find_user_by_username(uname)
+                with self.store.transaction():
+                    u = self.store.find_user_by_username(uname)
+                    if u:
+                        self.store.remove_user(u)
+                        self.store.save()
                 if u:
-                    self.store.users.remove(u)
-                    self.store.save()
                     print("تم الحذف.")
                 else:
                     print("غير موجود.")
@@ -708,6 +3093,11 @@ class Menu:
                 top = self.report.top_customers_by_points()
                 print("أعلى العملاء بالنقاط:", [(u.username, u.loyalty_points) for u in top])
             elif ch == "7":
+                # الفاتورة التي بيعت بها سيارة معينة (من الفهرس مباشرة)
+                car_id = input("معرف السيارة: ").strip()
+                inv = self.store.invoice_for_car(car_id)
+                print(inv.to_dict() if inv else "لا توجد فاتورة لهذه السيارة.")
+            elif ch == "8":
                 # الرجوع للقائمة الرئيسية
                 break
             else:
@@ -718,16 +3108,18 @@ class Menu:
     # -------------------------
     def _sales_employee_menu(self, emp: User):
         """
-        قوائم موظف المبيعات: إضافة سيارة، تعديل، استعراض، بحث.
+        قوائم موظف المبيعات: إضافة سيارة، تعديل، استعراض، بحث، استيراد من ملف.
         (لا يسمح بحذف المستخدمين، هذا من صلاحيات Admin فقط).
         """
         while True:
+            self.store.refresh()
             print("\n--- قائمة موظف المبيعات ---")
             print("1) إضافة سيارة")
             print("2) تعديل سيارة")
             print("3) استعراض السيارات")
             print("4) بحث")
-            print("5) خروج")
+            print("5) استيراد سيارات من ملف (CSV/JSONL)")
+            print("6) خروج")
             ch = input("> ").strip()
             if ch == "1":
                 # قراءة بيانات السيارة مع حماية تحويلات الأرقام
@@ -774,6 +3166,16 @@ class Menu:
                 for r in res:
                     print(r.to_dict())
             elif ch == "5":
+                # استيراد شحنة كاملة بحفظ واحد
+                path = input("مسار الملف (.csv أو .jsonl): ").strip()
+                try:
+                    result = self.car_service.bulk_import(path)
+                except OSError as e:
+                    print(f"تعذر فتح الملف: {e}")
+                    continue
+                for line_no, error in result["errors"][:20]:
+                    print(f"  سطر {line_no}: {error}")
+            elif ch == "6":
                 break
             else:
                 print("خيار غير صالح.")
@@ -783,15 +3185,18 @@ class Menu:
     # -------------------------
     def _customer_menu(self, cust: User):
         """
-        قوائم العميل: تصفح السيارات المتاحة، بحث، شراء، عرض الفواتير الخاصة به.
+        قوائم العميل: تصفح السيارات المتاحة، بحث، شراء، عرض الفواتير الخاصة به، حجز سيارة.
         """
         while True:
+            self.store.refresh()
+            self.sales.expire_reservations()
             print("\n--- قائمة العميل ---")
             print("1) تصفح السيارات المتاحة")
             print("2) بحث عن سيارة")
             print("3) شراء سيارة")
             print("4) عرض فواتيري")
-            print("5) خروج")
+            print("5) حجز سيارة / إلغاء حجز")
+            print("6) خروج")
             ch = input("> ").strip()
             if ch == "1":
                 # عرض السيارات المتاحة فقط
@@ -807,16 +3212,34 @@ class Menu:
             elif ch == "3":
                 # شراء سيارة: نأخذ معرف السيارة من العميل وننفّذ عملية الشراء
                 cid = input("معرف السيارة للشراء: ").strip()
+                redeem = 0
+                if cust.loyalty_points > 0:
+                    # استبدال النقاط كخصم (اختياري)
+                    raw = input(f"نقاط للاستبدال من {cust.loyalty_points} (Enter للتخطي): ").strip()
+                    redeem = raw or 0
                 # نستخدم اسم المستخدم من كائن cust (الذي تم تسجيل الدخول به)
-                inv = self.sales.buy_car(cust.username, cid)
+                inv = self.sales.buy_car(cust.username, cid, redeem)
                 if inv:
                     print("تم الشراء. فاتورة:", inv.to_dict())
             elif ch == "4":
-                # عرض جميع الفواتير التي تخص هذا العميل
-                for inv in self.store.invoices:
-                    if inv.customer == cust.username:
+                # عرض فواتير هذا العميل صفحة بصفحة (من فهرس العميل، دون المرور على كل الفواتير)
+                cursor = None
+                while True:
+                    page = self.store.invoices_for_customer(cust.username, 10, cursor)
+                    for inv in page["items"]:
                         print(inv.to_dict())
+                    cursor = page["next_cursor"]
+                    if not cursor or input("المزيد؟ (y/n): ").strip().lower() != "y":
+                        break
             elif ch == "5":
+                # حجز مؤقت (RESERVATION_TTL) أو إلغاء حجز سابق لنفس السيارة
+                cid = input("معرف السيارة: ").strip()
+                car = self.store.find_car_by_id(cid)
+                if car and car.status == "reserved" and car.reserved_by == cust.username:
+                    self.sales.release(cust.username, cid)
+                else:
+                    self.sales.reserve_car(cust.username, cid)
+            elif ch == "6":
                 break
             else:
                 print("خيار غير صالح.")
@@ -827,10 +3250,21 @@ class Menu:
 def main():
     """
     الدالة الرئيسية: تنشئ DataStore ثم Menu وتبدأ التشغيل.
+    مع METRICS_FILE نفعّل القياس (instrumentation.py) ونكتب النتائج عند الخروج.
     """
+    metrics = None
+    if METRICS_FILE:
+        import instrumentation
+        # نقيس فئات هذه الوحدة نفسها (قد تكون __main__ لا نسخة مستوردة منفصلة)
+        metrics = instrumentation.enable(module=sys.modules[__name__])
     store = DataStore()
     menu = Menu(store)
-    menu.run()
+    try:
+        menu.run()
+    finally:
+        store.close()
+        if metrics is not None:
+            metrics.dump(METRICS_FILE)
 
 # عند تشغيل الملف مباشرة، نستدعي main()
 if __name__ == "__main__":
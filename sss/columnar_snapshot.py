@@ -0,0 +1,329 @@
+# columnar_snapshot.py
+# لقطة عمودية للقراءة فقط (cars + invoices) لعمليات التقارير الثقيلة بجانب Menu الحي:
+# - كل عمود رقمي مصفوفة بعرض ثابت (float64 / int64) في موضع محاذٍ لـ 8 بايت.
+# - النصوص (المعرفات، الأسماء، الحالات...) في كومة نصوص واحدة (string heap) بلا تكرار،
+#   مع جدول إزاحات (offsets)؛ عمود النص يخزن رقم النص في الكومة (uint32).
+# - القارئ يفتح الملف عبر mmap ويعيد memoryview على الأعمدة مباشرة (zero copy):
+#   عدة عمليات تقارير تتشارك نسخة واحدة من صفحات الملف في ذاكرة النظام، والفتح لا يحلل شيئًا.
+# - التصدير ذري (ملف مؤقت ثم os.replace): القارئ المفتوح يبقى على النسخة القديمة حتى يعيد الفتح.
+# التشغيل:
+#   python columnar_snapshot.py data_store.json data_store.cols      (تصدير)
+#   python columnar_snapshot.py --report data_store.cols              (ملخص من اللقطة)
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy غير مثبتة: نجمع عبر memoryview مباشرة
+    np = None
+
+from car_dealership_oop_full_commented import DataStore, Invoice
+from sales_analytics import NO_DATE, to_ts
+
+MAGIC = b"SSSCOLS1"
+FORMAT_VERSION = 1
+# بعد MAGIC: طول رأس JSON (uint32)
+LENGTH = struct.Struct("<I")
+ALIGN = 8
+# قيمة عدد صحيح غير صالح (سنة صنع/نقاط بنوع غير متوقع في بيانات قديمة)
+NULL_INT = -(1 << 63)
+# الأعمدة لكل جدول: (الاسم، النوع) حيث d = float64، q = int64، str = رقم نص في الكومة
+COLUMNS = {
+    "cars": (("id", "str"), ("name", "str"), ("model_year", "q"), ("price", "d"),
+             ("color", "str"), ("status", "str")),
+    "invoices": (("id", "str"), ("customer", "str"), ("car_id", "str"), ("price", "d"),
+                 ("points_earned", "q"), ("ts", "q")),
+}
+# رمز memoryview.cast لعمود النص (رقم النص) ولجدول إزاحات الكومة
+CODE_TYPE = "I"
+OFFSET_TYPE = "Q"
+
+
+def _float(value) -> float:
+    return float(value) if type(value) in (int, float) else math.nan
+
+
+def _int(value, null: int = NULL_INT) -> int:
+    return value if type(value) is int else null
+
+
+class _StringHeap:
+    """بناء كومة النصوص أثناء التصدير: كل نص مختلف مرة واحدة."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.offsets = array(OFFSET_TYPE, [0])
+        self.chunks: List[bytes] = []
+
+    def code(self, value) -> int:
+        value = value if type(value) is str else ("" if value is None else str(value))
+        code = self.codes.get(value)
+        if code is None:
+            data = value.encode("utf-8")
+            code = self.codes[value] = len(self.chunks)
+            self.chunks.append(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+        return code
+
+
+def _columns(store: DataStore, heap: _StringHeap) -> dict:
+    """بناء الأعمدة في الذاكرة (array) بتمرير واحد على كل جدول."""
+    cars = {name: array(CODE_TYPE if kind == "str" else kind) for name, kind in COLUMNS["cars"]}
+    for car in store.cars:
+        cars["id"].append(heap.code(car.id))
+        cars["name"].append(heap.code(car.name))
+        cars["model_year"].append(_int(car.model_year))
+        cars["price"].append(_float(car.price))
+        cars["color"].append(heap.code(car.color))
+        cars["status"].append(heap.code(car.status))
+    invoices = {name: array(CODE_TYPE if kind == "str" else kind)
+                for name, kind in COLUMNS["invoices"]}
+    # all_invoices: يشمل الأقسام المؤرشفة إن كان الأرشيف مفعلًا
+    for inv in store.all_invoices():
+        invoices["id"].append(heap.code(inv.id))
+        invoices["customer"].append(heap.code(inv.customer))
+        invoices["car_id"].append(heap.code(inv.car_id))
+        invoices["price"].append(_float(inv.price))
+        invoices["points_earned"].append(_int(inv.points_earned))
+        invoices["ts"].append(_int(inv.ts, NO_DATE))
+    return {"cars": cars, "invoices": invoices}
+
+
+def export(store: DataStore, path: str) -> dict:
+    """
+    كتابة اللقطة العمودية للمخزن إلى path. نعيد الرأس المكتوب.
+    المواضع في الرأس مطلقة من بداية الملف، وكل قسم يبدأ على حد 8 بايت.
+    """
+    heap = _StringHeap()
+    tables = _columns(store, heap)
+    heap_bytes = b"".join(heap.chunks)
+    sections = []
+    for table, cols in tables.items():
+        for name, kind in COLUMNS[table]:
+            sections.append(((table, name), cols[name].tobytes()))
+    sections.append((("strings", "offsets"), heap.offsets.tobytes()))
+    sections.append((("strings", "heap"), heap_bytes))
+
+    header = {
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "schema_version": store.schema_version,
+        "created": datetime.now().isoformat(sep=" ", timespec="seconds"),
+        "users_count": len(store.users),
+        "tables": {table: {"rows": len(cols["id"]), "columns": {}} for table, cols in tables.items()},
+        "strings": {"count": len(heap.chunks)},
+    }
+    # المواضع تُكتب في الرأس نفسه: نعيد التخطيط حتى يثبت طول الرأس (يزداد فقط فيتوقف سريعًا)
+    positions: List[int] = []
+    data_start = -1
+    while True:
+        head = json.dumps(header).encode("utf-8")
+        start = _align(len(MAGIC) + LENGTH.size + len(head))
+        if start == data_start:
+            break
+        data_start, pos, positions = start, start, []
+        for (table, name), data in sections:
+            if table == "strings":
+                header["strings"][name] = [pos, len(data)]
+            else:
+                header["tables"][table]["columns"][name] = [dict(COLUMNS[table])[name], pos]
+            positions.append(pos)
+            pos = _align(pos + len(data))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + LENGTH.pack(len(head)) + head)
+        for pos, (_key, data) in zip(positions, sections):
+            # نملأ الفراغ حتى الموضع المحاذي للقسم
+            f.write(b"\0" * (pos - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return header
+
+
+def _align(pos: int) -> int:
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+class StringColumn:
+    """عمود نصي بلا نسخ: codes هو memoryview لأرقام النصوص، والنص يُفك عند الطلب فقط."""
+
+    def __init__(self, snapshot: 'ColumnarSnapshot', codes: memoryview):
+        self.snapshot = snapshot
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.snapshot.string(self.codes[row])
+
+
+class ColumnarSnapshot:
+    """
+    قارئ اللقطة العمودية عبر mmap (للقراءة فقط).
+    column() تعيد memoryview على بايتات الملف مباشرة؛ numpy_column() تعيد مصفوفة NumPy
+    فوق نفس الذاكرة (np.frombuffer) إن وُجدت NumPy.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mm)
+        if bytes(self._view[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"ليس ملف لقطة عمودية: {path}")
+        (head_len,) = LENGTH.unpack_from(self._mm, len(MAGIC))
+        start = len(MAGIC) + LENGTH.size
+        self.header = json.loads(bytes(self._view[start:start + head_len]))
+        if self.header.get("format") != FORMAT_VERSION or self.header.get("byteorder") != sys.byteorder:
+            self.close()
+            raise ValueError(f"صيغة لقطة غير مدعومة: {path}")
+        off, size = self.header["strings"]["offsets"]
+        self._offsets = self._view[off:off + size].cast(OFFSET_TYPE)
+        self._heap_start = self.header["strings"]["heap"][0]
+
+    def __enter__(self) -> 'ColumnarSnapshot':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        إغلاق الملف. إن بقيت memoryview مأخوذة من اللقطة مستخدمة لا يمكن إغلاق mmap بعد؛
+        يُترك حينها لجامع القمامة بعد تحرير آخر مرجع.
+        """
+        try:
+            for view in (getattr(self, "_offsets", None), self._view):
+                if view is not None:
+                    view.release()
+            self._mm.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def rows(self, table: str) -> int:
+        return self.header["tables"][table]["rows"]
+
+    def string(self, code: int) -> str:
+        start = self._heap_start + self._offsets[code]
+        end = self._heap_start + self._offsets[code + 1]
+        return str(self._mm[start:end], "utf-8")
+
+    def _column_range(self, table: str, name: str) -> tuple:
+        kind, off = self.header["tables"][table]["columns"][name]
+        code = CODE_TYPE if kind == "str" else kind
+        return kind, code, off, self.rows(table) * struct.calcsize(code)
+
+    def column(self, table: str, name: str):
+        """memoryview رقمي (d/q) أو StringColumn لعمود نصي، بلا نسخ."""
+        kind, code, off, size = self._column_range(table, name)
+        view = self._view[off:off + size].cast(code)
+        return StringColumn(self, view) if kind == "str" else view
+
+    def numpy_column(self, table: str, name: str):
+        """مصفوفة NumPy فوق ذاكرة mmap (أرقام النصوص لعمود نصي)."""
+        kind, code, off, size = self._column_range(table, name)
+        return np.frombuffer(self._mm, dtype=np.dtype(code), count=self.rows(table), offset=off)
+
+
+class ColumnarReportGenerator:
+    """
+    نسخة للقراءة فقط من ReportGenerator تعمل على اللقطة العمودية بدل DataStore:
+    - summary: نفس مفاتيح ReportGenerator.summary (من الأعمدة مباشرة، بلا كائنات)
+    - revenue_between: الإيراد في مدى زمني [start, end) من عمود ts
+    - list_sold_cars: الفواتير ككائنات Invoice (تُبنى عند الطلب فقط)
+    التواريخ غير القابلة للقراءة تُصدَّر كـ NO_DATE فتُستبعد من المدى الزمني.
+    """
+    def __init__(self, source):
+        self.snapshot = source if isinstance(source, ColumnarSnapshot) else ColumnarSnapshot(source)
+
+    def close(self):
+        self.snapshot.close()
+
+    def _sum(self, table: str, name: str) -> float:
+        if np is not None:
+            return float(self.snapshot.numpy_column(table, name).sum())
+        return math.fsum(self.snapshot.column(table, name))
+
+    def summary(self) -> dict:
+        snap = self.snapshot
+        if np is not None:
+            codes, counts = np.unique(snap.numpy_column("cars", "status"), return_counts=True)
+            by_code = dict(zip(codes.tolist(), counts.tolist()))
+        else:
+            by_code = Counter(snap.column("cars", "status").codes)
+        return {
+            "users_count": snap.header["users_count"],
+            "cars_count": snap.rows("cars"),
+            "invoices_count": snap.rows("invoices"),
+            "total_revenue": self._sum("invoices", "price"),
+            "cars_by_status": {snap.string(code): n for code, n in by_code.items()},
+        }
+
+    def revenue_between(self, start=None, end=None) -> float:
+        """مجموع أسعار الفواتير في [start, end) ("YYYY-MM-DD" أو datetime أو None)."""
+        lo, hi = to_ts(start), to_ts(end)
+        lo = NO_DATE + 1 if lo is None else lo
+        snap = self.snapshot
+        if np is not None:
+            ts = snap.numpy_column("invoices", "ts")
+            mask = ts >= lo
+            if hi is not None:
+                mask &= ts < hi
+            return float(snap.numpy_column("invoices", "price")[mask].sum())
+        ts, price = snap.column("invoices", "ts"), snap.column("invoices", "price")
+        return math.fsum(price[i] for i in range(len(ts))
+                         if ts[i] >= lo and (hi is None or ts[i] < hi))
+
+    def list_sold_cars(self) -> List[Invoice]:
+        snap = self.snapshot
+        cols = [snap.column("invoices", name) for name, _kind in COLUMNS["invoices"]]
+        ids, customers, car_ids, prices, points, ts = cols
+        return [Invoice.from_row((ids[i], customers[i], car_ids[i], prices[i],
+                                  points[i], ts[i] if ts[i] != NO_DATE else ""))
+                for i in range(snap.rows("invoices"))]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2 and argv[0] == "--report":
+        reports = ColumnarReportGenerator(argv[1])
+        try:
+            print(json.dumps(reports.summary(), ensure_ascii=False, indent=2))
+        finally:
+            reports.close()
+        return 0
+    if len(argv) != 2:
+        print("الاستخدام: python columnar_snapshot.py data_store.json data_store.cols")
+        print("       أو: python columnar_snapshot.py --report data_store.cols")
+        return 1
+    store = DataStore(argv[0])
+    try:
+        header = export(store, argv[1])
+    finally:
+        store.close()
+    counts = {table: info["rows"] for table, info in header["tables"].items()}
+    print(f"✅ تم تصدير اللقطة العمودية إلى {argv[1]}: {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
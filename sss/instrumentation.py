@@ -0,0 +1,310 @@
+# instrumentation.py
+# قياس اختياري (opt-in) لزمن العمليات والإدخال/الإخراج في خدمات المعرض والتخزين:
+# - لكل طريقة عامة في AuthService / CarService / SalesService / ReportGenerator / DataStore
+#   (ومعها HashUtil.hash_password وطرق واجهات التخزين): عدد الاستدعاءات والأخطاء ومدرج زمني (histogram).
+# - البايتات المكتوبة في كل حفظ (لكل واجهة تخزين)، وعدد السجلات المفحوصة في كل بحث.
+# - التصدير عند الطلب بصيغة Prometheus النصية أو JSON.
+# عند التعطيل لا يوجد أي غلاف: الطرق الأصلية نفسها على الفئات، فالكلفة صفر تقريبًا.
+# enable() تستبدل الطرق على مستوى الفئة بأغلفة مُقاسة، و disable() تعيد الأصلية.
+#
+# الاستخدام:
+#     import instrumentation
+#     metrics = instrumentation.enable()
+#     ...
+#     print(metrics.to_prometheus())      # أو metrics.to_json()
+
+import bisect
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+from types import ModuleType
+from typing import Dict, List, Optional
+
+# حدود المدرجات (الحد الأعلى لكل خانة؛ الأخيرة +Inf ضمنيًا)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(256 * 4 ** i for i in range(12))          # 256 B .. 1 GiB
+SCANNED_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+# الفئات المقاسة: كل طرقها العامة
+SERVICE_CLASSES = ("AuthService", "CarService", "SalesService", "ReportGenerator", "DataStore")
+# طرق إضافية خارج الخدمات (التجزئة وواجهات التخزين)
+EXTRA_METHODS = {"HashUtil": ("hash_password",),
+                 "JsonBackend": ("load", "save", "poll", "compact")}
+# واجهات التخزين في وحداتها الاختيارية: (الوحدة، الفئة) -> الطرق
+BACKEND_METHODS = {("sqlite_backend", "SqliteBackend"): ("load", "save", "poll"),
+                   ("binary_backend", "BinaryBackend"): ("load", "save", "poll")}
+# transaction مدير سياق (contextmanager): زمن إنشائه بلا معنى، والعمل بداخله مقاس بطرقه
+SKIP = {"DataStore.transaction"}
+
+# عدد السجلات المفحوصة لكل عملية بحث: (args, result) -> عدد
+SCANNED = {
+    # فهارس dict: فحص سجل واحد
+    "DataStore.find_user_by_username": lambda args, result: 1,
+    "DataStore.find_user_by_id": lambda args, result: 1,
+    "DataStore.find_car_by_id": lambda args, result: 1,
+    "DataStore.invoice_for_car": lambda args, result: 1,
+    "AuthService.login": lambda args, result: 1,
+    "DataStore.invoices_for_customer": lambda args, result: len(result["items"]),
+    # الفهارس الثانوية تسجل عدد المرشحين الذين فحصتهم
+    "CarService.search": lambda args, result: args[0].store.car_index.last_scanned,
+    "CarService.query": lambda args, result: args[0].store.car_query.last_scanned,
+    # تقارير تمر على كل الفواتير / كل السجلات
+    "ReportGenerator.list_sold_cars": lambda args, result: len(result),
+    "ReportGenerator.check_consistency": lambda args, result: (
+        len(args[0].store.users) + len(args[0].store.cars) + len(args[0].store.invoices)),
+}
+
+
+class Histogram:
+    """مدرج بخانات ثابتة: counts[i] عدد القيم <= bounds[i]، والخانة الأخيرة لما فوقها."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """تقدير الشريحة q (الحد الأعلى للخانة التي تقع فيها)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum,
+                "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99),
+                "buckets": {str(b): n for b, n in zip(self.bounds + ("+Inf",), self.counts)}}
+
+
+class Metrics:
+    """
+    مجمع القياسات:
+    - latency: اسم العملية -> Histogram للزمن بالثواني (count هو عدد الاستدعاءات).
+    - errors: اسم العملية -> عدد الاستدعاءات التي رفعت استثناء.
+    - save_bytes: اسم واجهة التخزين -> Histogram للبايتات المكتوبة في كل حفظ.
+    - scanned: اسم العملية -> Histogram لعدد السجلات المفحوصة.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latency: Dict[str, Histogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.save_bytes: Dict[str, Histogram] = {}
+        self.scanned: Dict[str, Histogram] = {}
+
+    @staticmethod
+    def _observe(table: dict, key: str, bounds: tuple, value):
+        hist = table.get(key)
+        if hist is None:
+            hist = table[key] = Histogram(bounds)
+        hist.observe(value)
+
+    def observe_call(self, op: str, seconds: float, error: bool = False):
+        with self._lock:
+            self._observe(self.latency, op, LATENCY_BUCKETS, seconds)
+            if error:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+    def observe_save(self, backend: str, nbytes: int):
+        with self._lock:
+            self._observe(self.save_bytes, backend, BYTES_BUCKETS, nbytes)
+
+    def observe_scanned(self, op: str, records: int):
+        with self._lock:
+            self._observe(self.scanned, op, SCANNED_BUCKETS, records)
+
+    # -------------------------
+    # التصدير
+    # -------------------------
+    def to_json(self) -> dict:
+        """كل القياسات كـ dict قابل للتحويل إلى JSON."""
+        with self._lock:
+            return {
+                "ops": {op: dict(h.to_dict(), errors=self.errors.get(op, 0))
+                        for op, h in sorted(self.latency.items())},
+                "save_bytes": {k: h.to_dict() for k, h in sorted(self.save_bytes.items())},
+                "records_scanned": {k: h.to_dict() for k, h in sorted(self.scanned.items())},
+            }
+
+    def to_prometheus(self) -> str:
+        """صيغة Prometheus النصية (text exposition format 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, label, table, help_text in (
+                    ("sss_op_duration_seconds", "op", self.latency, "Operation latency in seconds"),
+                    ("sss_save_bytes", "backend", self.save_bytes, "Bytes written per save"),
+                    ("sss_records_scanned", "op", self.scanned, "Records scanned per lookup")):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(table.items()):
+                    cumulative = 0
+                    for bound, n in zip(hist.bounds + ("+Inf",), hist.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}="{key}"}} {hist.sum}')
+                    lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+            lines.append("# HELP sss_op_errors_total Operations that raised an exception")
+            lines.append("# TYPE sss_op_errors_total counter")
+            for op, n in sorted(self.errors.items()):
+                lines.append(f'sss_op_errors_total{{op="{op}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """كتابة القياسات إلى ملف: .prom/.txt بصيغة Prometheus، وغير ذلك JSON."""
+        if path.endswith((".prom", ".txt")):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.to_json(), indent=2)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+# ---------------------------------------------------------------------
+# التفعيل والتعطيل (استبدال الطرق على مستوى الفئة)
+# ---------------------------------------------------------------------
+_active: Optional[Metrics] = None
+# (الفئة، اسم الطريقة، القيمة الأصلية في __dict__) لإعادتها عند التعطيل
+_originals: list = []
+
+
+def _timed(op: str, func, metrics: Metrics):
+    """غلاف يقيس الزمن (والسجلات المفحوصة إن عُرفت للعملية)."""
+    clock = time.perf_counter
+    scanned = SCANNED.get(op)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            metrics.observe_call(op, clock() - start, error=True)
+            raise
+        metrics.observe_call(op, clock() - start)
+        if scanned is not None:
+            metrics.observe_scanned(op, scanned(args, result))
+        return result
+    return wrapper
+
+
+def _file_sizes(path: str) -> dict:
+    """(inode, size) لملف البيانات وملفاته المرافقة (السجل و WAL في SQLite)."""
+    out = {}
+    for p in (path, path + ".journal", path + "-wal"):
+        try:
+            st = os.stat(p)
+            out[p] = (st.st_ino, st.st_size)
+        except OSError:
+            out[p] = None
+    return out
+
+
+def _written(before: dict, after: dict) -> int:
+    """تقدير البايتات المكتوبة: ملف استُبدل (inode جديد) يُحسب كاملًا، وملف نما يُحسب فرقه."""
+    total = 0
+    for p, now in after.items():
+        if now is None:
+            continue
+        old = before.get(p)
+        if old is None or old[0] != now[0]:
+            total += now[1]
+        else:
+            total += max(0, now[1] - old[1])
+    return total
+
+
+def _counted_save(op: str, func, metrics: Metrics):
+    """غلاف save في واجهة التخزين: الزمن + البايتات المكتوبة."""
+    timed = _timed(op, func, metrics)
+    backend_name = op.split(".")[0]
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        before = _file_sizes(self.path)
+        result = timed(self, *args, **kwargs)
+        metrics.observe_save(backend_name, _written(before, _file_sizes(self.path)))
+        return result
+    return wrapper
+
+
+def _patch(cls, name: str, metrics: Metrics):
+    op = f"{cls.__name__}.{name}"
+    if op in SKIP:
+        return
+    raw = cls.__dict__[name]
+    if isinstance(raw, staticmethod):
+        wrapped = staticmethod(_timed(op, raw.__func__, metrics))
+    elif isinstance(raw, (classmethod, property)) or not callable(raw):
+        return
+    elif name == "save" and cls.__name__.endswith("Backend"):
+        wrapped = _counted_save(op, raw, metrics)
+    else:
+        wrapped = _timed(op, raw, metrics)
+    _originals.append((cls, name, raw))
+    setattr(cls, name, wrapped)
+
+
+def _targets(core: ModuleType):
+    """(الفئة، أسماء الطرق) لكل ما يُقاس؛ فئات الخدمات من الوحدة core نفسها."""
+    for cls_name in SERVICE_CLASSES:
+        cls = getattr(core, cls_name)
+        yield cls, [n for n in vars(cls) if not n.startswith("_")]
+    for cls_name, names in EXTRA_METHODS.items():
+        yield getattr(core, cls_name), names
+    for (module_name, cls_name), names in BACKEND_METHODS.items():
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        yield getattr(module, cls_name), names
+
+
+def enable(metrics: Optional[Metrics] = None, module: Optional[ModuleType] = None) -> Metrics:
+    """
+    تفعيل القياس (مرة واحدة؛ الاستدعاء الثاني يعيد نفس المجمع).
+    module: الوحدة التي تُستبدل طرق فئاتها. عند تشغيل البرنامج مباشرة تكون __main__ نسخة مستقلة
+    عن car_dealership_oop_full_commented المستورد، فيمرر main() نفسه: module=sys.modules[__name__].
+    """
+    global _active
+    if _active is not None:
+        return _active
+    if module is None:
+        import car_dealership_oop_full_commented as module
+    _active = metrics or Metrics()
+    for cls, names in _targets(module):
+        for name in names:
+            _patch(cls, name, _active)
+    return _active
+
+
+def disable():
+    """إعادة الطرق الأصلية (القياسات المجمعة تبقى في كائن Metrics)."""
+    global _active
+    while _originals:
+        cls, name, raw = _originals.pop()
+        setattr(cls, name, raw)
+    _active = None
+
+
+def active() -> Optional[Metrics]:
+    """المجمع الحالي أو None إن كان القياس معطلًا."""
+    return _active
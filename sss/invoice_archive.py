@@ -0,0 +1,198 @@
+# invoice_archive.py
+# أرشيف الفواتير مقسمًا حسب الشهر (time-partitioned) بجانب ملف البيانات:
+#   <data_store.json>.archive/
+#       2024-01.jsonl     فواتير شهر مغلق (سطر JSON لكل فاتورة بترتيب الإنشاء)
+#       2024-02.jsonl
+#       manifest.json     لكل شهر: العدد، الإيراد، وعدد فواتير كل عميل
+# - DataStore يحمّل فواتير الشهر الحالي فقط (القسم النشط)، وينقل الأشهر المغلقة إلى هنا.
+# - التقارير وسجل فواتير العميل تفتح الأقسام القديمة عند الحاجة فقط، مع ذاكرة مؤقتة LRU
+#   لآخر الأقسام المفتوحة؛ manifest يكفي للمجاميع وللتخطي دون فتح أي قسم.
+# - الكتابة ذرية (ملف مؤقت ثم os.replace) والدمج بالمعرف، فإعادة الأرشفة بعد انقطاع لا تكرر فواتير.
+
+import json
+import math
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from car_dealership_oop_full_commented import CompactUtil, Invoice
+
+MANIFEST = "manifest.json"
+SEGMENT_EXT = ".jsonl"
+
+
+def month_of(inv: Invoice) -> Optional[str]:
+    """"YYYY-MM" لتاريخ الفاتورة، أو None لتاريخ غير قابل للقراءة (يبقى في القسم النشط)."""
+    ts = inv.ts
+    if type(ts) is not int:
+        return None
+    day = CompactUtil.EPOCH + timedelta(seconds=ts)
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def month_start_ts(now: Optional[datetime] = None) -> int:
+    """ثواني بداية الشهر الحالي (حد القسم النشط)."""
+    now = now or datetime.now()
+    return CompactUtil.iso_to_ts(now.strftime("%Y-%m-01 00:00:00"))
+
+
+class _Partition:
+    """قسم شهر محمّل: الفواتير بترتيبها وفهرس حسب العميل."""
+    __slots__ = ("invoices", "by_customer")
+
+    def __init__(self, invoices: List[Invoice]):
+        self.invoices = invoices
+        self.by_customer: Dict[str, List[Invoice]] = {}
+        for inv in invoices:
+            self.by_customer.setdefault(inv.customer, []).append(inv)
+
+
+class InvoiceArchive:
+    """
+    الأقسام الشهرية المغلقة مع manifest وذاكرة LRU للأقسام المحمّلة.
+    الفواتير المؤرشفة للقراءة فقط: كائنات مستقلة لا تدخل قوائم DataStore ولا فهارسه.
+    """
+    def __init__(self, directory: str, cache_size: int = 6):
+        self.directory = directory
+        self.cache_size = max(1, cache_size)
+        self._cache: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._manifest_stamp = None
+        self.manifest: Dict[str, dict] = {}
+        self.reload()
+
+    # -------------------------
+    # manifest
+    # -------------------------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _stamp(self):
+        try:
+            st = os.stat(self._path(MANIFEST))
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def reload(self) -> bool:
+        """إعادة قراءة manifest إن غيّرته عملية أخرى؛ نعيد True إن تغيّر."""
+        stamp = self._stamp()
+        if stamp == self._manifest_stamp:
+            return False
+        try:
+            with open(self._path(MANIFEST), "r", encoding="utf-8") as f:
+                self.manifest = json.load(f).get("months", {})
+        except FileNotFoundError:
+            self.manifest = {}
+        self._manifest_stamp = stamp
+        # أقسام ربما أعيدت كتابتها: لا نثق بالنسخ المحمّلة
+        self._cache.clear()
+        return True
+
+    def _write_json(self, name: str, text: str):
+        path = self._path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def months(self) -> List[str]:
+        """الأشهر المؤرشفة من الأقدم للأحدث."""
+        return sorted(self.manifest)
+
+    @property
+    def count(self) -> int:
+        return sum(m["count"] for m in self.manifest.values())
+
+    @property
+    def revenue(self) -> float:
+        return math.fsum(m["revenue"] for m in self.manifest.values())
+
+    # -------------------------
+    # الكتابة
+    # -------------------------
+    def append(self, invoices: List[Invoice]):
+        """
+        أرشفة فواتير (أشهر مغلقة): دمجها في ملف كل شهر بالمعرف ثم تحديث manifest.
+        manifest يُكتب أخيرًا ويُحسب من محتوى القسم كاملًا، فالتكرار بعد انقطاع لا يضاعف الأرقام.
+        """
+        by_month: Dict[str, List[Invoice]] = {}
+        for inv in invoices:
+            month = month_of(inv)
+            if month is None:
+                raise ValueError(f"فاتورة بتاريخ غير صالح لا تُؤرشف: {inv.id}")
+            by_month.setdefault(month, []).append(inv)
+        os.makedirs(self.directory, exist_ok=True)
+        for month, new in sorted(by_month.items()):
+            records = self._read_segment(month)
+            seen = {r.get("id") for r in records}
+            records.extend(inv.to_dict() for inv in new if inv.id not in seen)
+            self._write_json(month + SEGMENT_EXT, "".join(
+                json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            customers: Dict[str, int] = {}
+            for r in records:
+                customers[r.get("customer", "")] = customers.get(r.get("customer", ""), 0) + 1
+            self.manifest[month] = {"count": len(records),
+                                    "revenue": math.fsum(r.get("price", 0.0) for r in records),
+                                    "customers": customers}
+            self._cache.pop(month, None)
+        self._write_json(MANIFEST, json.dumps({"months": self.manifest}, ensure_ascii=False))
+        self._manifest_stamp = self._stamp()
+
+    # -------------------------
+    # القراءة (كسولة مع LRU)
+    # -------------------------
+    def _read_segment(self, month: str) -> List[dict]:
+        try:
+            with open(self._path(month + SEGMENT_EXT), "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def partition(self, month: str) -> _Partition:
+        """قسم شهر محمّل (من الذاكرة المؤقتة أو من القرص مع إخراج الأقدم استخدامًا)."""
+        part = self._cache.get(month)
+        if part is not None:
+            self._cache.move_to_end(month)
+            return part
+        part = _Partition([Invoice.from_dict(r) for r in self._read_segment(month)])
+        self._cache[month] = part
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return part
+
+    def iter_invoices(self) -> Iterator[Invoice]:
+        """كل الفواتير المؤرشفة من الأقدم للأحدث (قسم بعد قسم)."""
+        for month in self.months():
+            yield from self.partition(month).invoices
+
+    def customer_counts(self, username: str) -> List[tuple]:
+        """[(الشهر، عدد فواتير العميل فيه)] من manifest فقط، من الأقدم للأحدث."""
+        return [(m, self.manifest[m]["customers"][username]) for m in self.months()
+                if username in self.manifest[m].get("customers", {})]
+
+    def customer_invoices(self, month: str, username: str) -> List[Invoice]:
+        return self.partition(month).by_customer.get(username, [])
+
+    def find_car(self, car_id: str) -> Optional[Invoice]:
+        """آخر فاتورة مؤرشفة للسيارة (من الأحدث للأقدم، نتوقف عند أول قسم يحتويها)."""
+        for month in reversed(self.months()):
+            for inv in reversed(self.partition(month).invoices):
+                if inv.car_id == car_id:
+                    return inv
+        return None
+
+    def verify(self) -> List[str]:
+        """مقارنة manifest بمحتوى الأقسام الفعلي (قسم بعد قسم)."""
+        problems = []
+        for month in self.months():
+            records = self._read_segment(month)
+            entry = self.manifest[month]
+            revenue = math.fsum(r.get("price", 0.0) for r in records)
+            if len(records) != entry["count"] or not math.isclose(revenue, entry["revenue"],
+                                                                  rel_tol=1e-9, abs_tol=1e-6):
+                problems.append(f"archive {month}: manifest ({entry['count']}, {entry['revenue']}) "
+                                f"!= segment ({len(records)}, {revenue})")
+        return problems
@@ -1,12 +1,37 @@
 # migrate_data.py
 # سكربت لترحيل البيانات من الملف القديم (data.json) إلى البنية الجديدة (data_store.json)
+# - قراءة بالتدفق (streaming): لا نحمل الملف القديم كاملًا في الذاكرة، بل سجلًا بسجل.
+# - تجزئة كلمات المرور وتوحيد السجلات تتم على دفعات في مجموعة عمليات (process pool).
+# - الكتابة تدريجية إلى "<NEW_FILE>.partial" ثم إعادة تسمية ذرية عند الانتهاء.
+# - نقطة استئناف (checkpoint) بعد كل دفعة: إعادة التشغيل تكمل من حيث توقفت.
+# - ترحيل تزايدي (delta): إن وُجد data_store.json نحدّثه بدل إعادة بنائه. لكل سجل قديم
+#   بصمة (fingerprint) في "<NEW_FILE>.fingerprints"، فلا يُعاد توحيد/تجزئة/كتابة إلا الجديد
+#   أو المتغير، والسجلات التي أُنشئت في النظام الجديد تبقى كما هي.
+# - محرك ترقية الصيغة: المخزن يحمل schema_version، و upgrade_store تطبق الخطوات الناقصة فقط
+#   (يستدعيها DataStore.load تلقائيًا للملفات الأقدم).
+#
+# التشغيل: python migrate_data.py [--old data.json] [--new data_store.json] [--workers N]
+#                                 [--chunk 2000] [--restart] [--full]
 
+import argparse
+import codecs
 import json
 import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from car_dealership_oop_full_commented import SCHEMA_VERSION
+
 OLD_FILE = "data.json"        # اسم الملف القديم
 NEW_FILE = "data_store.json"  # اسم الملف الجديد
+CHUNK_SIZE = 2000             # عدد السجلات في كل دفعة تُرسل للعمليات
+READ_SIZE = 1 << 20           # حجم القراءة من الملف القديم (1 MiB)
+KINDS = ("users", "cars", "invoices")
+# حقول المستخدم التي يملكها النظام القديم (تُزامن)؛ كلمة المرور والنقاط يملكها النظام الجديد
+LEGACY_USER_FIELDS = ("usertype", "phone", "gender", "is_active")
 
 def hash_password(pw) -> str:
     """إرجاع sha256 hash لكلمة المرور النصية أو أي نوع آخر"""
@@ -14,80 +39,629 @@ def hash_password(pw) -> str:
         pw = str(pw)  # نحول أي dict/list/... إلى نص
     return hashlib.sha256(pw.encode()).hexdigest()
 
-def migrate():
-    if not Path(OLD_FILE).exists():
-        print(f"❌ الملف {OLD_FILE} غير موجود!")
+# ---------------------------------------------------------------------
+# توحيد السجلات (يعمل داخل العمليات الفرعية)
+# ---------------------------------------------------------------------
+def flatten_users(u):
+    """
+    المستخدمون في الملف القديم قد يكونون قوائم متداخلة: [[{...}, {...}], ...].
+    قائمة تحتوي dict أو قوائم تُفك عنصرًا عنصرًا؛ قائمة قيم بسيطة هي مستخدم بصيغة موضعية
+    (username, password, usertype, phone, gender). سابقًا كانت القائمة المتداخلة تُعامل كمستخدم
+    موضعي فتصبح السجلات كاملة داخل حقلي username و usertype.
+    """
+    if isinstance(u, list) and any(isinstance(x, (dict, list)) for x in u):
+        for x in u:
+            yield from flatten_users(x)
+    elif isinstance(u, (dict, list)):
+        yield u
+
+def _gender(value) -> str:
+    """"Male"/"Female" في بعض السجلات القديمة -> M/F."""
+    value = str(value or "M")
+    return "F" if value[:1].upper() == "F" else "M"
+
+def normalize_user(u):
+    if isinstance(u, dict):
+        # بعض السجلات القديمة تستخدم role / active / phonenumber
+        return {
+            "id": u.get("id", f"user-{u.get('username','xxx')}"),
+            "username": u.get("username", ""),
+            "password_hash": hash_password(u.get("password", "123456")),
+            "usertype": u.get("usertype", u.get("role", "Customer")),
+            "phone": str(u.get("phone", u.get("phonenumber", ""))),
+            "gender": _gender(u.get("gender")),
+            "is_active": u.get("is_active", u.get("active", True)),
+            "loyalty_points": u.get("loyalty_points", 0)
+        }
+    if isinstance(u, list):
+        username = u[0] if len(u) > 0 else "unknown"
+        password = u[1] if len(u) > 1 else "123456"
+        usertype = u[2] if len(u) > 2 else "Customer"
+        phone    = u[3] if len(u) > 3 else ""
+        gender   = u[4] if len(u) > 4 else "M"
+        return {
+            "id": f"user-{username}",
+            "username": username,
+            "password_hash": hash_password(password),
+            "usertype": usertype,
+            "phone": phone,
+            "gender": gender,
+            "is_active": True,
+            "loyalty_points": 0
+        }
+    return None
+
+def _model_year(value):
+    """سنة الموديل كعدد صحيح ("2020" -> 2020)؛ القيم غير الرقمية تبقى كما هي."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def _join_specs(parts) -> str:
+    """دمج أجزاء المواصفات دون أجزاء فارغة (سابقًا: "category:Sedan,")."""
+    return ", ".join(p.strip() for p in parts if p and p.strip())
+
+def normalize_car(c):
+    specs_parts = []
+    for key in c:
+        if key not in ("id","name","model","price","color","status","specs"):
+            specs_parts.append(f"{key}:{c[key]}")
+    specs_str = _join_specs(specs_parts + [c.get("specs","")])
+    return {
+        "id": c.get("id", f"car-{c.get('name','xxx')}"),
+        "name": c.get("name", ""),
+        "model_year": _model_year(c.get("model", 0)),
+        "price": c.get("price", 0.0),
+        "color": c.get("color", ""),
+        "specs": specs_str.strip(),
+        "status": c.get("status", "available")
+    }
+
+def normalize_invoice(i):
+    return {
+        "id": i.get("id", f"inv-{i.get('customer','xxx')}"),
+        "customer": i.get("customer", ""),
+        "car_id": i.get("car_id", ""),
+        "price": i.get("price", 0.0),
+        "points_earned": i.get("points_earned", 0),
+        "date": i.get("date", "")
+    }
+
+NORMALIZERS = {"users": normalize_user, "cars": normalize_car, "invoices": normalize_invoice}
+
+def normalize_chunk(kind: str, records: list, as_json: bool = True) -> list:
+    """
+    توحيد دفعة كاملة. as_json=True: سطور JSON جاهزة للكتابة (التسلسل أيضًا في العملية الفرعية)،
+    وإلا dict لكل سجل. السجل غير القابل للتوحيد يصبح None في نفس موضعه.
+    """
+    fn = NORMALIZERS[kind]
+    out = []
+    for rec in records:
+        try:
+            new = fn(rec)
+        except (AttributeError, TypeError):
+            # سجل بشكل غير متوقع (مثلًا سيارة كقائمة): يُتجاهل كما في النسخة السابقة للمستخدمين
+            new = None
+        if new is not None and as_json:
+            new = json.dumps(new, ensure_ascii=False)
+        out.append(new)
+    return out
+
+# ---------------------------------------------------------------------
+# بصمات السجلات القديمة (للترحيل التزايدي)
+# ---------------------------------------------------------------------
+def legacy_key(kind: str, rec) -> str:
+    """
+    مفتاح ثابت للسجل القديم: اسم المستخدم للمستخدمين (تكراره في الملف القديم = نفس الشخص)،
+    والمعرف (أو الاسم) للسيارات والفواتير — نفس قاعدة المعرف في normalize_*.
+    """
+    if kind == "users":
+        name = rec.get("username", "xxx") if isinstance(rec, dict) else (rec[0] if rec else "unknown")
+        return str(name)
+    if isinstance(rec, dict):
+        fallback = rec.get("name", "xxx") if kind == "cars" else rec.get("customer", "xxx")
+        return str(rec.get("id", fallback))
+    return json.dumps(rec, ensure_ascii=False)
+
+def fingerprint(rec) -> str:
+    """بصمة محتوى السجل القديم (مستقلة عن ترتيب المفاتيح)."""
+    data = json.dumps(rec, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+class FingerprintLog:
+    """
+    ملف بصمات "<NEW_FILE>.fingerprints": سطر "kind\tkey\tfingerprint" لكل سجل مُرحّل.
+    الإضافة فقط (آخر سطر للمفتاح هو الصحيح)، فيُكتب مع كل دفعة دون إعادة كتابة الملف.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.prints = {}
+
+    def load(self, limit: int = None):
+        """قراءة البصمات (حتى البايت limit عند الاستئناف)."""
+        self.prints = {}
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read() if limit is None else f.read(limit)
+        except FileNotFoundError:
+            return
+        for line in data.decode("utf-8").splitlines():
+            parts = line.split("\t")
+            if len(parts) == 3:
+                self.prints[(parts[0], parts[1])] = parts[2]
+
+    def get(self, kind: str, key: str):
+        return self.prints.get((kind, key))
+
+    @staticmethod
+    def lines(kind: str, items) -> str:
+        """سطور البصمات لدفعة: items = [(key, fingerprint), ...]."""
+        return "".join(f"{kind}\t{key}\t{fp}\n" for key, fp in items)
+
+# ---------------------------------------------------------------------
+# محرك ترقية صيغة المخزن (schema_version)
+# ---------------------------------------------------------------------
+def _v1_repair_users(raw: dict) -> dict:
+    """
+    0 -> 1: إصلاح المستخدمين المشوهين بالترحيل القديم (سجلات كاملة داخل username/usertype/...):
+    نستخرج السجلات المتداخلة ونوحدها، ونحذف تكرار اسم المستخدم (الأول يبقى).
+    """
+    users, names = [], set()
+    for u in raw.get("users", []):
+        nested = [v for v in u.values() if isinstance(v, (dict, list))]
+        candidates = ([normalize_user(x) for v in nested for x in flatten_users(v)]
+                      if nested else [u])
+        for c in candidates:
+            if c is not None and c.get("username") and c["username"] not in names:
+                names.add(c["username"])
+                users.append(c)
+    raw["users"] = users
+    return raw
+
+def _v2_clean_cars(raw: dict) -> dict:
+    """1 -> 2: سنة الموديل كعدد صحيح، وإزالة الأجزاء الفارغة من المواصفات."""
+    for c in raw.get("cars", []):
+        c["model_year"] = _model_year(c.get("model_year", 0))
+        c["specs"] = _join_specs(str(c.get("specs", "")).split(","))
+    return raw
+
+# الخطوة رقم n ترقي من الإصدار n إلى n+1
+SCHEMA_STEPS = [_v1_repair_users, _v2_clean_cars]
+
+def upgrade_store(raw: dict, target: int = SCHEMA_VERSION) -> dict:
+    """تطبيق خطوات الترقية الناقصة فقط من raw["schema_version"] حتى target."""
+    version = raw.get("schema_version", 0)
+    while version < target:
+        raw = SCHEMA_STEPS[version](raw)
+        version += 1
+        print(f"↑ ترقية صيغة المخزن إلى الإصدار {version}")
+    raw["schema_version"] = version
+    return raw
+
+# ---------------------------------------------------------------------
+# قارئ JSON بالتدفق للملف القديم: {"users": [...], "cars": [...], "invoices": [...]}
+# ---------------------------------------------------------------------
+class LegacyStream:
+    """
+    يقرأ الكائن الخارجي ويعيد (kind, السجل, موضع البايت بعد السجل) لكل عنصر في القوائم.
+    الموضع بالبايت يسمح بالاستئناف: LegacyStream(f, offset, kind) يبدأ داخل قائمة kind مباشرة.
+    """
+    WS = " \t\r\n"
+
+    def __init__(self, f, offset: int = 0, kind: str = None):
+        self.f = f
+        f.seek(offset)
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        # موضع البايت المقابل لـ buf[pos]
+        self.offset = offset
+        self.eof = False
+        self.resume_kind = kind
+
+    def _fill(self) -> bool:
+        """قراءة المزيد؛ نحذف الجزء المستهلك من buf. نعيد False عند نهاية الملف."""
+        if self.eof:
+            return False
+        data = self.f.read(READ_SIZE)
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + self.utf8.decode(data, final=self.eof)
+        self.pos = 0
+        return bool(data)
+
+    def _advance(self, end: int):
+        """استهلاك buf حتى end مع تحديث موضع البايت."""
+        self.offset += len(self.buf[self.pos:end].encode("utf-8"))
+        self.pos = end
+
+    def _peek(self) -> str:
+        """أول حرف غير فارغ (بعد تخطي المسافات) أو "" عند النهاية."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WS:
+                self._advance(self.pos + 1)
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        ch = self._peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"JSON غير متوقع عند البايت {self.offset}: {ch!r}")
+        self._advance(self.pos + 1)
+        return ch
+
+    def _value(self):
+        """قراءة قيمة JSON كاملة (نقرأ المزيد إن كانت مقطوعة في نهاية buf)."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # رقم في نهاية buf قد يكون ناقصًا: نتأكد بقراءة المزيد
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self._advance(end)
+            return value
+
+    def _array(self, kind: str):
+        """عناصر قائمة kind حتى "]" (نكون بعد "[" أو بعد عنصر)."""
+        first = True
+        while True:
+            ch = self._peek()
+            if ch == "]":
+                self._advance(self.pos + 1)
+                return
+            if ch == ",":
+                self._advance(self.pos + 1)
+            elif not first:
+                raise ValueError(f"JSON غير متوقع عند البايت {self.offset}: {ch!r}")
+            first = False
+            if self._peek() == "]":
+                continue
+            yield kind, self._value(), self.offset
+
+    def __iter__(self):
+        if self.resume_kind is not None:
+            # استئناف من داخل القائمة (بعد آخر سجل مكتوب)
+            yield from self._array(self.resume_kind)
+            if self._expect(",}") == "}":
+                return
+        else:
+            self._expect("{")
+            if self._peek() == "}":
+                return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if self._peek() == "[" and key in KINDS:
+                self._advance(self.pos + 1)
+                yield from self._array(key)
+            else:
+                self._value()  # مفتاح غير معروف: نتخطاه
+            if self._expect(",}") == "}":
+                return
+
+# ---------------------------------------------------------------------
+# الكتابة التدريجية ونقطة الاستئناف
+# ---------------------------------------------------------------------
+class MigrationWriter:
+    """
+    يكتب data_store.json تدريجيًا إلى "<path>.partial" (قائمة لكل نوع بالترتيب الذي يظهر به
+    في الملف القديم) مع بصمات السجلات في "<path>.fingerprints"،
+    ويحفظ نقطة الاستئناف "<path>.checkpoint" بعد كل دفعة.
+    """
+    def __init__(self, path: str, source: str, restart: bool = False):
+        self.path = path
+        self.partial = path + ".partial"
+        self.checkpoint_path = path + ".checkpoint"
+        self.prints = FingerprintLog(path + ".fingerprints")
+        st = os.stat(source)
+        self.source_id = {"source": os.path.abspath(source), "size": st.st_size,
+                          "mtime_ns": st.st_mtime_ns}
+        self.state = None if restart else self._load_checkpoint()
+        if self.state is None:
+            self.state = {**self.source_id, "input_offset": 0, "kind": None, "first": True,
+                          "output_offset": 0, "prints_offset": 0, "done": [],
+                          "counts": {k: 0 for k in KINDS}}
+            self.out = open(self.partial, "w", encoding="utf-8")
+            self.out.write('{\n  "schema_version": %d' % SCHEMA_VERSION)
+            self.fp_out = open(self.prints.path, "w", encoding="utf-8")
+        else:
+            self.out = open(self.partial, "r+", encoding="utf-8")
+            self.out.truncate(self.state["output_offset"])
+            self.out.seek(self.state["output_offset"])
+            # البصمات المكتوبة حتى نقطة الاستئناف = السجلات التي رُحّلت بالفعل
+            self.prints.load(self.state["prints_offset"])
+            self.fp_out = open(self.prints.path, "r+", encoding="utf-8")
+            self.fp_out.truncate(self.state["prints_offset"])
+            self.fp_out.seek(self.state["prints_offset"])
+
+    def _load_checkpoint(self):
+        """نقطة الاستئناف صالحة فقط لنفس الملف القديم (الحجم ووقت التعديل)."""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.partial) or not os.path.exists(self.prints.path):
+            return None
+        if any(state.get(k) != v for k, v in self.source_id.items()):
+            print("⚠️ الملف القديم تغيّر منذ نقطة الاستئناف: نبدأ من جديد.")
+            return None
+        return state
+
+    @property
+    def resumed(self) -> bool:
+        return self.state["input_offset"] > 0
+
+    def write_chunk(self, kind: str, lines: list, prints: list, input_offset: int):
+        """إضافة سطور دفعة إلى قائمة kind وبصماتها ثم حفظ نقطة الاستئناف."""
+        st = self.state
+        if st["kind"] != kind:
+            self._open_section(kind)
+        lines = [line for line in lines if line is not None]
+        if lines:
+            sep = "\n    " if st["first"] else ",\n    "
+            self.out.write(sep + ",\n    ".join(lines))
+            st["first"] = False
+        self.fp_out.write(FingerprintLog.lines(kind, prints))
+        st["counts"][kind] += len(lines)
+        st["input_offset"] = input_offset
+        self._save_checkpoint()
+
+    def _open_section(self, kind: str):
+        st = self.state
+        if st["kind"] is not None:
+            self._close_section()
+        self.out.write(f',\n  "{kind}": [')
+        st["kind"], st["first"] = kind, True
+
+    def _close_section(self):
+        st = self.state
+        self.out.write("]" if st["first"] else "\n  ]")
+        st["done"].append(st["kind"])
+        st["kind"] = None
+
+    def _save_checkpoint(self):
+        """نضمن وصول المخرجات للقرص قبل تسجيل نقطة الاستئناف (كتابة ذرية)."""
+        for f in (self.out, self.fp_out):
+            f.flush()
+            os.fsync(f.fileno())
+        self.state["output_offset"] = self.out.tell()
+        self.state["prints_offset"] = self.fp_out.tell()
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def finish(self):
+        """إغلاق القوائم وإضافة الأنواع غير الموجودة كقوائم فارغة ثم إعادة التسمية الذرية."""
+        st = self.state
+        if st["kind"] is not None:
+            self._close_section()
+        for kind in KINDS:
+            if kind not in st["done"]:
+                self._open_section(kind)
+                self._close_section()
+        self.out.write("\n}\n")
+        for f in (self.out, self.fp_out):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        os.replace(self.partial, self.path)
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        for f in (self.out, self.fp_out):
+            if not f.closed:
+                f.close()
+
+# ---------------------------------------------------------------------
+# الترحيل
+# ---------------------------------------------------------------------
+def _chunks(stream, size: int):
+    """
+    تجميع السجلات في دفعات من نوع واحد: (kind, records, موضع البايت بعد آخر سجل).
+    عناصر المستخدمين المتداخلة تُفك هنا، ولا تُقسم دفعة داخل عنصر واحد (ليبقى الاستئناف صحيحًا).
+    """
+    kind, records, offset = None, [], 0
+    for k, rec, off in stream:
+        if k != kind and records:
+            yield kind, records, offset
+            records = []
+        kind = k
+        records.extend(flatten_users(rec) if k == "users" else (rec,))
+        offset = off
+        if len(records) >= size:
+            yield kind, records, offset
+            records = []
+    if records:
+        yield kind, records, offset
+
+def _pipeline(old_file: str, start_offset: int, resume_kind, workers: int, chunk_size: int,
+              prints: FingerprintLog, seen: set, stats: dict, as_json: bool):
+    """
+    قراءة -> تصفية بالبصمات -> توحيد في الـ pool -> النتائج بالترتيب:
+    (kind, السجلات الموحدة, [(key, fingerprint)], موضع البايت).
+    السجل الذي تطابق بصمته المحفوظة لا يُرسل للتوحيد أصلًا، والمفتاح المكرر في نفس التشغيل يُتجاهل.
+    """
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        with open(old_file, "rb") as f:
+            stream = LegacyStream(f, start_offset, resume_kind)
+            # دفعات قيد التنفيذ بالترتيب؛ الحد يمنع تراكم النتائج في الذاكرة
+            pending = deque()
+            for kind, records, offset in _chunks(stream, chunk_size):
+                todo, keys = [], []
+                for rec in records:
+                    stats["read"] += 1
+                    key = legacy_key(kind, rec)
+                    if (kind, key) in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add((kind, key))
+                    fp = fingerprint(rec)
+                    if prints.get(kind, key) == fp:
+                        stats["unchanged"] += 1
+                        continue
+                    todo.append(rec)
+                    keys.append((key, fp))
+                stats["changed"] += len(todo)
+                if pool is None:
+                    yield kind, normalize_chunk(kind, todo, as_json), keys, offset
+                    continue
+                pending.append((kind, pool.submit(normalize_chunk, kind, todo, as_json), keys, offset))
+                if len(pending) >= workers * 2:
+                    k, fut, ks, off = pending.popleft()
+                    yield k, fut.result(), ks, off
+            while pending:
+                k, fut, ks, off = pending.popleft()
+                yield k, fut.result(), ks, off
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def _report(stats: dict, elapsed: float, mb: float, workers: int):
+    print(f"   مقروء: {stats['read']} | جديد/متغير: {stats['changed']} | بدون تغيير: {stats['unchanged']} "
+          f"| مكرر: {stats['duplicates']}")
+    print(f"   الزمن: {elapsed:.2f} ث | {stats['read'] / elapsed if elapsed else 0:,.0f} سجل/ث "
+          f"| {mb / elapsed if elapsed else 0:.1f} MiB/ث | العمليات: {workers}")
+
+def migrate(old_file: str = OLD_FILE, new_file: str = NEW_FILE, workers: int = None,
+            chunk_size: int = CHUNK_SIZE, restart: bool = False, full: bool = False):
+    """
+    إن وُجد المخزن الجديد (ولم يُطلب full) نرحّل الفروقات فقط عبر sync()،
+    وإلا نبني الملف الجديد كاملًا بالتدفق مع نقطة استئناف.
+    """
+    if not Path(old_file).exists():
+        print(f"❌ الملف {old_file} غير موجود!")
+        return
+    workers = workers or os.cpu_count() or 1
+    if Path(new_file).exists() and not full and not Path(new_file + ".checkpoint").exists():
+        return sync(old_file, new_file, workers, chunk_size)
+
+    writer = MigrationWriter(new_file, old_file, restart)
+    state = writer.state
+    if writer.resumed:
+        print(f"↻ استئناف من البايت {state['input_offset']} ({sum(state['counts'].values())} سجل مكتوب)")
+    start = time.perf_counter()
+    start_offset = state["input_offset"]
+    stats = {"read": 0, "changed": 0, "unchanged": 0, "duplicates": 0}
+    # عند الاستئناف: المفاتيح التي رُحّلت قبل التوقف تُعد مكررة إن ظهرت ثانية
+    seen = set(writer.prints.prints)
+    try:
+        for kind, lines, keys, offset in _pipeline(
+                old_file, start_offset, state["kind"] if writer.resumed else None, workers,
+                chunk_size, FingerprintLog(""), seen, stats, as_json=True):
+            writer.write_chunk(kind, lines, keys, offset)
+        writer.finish()
+    except KeyboardInterrupt:
+        print("\n⏸ توقف الترحيل. أعد التشغيل للاستئناف من آخر نقطة محفوظة.")
+        return
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ تم الترحيل بنجاح! البيانات الجديدة محفوظة في {new_file}")
+    print(f"   السجلات: {state['counts']}")
+    _report(stats, elapsed, (os.path.getsize(old_file) - start_offset) / (1 << 20), workers)
+
+def _upsert(store, kind: str, rec: dict, stats: dict):
+    """
+    إدخال/تحديث سجل قديم موحد في المخزن عبر طرق DataStore (الفهارس تبقى صحيحة).
+    - المستخدم يُطابق باسم المستخدم، والسيارة/الفاتورة بالمعرف.
+    - المستخدم الموجود تُحدَّث فقط حقول ملفه التي يملكها النظام القديم (LEGACY_USER_FIELDS)؛
+      كلمة المرور ونقاط الولاء (وسجلها) يملكها النظام الجديد بعد الترحيل.
+    - السيارة المباعة أو المحجوزة في النظام الجديد تبقى كذلك مهما كانت حالتها في النظام القديم
+      (فلا تصبح "available" وهي تحمل reserved_by).
+    - الفواتير لا تتعدل: تُضاف فقط إن لم تكن موجودة.
+    """
+    from car_dealership_oop_full_commented import Car, Invoice, User
+    if kind == "users":
+        cur = store.find_user_by_username(rec["username"])
+        if cur is None:
+            user = User.from_dict(rec)
+            if store.find_user_by_id(user.id):
+                user.id = f"{user.id}-{hashlib.sha256(user.username.encode()).hexdigest()[:6]}"
+            store.add_user(user)
+            stats["added"] += 1
+        else:
+            legacy = User.from_dict(rec).to_dict()
+            store.update_user(cur, **{k: legacy[k] for k in LEGACY_USER_FIELDS})
+            stats["updated"] += 1
+    elif kind == "cars":
+        cur = store.find_car_by_id(rec["id"])
+        if cur is None:
+            store.add_car(Car.from_dict(rec))
+            stats["added"] += 1
+        else:
+            fields = Car.from_dict(rec).to_dict()
+            del fields["id"]
+            if cur.status in ("sold", "reserved"):
+                del fields["status"]
+            store.update_car(cur, **fields)
+            stats["updated"] += 1
+    else:
+        history = store.invoices_for_customer(rec["customer"], limit=10 ** 9)["items"]
+        if not any(i.id == rec["id"] for i in history):
+            store.add_invoice(Invoice.from_dict(rec))
+            stats["added"] += 1
+
+def sync(old_file: str = OLD_FILE, new_file: str = NEW_FILE, workers: int = 1,
+         chunk_size: int = CHUNK_SIZE):
+    """
+    ترحيل تزايدي إلى مخزن موجود: O(الفروقات) في التوحيد وتجزئة كلمات المرور والكتابة.
+    كل دفعة تُحفظ في معاملة واحدة ثم تُضاف بصماتها، فإعادة التشغيل بعد انقطاع
+    تعيد فقط الدفعة غير المكتملة (الإدخال/التحديث متكرر بأمان).
+    """
+    from car_dealership_oop_full_commented import DataStore
+    store = DataStore(new_file)  # يرقّي صيغة المخزن تلقائيًا إن كان أقدم
+    prints = FingerprintLog(new_file + ".fingerprints")
+    prints.load()
+    stats = {"read": 0, "changed": 0, "unchanged": 0, "duplicates": 0, "added": 0, "updated": 0}
+    start = time.perf_counter()
+    try:
+        with open(prints.path, "a", encoding="utf-8") as fp_out:
+            for kind, records, keys, _offset in _pipeline(old_file, 0, None, workers, chunk_size,
+                                                          prints, set(), stats, as_json=False):
+                if not keys:
+                    continue
+                with store.transaction():
+                    for rec in records:
+                        if rec is not None:
+                            _upsert(store, kind, rec, stats)
+                    store.save()
+                fp_out.write(FingerprintLog.lines(kind, keys))
+                fp_out.flush()
+    except KeyboardInterrupt:
+        print("\n⏸ توقف الترحيل. أعد التشغيل لإكمال الفروقات المتبقية.")
         return
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ تم ترحيل الفروقات إلى {new_file} | مضاف: {stats['added']} | محدث: {stats['updated']}")
+    _report(stats, elapsed, os.path.getsize(old_file) / (1 << 20), workers)
 
-    with open(OLD_FILE, "r", encoding="utf-8") as f:
-        old_data = json.load(f)
-
-    new_data = {"users": [], "cars": [], "invoices": []}
-
-    # ---- ترحيل المستخدمين ----
-    for u in old_data.get("users", []):
-        if isinstance(u, dict):
-            new_data["users"].append({
-                "id": u.get("id", f"user-{u.get('username','xxx')}"),
-                "username": u.get("username", ""),
-                "password_hash": hash_password(u.get("password", "123456")),
-                "usertype": u.get("usertype", "Customer"),
-                "phone": u.get("phone", ""),
-                "gender": u.get("gender", "M"),
-                "is_active": u.get("is_active", True),
-                "loyalty_points": u.get("loyalty_points", 0)
-            })
-        elif isinstance(u, list):
-            username = u[0] if len(u) > 0 else "unknown"
-            password = u[1] if len(u) > 1 else "123456"
-            usertype = u[2] if len(u) > 2 else "Customer"
-            phone    = u[3] if len(u) > 3 else ""
-            gender   = u[4] if len(u) > 4 else "M"
-
-            new_data["users"].append({
-                "id": f"user-{username}",
-                "username": username,
-                "password_hash": hash_password(password),
-                "usertype": usertype,
-                "phone": phone,
-                "gender": gender,
-                "is_active": True,
-                "loyalty_points": 0
-            })
-
-    # ---- ترحيل السيارات ----
-    for c in old_data.get("cars", []):
-        specs_parts = []
-        for key in c:
-            if key not in ("id","name","model","price","color","status","specs"):
-                specs_parts.append(f"{key}:{c[key]}")
-        specs_str = ", ".join(specs_parts + [c.get("specs","")])
-        new_data["cars"].append({
-            "id": c.get("id", f"car-{c.get('name','xxx')}"),
-            "name": c.get("name", ""),
-            "model_year": c.get("model", 0),
-            "price": c.get("price", 0.0),
-            "color": c.get("color", ""),
-            "specs": specs_str.strip(),
-            "status": c.get("status", "available")
-        })
-
-    # ---- ترحيل الفواتير ----
-    for i in old_data.get("invoices", []):
-        new_data["invoices"].append({
-            "id": i.get("id", f"inv-{i.get('customer','xxx')}"),
-            "customer": i.get("customer", ""),
-            "car_id": i.get("car_id", ""),
-            "price": i.get("price", 0.0),
-            "points_earned": i.get("points_earned", 0),
-            "date": i.get("date", "")
-        })
-
-    # ---- حفظ الملف الجديد ----
-    with open(NEW_FILE, "w", encoding="utf-8") as f:
-        json.dump(new_data, f, indent=2, ensure_ascii=False)
-
-    print(f"✅ تم الترحيل بنجاح! البيانات الجديدة محفوظة في {NEW_FILE}")
+def main():
+    parser = argparse.ArgumentParser(description="ترحيل data.json القديم إلى data_store.json")
+    parser.add_argument("--old", default=OLD_FILE)
+    parser.add_argument("--new", default=NEW_FILE)
+    parser.add_argument("--workers", type=int, default=None, help="عدد العمليات (1 = بدون pool)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="تجاهل نقطة الاستئناف والبدء من جديد")
+    parser.add_argument("--full", action="store_true",
+                        help="إعادة بناء الملف الجديد كاملًا بدل ترحيل الفروقات")
+    args = parser.parse_args()
+    migrate(args.old, args.new, args.workers, args.chunk, args.restart, args.full)
 
 if __name__ == "__main__":
-    migrate()
+    main()
@@ -0,0 +1,140 @@
+# points_ledger.py
+# سجل نقاط الولاء الإلحاقي (append-only) بجانب ملف البيانات:
+#   <data_store.json>.ledger              سطر JSON لكل قيد: earn / redeem / expire / adjust
+#   <data_store.json>.ledger.checkpoint   لقطة أرصدة: الأرصدة وآخر نشاط لكل مستخدم + موضع القيد التالي
+# - القيود والأرصدة بمعرف المستخدم (لا يتأثر بتغيير اسمه)؛ الاسم يُحفظ في القيد للقراءة فقط.
+# - الرصيد المادي (materialized) لكل مستخدم هو User.loyalty_points في المخزن (قراءة O(1))،
+#   ويُحدَّث مع كل قيد عبر DataStore.post_points؛ هذا الملف هو سجل التدقيق وإعادة البناء.
+# - إعادة البناء/التدقيق تقرأ آخر لقطة ثم تعيد تطبيق القيود بعدها فقط (لا كل التاريخ).
+# - القيد يُكتب بعد نجاح حفظ معاملة المخزن (والملف ما زال مقفلًا): لا قيد لبيع لم يُحفظ،
+#   والتراجع عن المعاملة يُسقط القيود المؤجلة دون لمس الملف.
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# نوع القيد -> إشارة النقاط المسموحة (+1 موجب فقط، -1 سالب فقط، 0 أي إشارة)
+KINDS = {"earn": 1, "redeem": -1, "expire": -1, "adjust": 0}
+
+
+class PointsLedger:
+    """
+    ملف القيود ولقطات الأرصدة (checkpoint_bytes: حجم القيود بعد آخر لقطة الذي نكتب بعده لقطة جديدة).
+    الكتابة تتم والمخزن مقفل (داخل معاملة)، فلا تتداخل قيود عمليتين.
+    """
+    def __init__(self, path: str, checkpoint_bytes: int = 1024 * 1024):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.checkpoint_bytes = checkpoint_bytes
+        # (بصمة ملف اللقطة، موضعها) حتى لا نقرأ الأرصدة كاملة في كل حفظ
+        self._offset_cache = (None, 0)
+
+    # -------------------------
+    # الكتابة
+    # -------------------------
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def start(self, balances: Dict[str, int], date: str):
+        """
+        أول استخدام: لقطة افتتاحية بالأرصدة الحالية (نقاط ما قبل السجل) بدل قيد لكل مستخدم.
+        لا تفعل شيئًا إن كان السجل أو لقطته موجودين.
+        """
+        if self.started():
+            return
+        self._write_checkpoint({"offset": 0, "date": date, "opened": date, "balances": balances,
+                                "last_activity": {}})
+
+    def started(self) -> bool:
+        """هل بدأ السجل (لقطة افتتاحية أو قيود)؟ قبل ذلك الأرصدة كلها من المخزن وحده."""
+        return os.path.exists(self.checkpoint_path) or os.path.exists(self.path)
+
+    def append(self, entry: dict) -> int:
+        """إلحاق قيد واحد؛ نعيد طول الملف قبل الكتابة."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            before = f.tell()
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+        return before
+
+    # -------------------------
+    # اللقطات وإعادة التطبيق
+    # -------------------------
+    def read_checkpoint(self) -> dict:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"offset": 0, "date": "", "opened": "", "balances": {}, "last_activity": {}}
+
+    def _checkpoint_offset(self) -> int:
+        try:
+            st = os.stat(self.checkpoint_path)
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return 0
+        if stamp != self._offset_cache[0]:
+            self._offset_cache = (stamp, self.read_checkpoint()["offset"])
+        return self._offset_cache[1]
+
+    def _write_checkpoint(self, checkpoint: dict):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def entries(self, offset: int = 0) -> Iterator[tuple]:
+        """(القيد، الموضع بعده) من offset حتى النهاية؛ السطر الأخير غير المكتمل يُتجاهل."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line), offset
+
+    def state(self) -> dict:
+        """الأرصدة وآخر نشاط لكل مستخدم: آخر لقطة + القيود بعدها فقط."""
+        state = self.read_checkpoint()
+        balances, last = state["balances"], state["last_activity"]
+        for entry, end in self.entries(state["offset"]):
+            user = entry["user"]
+            balances[user] = balances.get(user, 0) + entry["points"]
+            last[user] = entry["date"]
+            state["offset"] = end
+        return state
+
+    def maybe_checkpoint(self) -> bool:
+        """لقطة جديدة إن تجاوزت القيود بعد آخر لقطة checkpoint_bytes (يُستدعى بعد حفظ ناجح)."""
+        size = self.size()
+        if not size or size - self._checkpoint_offset() < self.checkpoint_bytes:
+            return False
+        state = self.state()
+        state["date"] = datetime.now().isoformat(sep=" ", timespec="seconds")
+        self._write_checkpoint(state)
+        return True
+
+    def history(self, user_id: str, limit: Optional[int] = None) -> List[dict]:
+        """قيود مستخدم واحد من الأقدم للأحدث (تدقيق: تمرير كامل على الملف)."""
+        items = [entry for entry, _end in self.entries() if entry["user"] == user_id]
+        return items if limit is None else items[-limit:]
+
+    def verify(self, users) -> List[str]:
+        """مقارنة أرصدة السجل (لقطة + قيود بعدها) بالأرصدة المادية في المخزن."""
+        balances = self.state()["balances"]
+        problems = []
+        for u in users:
+            expected = balances.get(u.id, 0)
+            if expected != u.loyalty_points:
+                problems.append(f"ledger {u.username}: {u.loyalty_points} != {expected}")
+        return problems
@@ -0,0 +1,214 @@
+# sales_analytics.py
+# تحليلات المبيعات على الفواتير بتمثيل عمودي (columnar):
+# - نحول كل الفواتير (store.all_invoices: المؤرشفة ثم النشطة) مرة واحدة إلى أعمدة: التاريخ كعدد ثوانٍ، السعر، رمز العميل، رمز السيارة.
+# - التجميع (إيراد يومي/أسبوعي/شهري، مبيعات لكل اسم سيارة، متوسط الفاتورة لكل عميل)
+#   وفلترة المدى الزمني تعمل على الأعمدة مباشرة دون قراءة نص التاريخ لكل فاتورة.
+# - NumPy اختيارية: إن وُجدت نستخدم عمليات متجهة (vectorized)، وإلا نستخدم array القياسية.
+
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy غير مثبتة: نعمل بمكتبة array القياسية
+    np = None
+
+from car_dealership_oop_full_commented import CompactUtil, DataStore, Invoice
+
+# تاريخ غير قابل للتحويل (بيانات قديمة): يُستبعد من التجميع الزمني فقط
+NO_DATE = -1
+DAY = 86400
+PERIODS = ("day", "week", "month")
+
+
+def to_ts(value) -> Optional[int]:
+    """تحويل "YYYY-MM-DD" أو "YYYY-MM-DD HH:MM:SS" أو datetime إلى ثوانٍ (مثل Invoice.ts)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=" ", timespec="seconds")
+    if len(value) == 10:
+        value += " 00:00:00"
+    ts = CompactUtil.iso_to_ts(value)
+    if not isinstance(ts, int):
+        raise ValueError(f"تاريخ غير صالح: {value}")
+    return ts
+
+
+def _label(period: str, key: int) -> str:
+    """تسمية المجموعة: يوم "YYYY-MM-DD"، أسبوع "YYYY-MM-DD" (أول يوم اثنين)، شهر "YYYY-MM"."""
+    if period == "month":
+        return f"{key // 12:04d}-{key % 12 + 1:02d}"
+    if period == "week":
+        key = key * 7 - 3  # رقم الأسبوع -> يوم الاثنين الأول فيه
+    return (CompactUtil.EPOCH + timedelta(days=key)).strftime("%Y-%m-%d")
+
+
+class InvoiceColumns:
+    """
+    أعمدة الفواتير:
+    - ts: الثواني (int64) أو NO_DATE
+    - price: السعر (float64)
+    - customer: رمز العميل (عدد صحيح) داخل قائمة customers
+    - car: رمز السيارة (عدد صحيح) داخل قائمة car_ids
+    """
+    def __init__(self, ts, price, customer, car, customers: List[str], car_ids: List[str]):
+        self.ts = ts
+        self.price = price
+        self.customer = customer
+        self.car = car
+        self.customers = customers
+        self.car_ids = car_ids
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @classmethod
+    def from_invoices(cls, invoices: Iterable[Invoice]) -> 'InvoiceColumns':
+        """تمرير واحد على الفواتير: ترميز القاموس (dictionary encoding) للعملاء والسيارات."""
+        ts, price = array("q"), array("d")
+        customer, car = array("l"), array("l")
+        cust_codes: Dict[str, int] = {}
+        car_codes: Dict[str, int] = {}
+        for inv in invoices:
+            t = inv.ts
+            ts.append(t if type(t) is int else NO_DATE)
+            price.append(float(inv.price))
+            customer.append(cust_codes.setdefault(inv.customer, len(cust_codes)))
+            car.append(car_codes.setdefault(inv.car_id, len(car_codes)))
+        cols = cls(ts, price, customer, car, list(cust_codes), list(car_codes))
+        return cols.as_numpy() if np is not None else cols
+
+    def as_numpy(self) -> 'InvoiceColumns':
+        """نسخة بأعمدة NumPy (بدون نسخ إضافي حين تكون الأعمدة array أصلًا)."""
+        return InvoiceColumns(np.frombuffer(self.ts, dtype=np.int64) if isinstance(self.ts, array) else self.ts,
+                              np.frombuffer(self.price, dtype=np.float64) if isinstance(self.price, array) else self.price,
+                              np.asarray(self.customer, dtype=np.int64),
+                              np.asarray(self.car, dtype=np.int64),
+                              self.customers, self.car_ids)
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> 'InvoiceColumns':
+        """فلترة مدى زمني [start, end) بالثواني؛ الناتج أعمدة جديدة بنفس القواميس."""
+        if start is None and end is None:
+            return self
+        lo = NO_DATE + 1 if start is None else start
+        if np is not None and not isinstance(self.ts, array):
+            mask = self.ts >= lo
+            if end is not None:
+                mask &= self.ts < end
+            return InvoiceColumns(self.ts[mask], self.price[mask], self.customer[mask],
+                                  self.car[mask], self.customers, self.car_ids)
+        hi = end
+        keep = [i for i, t in enumerate(self.ts) if t >= lo and (hi is None or t < hi)]
+        return InvoiceColumns(array("q", (self.ts[i] for i in keep)),
+                              array("d", (self.price[i] for i in keep)),
+                              array("l", (self.customer[i] for i in keep)),
+                              array("l", (self.car[i] for i in keep)),
+                              self.customers, self.car_ids)
+
+    # -------------------------
+    # تجميعات أساسية
+    # -------------------------
+    def period_keys(self, period: str):
+        """مفتاح المجموعة لكل فاتورة: رقم اليوم، رقم الأسبوع (يبدأ الاثنين)، أو سنة*12+شهر."""
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {PERIODS}")
+        if np is not None and not isinstance(self.ts, array):
+            valid = self.ts != NO_DATE
+            days = self.ts[valid] // DAY
+            if period == "day":
+                return valid, days
+            if period == "week":
+                return valid, (days + 3) // 7  # 1970-01-01 كان خميسًا
+            months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+            return valid, months + 1970 * 12
+        keys, valid = array("q"), []
+        month_of_day: Dict[int, int] = {}
+        for t in self.ts:
+            if t == NO_DATE:
+                valid.append(False)
+                continue
+            valid.append(True)
+            d = t // DAY
+            if period == "day":
+                keys.append(d)
+            elif period == "week":
+                keys.append((d + 3) // 7)
+            else:
+                m = month_of_day.get(d)
+                if m is None:
+                    day = CompactUtil.EPOCH + timedelta(days=d)
+                    m = month_of_day[d] = day.year * 12 + day.month - 1
+                keys.append(m)
+        return valid, keys
+
+    def group_sum(self, keys, values) -> Dict[int, tuple]:
+        """مجموع وعدد values لكل مفتاح: {key: (sum, count)}."""
+        if np is not None and not isinstance(values, array):
+            uniq, inverse = np.unique(keys, return_inverse=True)
+            sums = np.bincount(inverse, weights=values, minlength=len(uniq))
+            counts = np.bincount(inverse, minlength=len(uniq))
+            return {int(k): (float(s), int(c)) for k, s, c in zip(uniq, sums, counts)}
+        out: Dict[int, list] = {}
+        for k, v in zip(keys, values):
+            acc = out.get(k)
+            if acc is None:
+                out[k] = [v, 1]
+            else:
+                acc[0] += v
+                acc[1] += 1
+        return {k: (s, c) for k, (s, c) in out.items()}
+
+    def masked_price(self, valid):
+        """أسعار الفواتير ذات التاريخ الصالح فقط."""
+        if np is not None and not isinstance(self.price, array):
+            return self.price[valid]
+        return [p for p, ok in zip(self.price, valid) if ok]
+
+
+class SalesAnalytics:
+    """
+    تقارير المبيعات الزمنية فوق InvoiceColumns:
+    - revenue_by_period: الإيراد وعدد الفواتير لكل يوم/أسبوع/شهر.
+    - sales_by_car_name: عدد المبيعات والإيراد لكل اسم سيارة.
+    - average_ticket_by_customer: متوسط قيمة الفاتورة لكل عميل.
+    كل الطرق تقبل start/end ("YYYY-MM-DD" أو datetime) لفلترة المدى الزمني [start, end).
+    الأعمدة تُبنى عند الإنشاء؛ استدعِ refresh() بعد مبيعات جديدة.
+    """
+    def __init__(self, store: DataStore):
+        self.store = store
+        self.columns = InvoiceColumns.from_invoices(store.all_invoices())
+
+    def refresh(self):
+        """إعادة بناء الأعمدة من كل الفواتير."""
+        self.columns = InvoiceColumns.from_invoices(self.store.all_invoices())
+
+    def _cols(self, start, end) -> InvoiceColumns:
+        return self.columns.between(to_ts(start), to_ts(end))
+
+    def revenue_by_period(self, period: str = "day", start=None, end=None) -> Dict[str, dict]:
+        """{"2024-03": {"revenue": ..., "count": ...}, ...} مرتبة زمنيًا."""
+        cols = self._cols(start, end)
+        valid, keys = cols.period_keys(period)
+        grouped = cols.group_sum(keys, cols.masked_price(valid))
+        return {_label(period, k): {"revenue": s, "count": c} for k, (s, c) in sorted(grouped.items())}
+
+    def sales_by_car_name(self, start=None, end=None) -> Dict[str, dict]:
+        """تجميع حسب اسم السيارة (السيارات المحذوفة تظهر باسم "?")."""
+        cols = self._cols(start, end)
+        grouped = cols.group_sum(cols.car, cols.price)
+        out: Dict[str, dict] = {}
+        for code, (s, c) in grouped.items():
+            car = self.store.find_car_by_id(cols.car_ids[code])
+            name = car.name if car is not None else "?"
+            acc = out.setdefault(name, {"count": 0, "revenue": 0.0})
+            acc["count"] += c
+            acc["revenue"] += s
+        return dict(sorted(out.items(), key=lambda kv: kv[1]["revenue"], reverse=True))
+
+    def average_ticket_by_customer(self, start=None, end=None) -> Dict[str, float]:
+        """متوسط قيمة الفاتورة لكل عميل."""
+        cols = self._cols(start, end)
+        grouped = cols.group_sum(cols.customer, cols.price)
+        return {cols.customers[k]: s / c for k, (s, c) in grouped.items()}
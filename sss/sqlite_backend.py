@@ -0,0 +1,205 @@
+# sqlite_backend.py
+# واجهة تخزين (backend) لـ DataStore مبنية على sqlite3 من مكتبة بايثون القياسية.
+# - جداول حقيقية للمستخدمين والسيارات والفواتير مع فهارس على الحقول المستخدمة في البحث.
+# - الحفظ يكتب السجلات المتغيرة فقط داخل معاملة (transaction) واحدة.
+# - يتضمن أداة استيراد لمرة واحدة من صيغة data_store.json الحالية:
+#   python sqlite_backend.py data_store.json data_store.db
+
+import json
+import sqlite3
+import sys
+from typing import Optional
+
+# تعريف الأعمدة لكل جدول بالترتيب. أي حقل غير معروف يُحفظ في العمود extra كـ JSON
+# حتى لا نفقد بيانات عند إضافة حقول جديدة للكلاسات.
+COLUMNS = {
+    "users": ("id", "username", "password_hash", "usertype", "phone", "gender",
+              "is_active", "loyalty_points"),
+    "cars": ("id", "name", "model_year", "price", "color", "specs", "status"),
+    "invoices": ("id", "customer", "car_id", "price", "points_earned", "date"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    password_hash TEXT,
+    usertype TEXT,
+    phone TEXT,
+    gender TEXT,
+    is_active INTEGER,
+    loyalty_points INTEGER,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS cars (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    model_year,
+    price REAL,
+    color TEXT,
+    specs TEXT,
+    status TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS invoices (
+    id TEXT PRIMARY KEY,
+    customer TEXT,
+    car_id TEXT,
+    price REAL,
+    points_earned INTEGER,
+    date TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE INDEX IF NOT EXISTS idx_cars_status ON cars(status);
+CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer);
+CREATE INDEX IF NOT EXISTS idx_invoices_car_id ON invoices(car_id);
+"""
+# ملاحظة: id في كل جدول هو PRIMARY KEY فهو مفهرس تلقائيًا (فهرس معرف السيارة).
+
+
+def _scalar(value):
+    """القيم غير البسيطة (dict/list من بيانات قديمة مشوهة) تُحفظ كنص JSON."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _row_values(kind: str, rec: dict) -> tuple:
+    """تحويل dict السجل إلى قيم الأعمدة + عمود extra للحقول الإضافية."""
+    cols = COLUMNS[kind]
+    extra = {k: v for k, v in rec.items() if k not in cols}
+    values = [_scalar(rec.get(c)) for c in cols]
+    values.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    return tuple(values)
+
+
+def _upsert_sql(kind: str) -> str:
+    """جملة INSERT ... ON CONFLICT تحافظ على rowid (وبالتالي على ترتيب السجلات)."""
+    cols = COLUMNS[kind] + ("extra",)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols[1:])
+    return (f"INSERT INTO {kind} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}")
+
+
+def _set_schema_version(conn, version: int):
+    """حفظ إصدار صيغة السجلات (نفس حقل schema_version في ملف JSON)."""
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(version),))
+
+
+class SqliteBackend:
+    """
+    واجهة تخزين SQLite لـ DataStore (نفس طرق JsonBackend: load/save/close).
+    الخدمات (AuthService, CarService, SalesService, ReportGenerator) لا تتغير:
+    تعمل على القوائم والفهارس في الذاكرة، وهذه الواجهة تحفظ الفروقات فقط.
+    الوصول المشترك (shared=True): lock() يبدأ معاملة BEGIN IMMEDIATE (قفل كتابة بين العمليات)
+    و poll() يقارن PRAGMA data_version لمعرفة إن كتبت عملية أخرى.
+    """
+    def __init__(self, path: str, shared: bool = True):
+        self.path = path
+        self.shared = shared
+        self._lock_depth = 0
+        self._data_version = None
+        self.conn = sqlite3.connect(path)
+        # WAL يسمح بالقراءة أثناء الكتابة ويقلل كلفة fsync لكل معاملة
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def load(self) -> Optional[dict]:
+        """
+        قراءة كل الجداول كقوائم dict بترتيب الإدخال.
+        نعيد None إن كانت قاعدة البيانات فارغة تمامًا (مخزن جديد).
+        """
+        raw = {}
+        empty = True
+        for kind, cols in COLUMNS.items():
+            rows = self.conn.execute(
+                f"SELECT {', '.join(cols)}, extra FROM {kind} ORDER BY rowid").fetchall()
+            records = []
+            for row in rows:
+                rec = dict(zip(cols, row[:-1]))
+                if kind == "users":
+                    rec["is_active"] = bool(rec["is_active"])
+                if row[-1]:
+                    rec.update(json.loads(row[-1]))
+                records.append(rec)
+            raw[kind] = records
+            empty = empty and not records
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        raw["schema_version"] = int(row[0]) if row else 0
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return None if empty else raw
+
+    def lock(self):
+        """قفل كتابة بين العمليات حتى unlock() (قابل لإعادة الدخول)."""
+        if not self.shared:
+            return
+        self._lock_depth += 1
+        if self._lock_depth == 1 and not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+
+    def unlock(self):
+        if not self.shared or not self._lock_depth:
+            return
+        self._lock_depth -= 1
+        if self._lock_depth == 0 and self.conn.in_transaction:
+            self.conn.commit()
+
+    def poll(self):
+        """("full", raw) إن غيّرت عملية أخرى قاعدة البيانات منذ آخر قراءة، وإلا None."""
+        if not self.shared:
+            return None
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return None
+        raw = self.load()
+        return None if raw is None else ("full", raw)
+
+    def save(self, store, changes: dict):
+        """
+        كتابة السجلات المتغيرة فقط (إضافة/تعديل/حذف) داخل معاملة واحدة.
+        مثال: buy_car = فاتورة + حالة السيارة + نقاط العميل في commit واحد.
+        """
+        with self.conn:
+            for (kind, record_id), obj in changes.items():
+                if obj is None:
+                    self.conn.execute(f"DELETE FROM {kind} WHERE id = ?", (record_id,))
+                else:
+                    self.conn.execute(_upsert_sql(kind), _row_values(kind, obj.to_dict()))
+            _set_schema_version(self.conn, store.schema_version)
+
+    def close(self):
+        """إغلاق الاتصال بقاعدة البيانات."""
+        self.conn.close()
+
+
+def import_json(json_path: str, db_path: str) -> dict:
+    """
+    استيراد لمرة واحدة من ملف data_store.json إلى قاعدة SQLite.
+    السجلات ذات المعرف المكرر تُدمج (آخر نسخة تفوز). نعيد عدد السجلات لكل جدول.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    backend = SqliteBackend(db_path)
+    counts = {}
+    with backend.conn:
+        for kind in COLUMNS:
+            records = raw.get(kind, [])
+            backend.conn.executemany(_upsert_sql(kind), (_row_values(kind, r) for r in records))
+            counts[kind] = len(records)
+        _set_schema_version(backend.conn, raw.get("schema_version", 0))
+    backend.close()
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("الاستخدام: python sqlite_backend.py data_store.json data_store.db")
+        sys.exit(1)
+    result = import_json(sys.argv[1], sys.argv[2])
+    print(f"✅ تم الاستيراد إلى {sys.argv[2]}: {result}")